@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Measure the import time of the package's entry points.
+
+Each scenario is run in a fresh interpreter, --repeat times, and the median
+wall time of the import statement is reported together with the heavy
+third-party modules it pulled in. Importing the package or the extractors
+should not load pandas, langchain or openai; those are imported when a
+summary or image is first requested.
+
+Results are written as JSON. With --baseline, scenarios slower than the
+baseline by more than --tolerance make the script exit non-zero.
+
+    poetry run python benchmarks/bench_import.py
+    poetry run python benchmarks/bench_import.py --baseline baseline_import.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+
+SCENARIOS = {
+    'package': "import arcade_flow_analyzer",
+    'process_flow': "from arcade_flow_analyzer import process_flow",
+    'process_flow_bytes': "from arcade_flow_analyzer.extractors import process_flow_bytes",
+    'summarize_actions': "from arcade_flow_analyzer import summarize_actions",
+    'generate_flow_image': "from arcade_flow_analyzer import generate_flow_image",
+    'cli': "import main",
+}
+
+HEAVY_MODULES = ['pandas', 'numpy', 'langchain', 'langchain_core', 'langchain_openai',
+                 'langchain_experimental', 'openai', 'tiktoken', 'PIL', 'redis',
+                 'fastapi', 'ijson']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds,
+                  'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# Slowdowns smaller than this are interpreter startup noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def run_scenario(statement, repeat):
+    """Import statement in repeat fresh interpreters; return (median seconds, loaded)"""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(
+        filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')]))}
+    code = PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    timings, loaded = [], []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True,
+                                text=True, check=True).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        timings.append(probe['seconds'])
+        loaded = probe['loaded']
+    return statistics.median(timings), loaded
+
+
+def compare(results, baseline, tolerance):
+    """Return the scenarios slower than baseline by more than tolerance"""
+    previous = {r['scenario']: r['seconds'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(result['scenario'])
+        if (before and result['seconds'] > before * (1 + tolerance) and
+                result['seconds'] - before > MIN_REGRESSION_SECONDS):
+            regressions.append((result, before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS),
+                        default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Fresh interpreters per scenario; the median is kept")
+    parser.add_argument('--output', default='bench_import.json')
+    parser.add_argument('--baseline', help="Earlier results to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (default: 0.25)")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenarios:
+        seconds, loaded = run_scenario(SCENARIOS[name], args.repeat)
+        results.append({'scenario': name, 'statement': SCENARIOS[name],
+                        'seconds': round(seconds, 4), 'loaded': loaded})
+        print(f"{name:<22} {seconds:7.3f}s  {', '.join(loaded) or '-'}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'python': sys.version.split()[0], 'repeat': args.repeat,
+                   'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, before in regressions:
+            print(f"REGRESSION {result['scenario']}: "
+                  f"{before:.4f}s -> {result['seconds']:.4f}s")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Load-test the async summary and image stages against the offline stub provider.
+
+Synthetic flows (see synthetic_flow.py) are extracted once, then summarized
+and imaged concurrently through asummarize_actions and agenerate_flow_image,
+exactly as `main.py --batch --async` does, with a StubProvider standing in
+for OpenAI. The stub sleeps for --latency per call and fails a --error-rate
+fraction of calls with rate-limit or timeout errors, so the throughput of the
+pipeline under a given concurrency limit and its retry behavior can be
+measured without network or API key. --rpm/--tpm make the stub emulate API
+rate limits, so the calls go through the rate-limit scheduler, which learns
+the limits from the stub's rate-limit headers.
+
+    poetry run python benchmarks/bench_load.py --flows 50 --concurrency 8 --latency 0.2
+    poetry run python benchmarks/bench_load.py --flows 50 --error-rate 0.1 --errors rate_limit
+    poetry run python benchmarks/bench_load.py --flows 50 --concurrency 16 --rpm 300
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from arcade_flow_analyzer.analysis import asummarize_actions
+from arcade_flow_analyzer.caching import DiskCache, text_hash
+from arcade_flow_analyzer.extractors import process_flow
+from arcade_flow_analyzer.providers import StubProvider
+from arcade_flow_analyzer.ratelimit import get_scheduler
+from arcade_flow_analyzer.telemetry import Tracer, format_stage_table, use_tracer
+from arcade_flow_analyzer.visualization import agenerate_flow_image
+
+from synthetic_flow import write_flow
+
+
+def prepare_flows(n_flows, n_events, work_dir):
+    """Write and extract n_flows distinct synthetic flows"""
+    flows = []
+    for seed in range(n_flows):
+        flow_file = os.path.join(work_dir, f"flow-{seed}.json")
+        write_flow(flow_file, n_events, seed=seed)
+        with open(flow_file, 'rb') as f:
+            flow_hash = text_hash(f.read().decode('utf-8'))
+        flows.append((flow_hash, process_flow(flow_file)))
+    return flows
+
+
+async def analyze(flow_hash, flow, provider, cache, semaphore, args):
+    summary = await asummarize_actions(
+        flow=flow, flow_hash=flow_hash, cache=cache, semaphore=semaphore,
+        timeout=args.timeout, max_retries=args.max_retries, provider=provider
+    )
+    await agenerate_flow_image(summary['summary'], cache=cache, semaphore=semaphore,
+                               timeout=args.timeout, max_retries=args.max_retries,
+                               provider=provider)
+
+
+async def run(flows, provider, cache, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = await asyncio.gather(
+        *(analyze(flow_hash, flow, provider, cache, semaphore, args)
+          for flow_hash, flow in flows),
+        return_exceptions=True
+    )
+    return [r for r in results if isinstance(r, BaseException)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flows', type=int, default=20)
+    parser.add_argument('--events', type=int, default=200,
+                        help="Events per synthetic flow (default: 200)")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Stub requests in flight (default: 4)")
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help="Seconds per stub call (default: 0.1)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of stub calls that fail (default: 0)")
+    parser.add_argument('--errors', default='rate_limit,timeout',
+                        help="Injected error kinds (default: rate_limit,timeout)")
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--rpm', type=float,
+                        help="Emulated requests per minute per model (default: unlimited)")
+    parser.add_argument('--tpm', type=float,
+                        help="Emulated tokens per minute per model (default: unlimited)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    provider = StubProvider(latency=args.latency, error_rate=args.error_rate,
+                            error_kinds=args.errors.split(','), seed=args.seed,
+                            rpm=args.rpm, tpm=args.tpm)
+    tracer = Tracer()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        flows = prepare_flows(args.flows, args.events, work_dir)
+        cache = DiskCache(os.path.join(work_dir, "store"))
+
+        start = time.perf_counter()
+        with use_tracer(tracer), contextlib.redirect_stdout(io.StringIO()):
+            failures = asyncio.run(run(flows, provider, cache, args))
+        seconds = time.perf_counter() - start
+
+    stage_summary = tracer.summary()
+    print("\n".join(format_stage_table(stage_summary)))
+
+    results = {
+        'flows': args.flows,
+        'events': args.events,
+        'concurrency': args.concurrency,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'seconds': round(seconds, 3),
+        'flows_per_second': round(args.flows / seconds, 2),
+        'calls': provider.calls,
+        'injected_errors': provider.errors,
+        'rate_limited': provider.rate_limited,
+        'failed_flows': len(failures),
+        'stages': stage_summary,
+    }
+    if provider.emulates_limits:
+        results['scheduler'] = get_scheduler().stats
+    print(f"{args.flows} flows in {seconds:.2f}s ({results['flows_per_second']} flows/s), "
+          f"{provider.calls} stub calls, {provider.errors} injected errors, "
+          f"{len(failures)} failed flows")
+    if provider.emulates_limits:
+        waits = {priority: stats for priority, stats in get_scheduler().stats.items()
+                 if priority != 'rate_limited'}
+        print(f"{provider.rate_limited} calls over the emulated limits; scheduler waits: " +
+              ", ".join(f"{priority} {stats['waited']}/{stats['admitted']} "
+                        f"({stats['wait_seconds']:.1f}s)" for priority, stats in waits.items()))
+    for failure in failures[:5]:
+        print(f"  {type(failure).__name__}: {failure}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark every local pipeline stage on synthetic flows.
+
+For each flow size, a synthetic flow is generated (see synthetic_flow.py) and
+the stages between the upload and the OpenAI calls are timed: process_flow,
+save_to_csv, preprocess_csv, prompt building and report assembly. The OpenAI
+calls are stubbed out with canned steps, summary and a placeholder image, so
+runs need no network and are comparable across machines of the same kind.
+
+Results are written as JSON. With --baseline, stages slower than the baseline
+by more than --tolerance make the script exit non-zero, so the run can guard
+the hot paths in CI.
+
+    poetry run python benchmarks/bench_pipeline.py --sizes 100 10000 1000000
+    poetry run python benchmarks/bench_pipeline.py --sizes 100 10000 --baseline baseline.json
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from arcade_flow_analyzer.analysis.csv_preprocessor import preprocess_csv
+from arcade_flow_analyzer.analysis.prompt_builder import build_actions_prompt
+from arcade_flow_analyzer.caching import DiskCache
+from arcade_flow_analyzer.extractors import process_flow, save_to_csv
+from arcade_flow_analyzer.report import create_markdown_report
+
+from synthetic_flow import write_flow
+
+try:
+    from arcade_flow_analyzer.extractors import process_flow_streaming
+    import ijson  # noqa: F401
+except ImportError:
+    process_flow_streaming = None
+
+DEFAULT_SIZES = [100, 10000, 1000000]
+
+# Canned model output standing in for the OpenAI calls
+STUB_STEPS = "\n".join(f"{i}. Performed step {i} of the journey." for i in range(1, 21))
+STUB_SUMMARY = ("The user searched for a product, compared a few results, "
+                "added one to the cart and went to checkout. ") * 5
+STUB_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def best_of(repeat, func, *args, **kwargs):
+    """Run func repeat times, returning the last result and the best time"""
+    best = float('inf')
+    for _ in range(repeat):
+        result, seconds = timed(func, *args, **kwargs)
+        best = min(best, seconds)
+    return result, best
+
+
+def consume_streaming(flow_file):
+    """Run the streaming extractor to completion"""
+    result = process_flow_streaming(flow_file)
+    for _ in result['events']:
+        pass
+    return result
+
+
+def run_size(n_events, repeat, work_dir, options):
+    """Time each stage for one flow size and return result records"""
+    flow_file = os.path.join(work_dir, f"flow-{n_events}.json")
+    flow_bytes = write_flow(flow_file, n_events, **options)
+
+    stages = []
+
+    def record(stage, seconds, **extra):
+        stages.append({'events': n_events, 'stage': stage,
+                       'seconds': round(seconds, 6),
+                       'events_per_second': round(n_events / seconds, 1) if seconds else None,
+                       **extra})
+        print(f"{n_events:>10} {stage:<24} {seconds:>10.4f}s")
+
+    flow, seconds = best_of(repeat, process_flow, flow_file)
+    record('process_flow', seconds, bytes=flow_bytes)
+
+    if process_flow_streaming is not None:
+        _, seconds = best_of(repeat, consume_streaming, flow_file)
+        record('process_flow_streaming', seconds, bytes=flow_bytes)
+
+    # save_to_csv writes under cache/ relative to the working directory
+    csv_path, seconds = best_of(repeat, save_to_csv, flow, "actions.csv")
+    record('save_to_csv', seconds, bytes=os.path.getsize(csv_path))
+
+    processed_path = os.path.join(work_dir, "cache", "processed_actions.csv")
+    _, seconds = best_of(repeat, preprocess_csv, csv_path, processed_path)
+    record('preprocess_csv', seconds, bytes=os.path.getsize(processed_path))
+
+    actions = pd.read_csv(processed_path, keep_default_na=False)
+    (_, stats), seconds = best_of(repeat, build_actions_prompt, actions)
+    record('build_prompt', seconds, tokens=stats['tokens'], lines=stats['lines'])
+
+    cache = DiskCache(os.path.join(work_dir, "store"))
+    image_file = cache.set("0" * 64, STUB_PNG, ".png")
+    report_file = os.path.join(work_dir, f"report-{n_events}.md")
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, seconds = best_of(repeat, create_markdown_report, STUB_STEPS, STUB_SUMMARY,
+                             image_file, report_file, cache=cache)
+    record('report', seconds, bytes=os.path.getsize(report_file))
+
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def compare(results, baseline, tolerance):
+    """Return the stages slower than baseline by more than tolerance"""
+    previous = {(r['events'], r['stage']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['events'], result['stage']))
+        if (before and result['seconds'] > before * (1 + tolerance) and
+                result['seconds'] - before > MIN_REGRESSION_SECONDS):
+            regressions.append((result, before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Runs per stage; the best time is kept "
+                             "(sizes of 10^6 and above run once)")
+    parser.add_argument('--steps', type=int, default=None,
+                        help="Maximum IMAGE steps per flow (default: one per click)")
+    parser.add_argument('--hotspots', type=int, default=1)
+    parser.add_argument('--urls', type=int, default=50)
+    parser.add_argument('--output', default='bench_pipeline.json')
+    parser.add_argument('--baseline', help="Earlier results to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (default: 0.25)")
+    args = parser.parse_args()
+
+    options = {'n_steps': args.steps, 'hotspots_per_step': args.hotspots,
+               'n_urls': args.urls}
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            for size in args.sizes:
+                repeat = 1 if size >= 1000000 else args.repeat
+                results.extend(run_size(size, repeat, work_dir, options))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'options': {**options, 'repeat': args.repeat},
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, before in regressions:
+            print(f"REGRESSION {result['stage']} at {result['events']} events: "
+                  f"{before:.4f}s -> {result['seconds']:.4f}s")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark preprocess_csv against the original row-by-row implementation.
+
+Generates synthetic actions CSVs of increasing size, runs both versions,
+checks that their output files are identical and prints the speedup.
+
+    poetry run python benchmarks/bench_preprocess.py --sizes 1000 10000
+"""
+
+import argparse
+import csv
+import filecmp
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from arcade_flow_analyzer.analysis.csv_preprocessor import (
+    create_action_description, extract_search_term_from_url, preprocess_csv
+)
+
+FIELDNAMES = ['type', 'timestamp_datetime', 'start_time_datetime',
+              'end_time_datetime', 'duration_seconds', 'click_text',
+              'hotspot_label', 'page_url', 'page_title', 'clickId']
+
+URLS = [
+    'https://www.target.com/',
+    'https://www.target.com/s?searchTerm=scooter&searchTermRaw=Scooter',
+    'https://www.amazon.com/s?k=running+shoes&ref=nb_sb_noss',
+    'https://www.google.com/search?q=arcade%20software',
+    'https://www.example.com/products/item-42',
+    'https://www.example.com/cart',
+]
+
+
+def reference_preprocess_csv(input_path, output_path):
+    """The original nested-loop implementation, kept for comparison"""
+    df = pd.read_csv(input_path, keep_default_na=False)
+
+    df['search_term_from_url'] = df['page_url'].apply(extract_search_term_from_url)
+    df['extracted_search_term'] = ""
+
+    for i in range(len(df)):
+        if df.iloc[i]['type'] == 'click':
+            for j in range(i + 1, min(i + 6, len(df))):
+                if df.iloc[j]['type'] == 'typing':
+                    for k in range(i + 1, min(i + 6, len(df))):
+                        search_term = extract_search_term_from_url(df.iloc[k]['page_url'])
+                        if search_term:
+                            df.iloc[i, df.columns.get_loc('extracted_search_term')] = search_term
+                            break
+                    break
+
+    df['action_description'] = df.apply(create_action_description, axis=1)
+    df.to_csv(output_path, index=False)
+
+
+def write_synthetic_actions(path, n_events, seed=0):
+    """Write an actions CSV shaped like save_to_csv output"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for i in range(n_events):
+            event_type = rng.choices(['click', 'typing', 'scrolling', 'dragging'],
+                                     weights=[5, 2, 3, 1])[0]
+            row = dict.fromkeys(FIELDNAMES, '')
+            row['type'] = event_type
+            row['duration_seconds'] = 0
+            if event_type == 'click':
+                row['timestamp_datetime'] = '2025-09-01 10:06:23.245'
+                row['click_text'] = f"Button {rng.randint(1, 50)}"
+                row['hotspot_label'] = 'Click here'
+                row['page_url'] = rng.choice(URLS)
+                row['page_title'] = 'Page'
+                row['clickId'] = f"click-{i}"
+            else:
+                row['start_time_datetime'] = '2025-09-01 10:06:23.857'
+                row['end_time_datetime'] = '2025-09-01 10:06:24.842'
+                row['duration_seconds'] = 0.985
+            writer.writerow(row)
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'events':>10} {'reference (s)':>14} {'vectorized (s)':>15} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            input_path = os.path.join(tmp_dir, f"actions-{size}.csv")
+            reference_path = os.path.join(tmp_dir, f"reference-{size}.csv")
+            vectorized_path = os.path.join(tmp_dir, f"vectorized-{size}.csv")
+            write_synthetic_actions(input_path, size)
+
+            reference_time = time_call(reference_preprocess_csv, input_path, reference_path)
+            vectorized_time = time_call(preprocess_csv, input_path, vectorized_path)
+
+            if not filecmp.cmp(reference_path, vectorized_path, shallow=False):
+                raise SystemExit(f"Output mismatch at {size} events")
+
+            print(f"{size:>10} {reference_time:>14.3f} {vectorized_time:>15.3f} "
+                  f"{reference_time / vectorized_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
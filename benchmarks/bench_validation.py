@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark flow.json validation modes.
+
+Times model_validate_json (parse_flow) on the raw bytes, and json.loads on
+its own; the dict modes, FlowData.model_validate and unvalidated
+model_construct, are timed on the already parsed dict, so they compare like
+for like and json.loads + a dict mode is the cost of the original
+json.load + FlowData(**raw) path. model_construct runs in Python and is
+slower than pydantic-core validation for this schema even without the JSON
+parsing, which is why there is no "skip validation" mode in the pipeline.
+
+    poetry run python benchmarks/bench_validation.py --sizes 10000 100000
+"""
+
+import argparse
+import json
+import time
+
+from arcade_flow_analyzer.models import (
+    CapturedEvent, ClickContext, FlowData, Hotspot, PageContext, Step,
+    Timestamp, parse_flow
+)
+
+
+def scale_flow(raw, n_events):
+    """Repeat the sample flow's events and steps until it has n_events events"""
+    events = raw['capturedEvents']
+    steps = raw['steps']
+    scaled = dict(raw)
+    scaled['capturedEvents'] = []
+    scaled['steps'] = []
+    for i in range(n_events):
+        event = dict(events[i % len(events)])
+        if event.get('clickId'):
+            event['clickId'] = f"{event['clickId']}-{i}"
+        scaled['capturedEvents'].append(event)
+        step = dict(steps[i % len(steps)])
+        if step.get('id'):
+            step['id'] = f"{step['id']}-{i}"
+        scaled['steps'].append(step)
+    return scaled
+
+
+def construct_step(raw):
+    click_context = raw.get('clickContext')
+    page_context = raw.get('pageContext')
+    hotspots = raw.get('hotspots')
+    return Step.model_construct(**{
+        **raw,
+        'clickContext': ClickContext.model_construct(**click_context) if click_context else None,
+        'pageContext': PageContext.model_construct(**page_context) if page_context else None,
+        'hotspots': [Hotspot.model_construct(**hotspot) for hotspot in hotspots]
+        if hotspots is not None else None,
+    })
+
+
+def construct_flow(raw):
+    """Build FlowData from a parsed flow without any validation"""
+    return FlowData.model_construct(**{
+        **raw,
+        'created': Timestamp.model_construct(**raw['created']),
+        'capturedEvents': [CapturedEvent.model_construct(**event)
+                           for event in raw['capturedEvents']],
+        'steps': [construct_step(step) for step in raw['steps']],
+    })
+
+
+# mode: (function, whether it takes the parsed dict rather than the bytes)
+MODES = {
+    'validate_json': (parse_flow, False),
+    'json.loads': (json.loads, False),
+    'model_validate': (FlowData.model_validate, True),
+    'construct': (construct_flow, True),
+}
+
+
+def best_of(func, data, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flow', default='flow.json')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.flow, 'rb') as f:
+        sample = f.read()
+    raw = json.loads(sample)
+
+    payloads = [(len(raw['capturedEvents']), sample)]
+    for size in args.sizes:
+        payloads.append((size, json.dumps(scale_flow(raw, size)).encode('utf-8')))
+
+    print(f"{'events':>10} {'MB':>7} " + " ".join(f"{mode + ' (ms)':>18}" for mode in MODES))
+    for size, data in payloads:
+        parsed = json.loads(data)
+        timings = [best_of(func, parsed if takes_dict else data, args.repeat) * 1000
+                   for func, takes_dict in MODES.values()]
+        print(f"{size:>10} {len(data) / 1e6:>7.2f} " +
+              " ".join(f"{timing:>18.2f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
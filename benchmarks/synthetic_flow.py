@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic, schema-valid Arcade flows for benchmarks and load tests.
+
+Flows are shaped like the sample flow.json: a mix of click, typing,
+scrolling and dragging events, one IMAGE step per click (up to a limit) with
+hotspots, page and click context, occasional VIDEO steps, and CHAPTER steps
+at the start and end. Output is deterministic for a given seed.
+
+    poetry run python benchmarks/synthetic_flow.py --events 10000 -o flow-10k.json
+"""
+
+import argparse
+import json
+import random
+import uuid
+
+EVENT_TYPES = ['click', 'typing', 'scrolling', 'dragging']
+EVENT_WEIGHTS = [5, 1, 3, 1]
+
+# (host, path template, search parameter, page title template)
+SITES = [
+    ('www.target.com', '/s', 'searchTerm', '{term} : Target'),
+    ('www.amazon.com', '/s', 'k', 'Amazon.com : {term}'),
+    ('www.google.com', '/search', 'q', '{term} - Google Search'),
+    ('www.example.com', '/search', 'query', 'Search results for {term}'),
+    ('shop.example.org', '/catalog', 'keywords', '{term} | Example Shop'),
+]
+
+SEARCH_TERMS = ['scooter', 'running shoes', 'coffee maker', 'desk lamp',
+                'headphones', 'backpack', 'water bottle', 'yoga mat']
+
+CLICK_TEXTS = ['search', 'Add to cart', 'Checkout', 'View cart', 'Continue',
+               'Sign in', 'Product image', 'Filter', 'Sort by', 'Next page']
+
+HOTSPOT_LABELS = [
+    "Tap the search bar to start looking for your next favorite product.",
+    "Click *Add to cart* to save this item for checkout.",
+    "Open your cart to review the items you picked.",
+    "Use the filters to narrow down the results.",
+    "Select a product to see more details.",
+]
+
+START_TIME_MS = 1756746383245
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def build_urls(n_urls, rng):
+    """Build n_urls distinct page URLs, mostly search result pages"""
+    urls = []
+    for i in range(n_urls):
+        host, path, param, title = SITES[i % len(SITES)]
+        term = SEARCH_TERMS[rng.randrange(len(SEARCH_TERMS))]
+        if i % 4 == 3:
+            # Product pages carry no search term
+            urls.append((f"https://{host}/p/item-{i}", f"Item {i} : {host}"))
+        else:
+            query = f"{param}={term.replace(' ', '+')}&page={i // len(SITES) + 1}"
+            urls.append((f"https://{host}{path}?{query}", title.format(term=term)))
+    return urls
+
+
+def generate_flow(n_events, n_steps=None, hotspots_per_step=1, n_urls=20, seed=0):
+    """Return a flow dict with n_events captured events
+
+    n_steps caps the number of IMAGE steps (one per click, default: every
+    click); each IMAGE step has hotspots_per_step hotspots and one of n_urls
+    distinct page URLs.
+    """
+    rng = random.Random(seed)
+    urls = build_urls(max(1, n_urls), rng)
+
+    events = []
+    steps = []
+    image_steps = 0
+    time_ms = START_TIME_MS
+    for _ in range(n_events):
+        event_type = rng.choices(EVENT_TYPES, weights=EVENT_WEIGHTS)[0]
+        time_ms += rng.randint(200, 3000)
+        if event_type == 'click':
+            click_id = _uuid(rng)
+            events.append({
+                'type': 'click',
+                'clickId': click_id,
+                'frameX': round(rng.uniform(0, 1700), 3),
+                'frameY': round(rng.uniform(0, 900), 3),
+                'timeMs': time_ms,
+                'tabId': 471877758,
+                'frameId': 0,
+            })
+            if n_steps is None or image_steps < n_steps:
+                url, title = urls[rng.randrange(len(urls))]
+                steps.append({
+                    'id': click_id,
+                    'type': 'IMAGE',
+                    'hotspots': [{
+                        'id': _uuid(rng),
+                        'width': 40,
+                        'height': 40,
+                        'label': HOTSPOT_LABELS[rng.randrange(len(HOTSPOT_LABELS))],
+                        'style': 'pulsating',
+                        'defaultOpen': True,
+                        'textColor': '#fdfdff',
+                        'bgColor': '#2142e7',
+                        'x': round(rng.random(), 6),
+                        'y': round(rng.random(), 6),
+                    } for _ in range(hotspots_per_step)],
+                    'pageContext': {'url': url, 'title': title},
+                    'clickContext': {
+                        'text': CLICK_TEXTS[rng.randrange(len(CLICK_TEXTS))],
+                        'elementType': 'other',
+                    },
+                })
+                image_steps += 1
+                if rng.random() < 0.05:
+                    steps.append({'id': _uuid(rng), 'type': 'VIDEO'})
+        else:
+            duration = rng.randint(300, 6000)
+            events.append({
+                'type': event_type,
+                'startTimeMs': time_ms,
+                'endTimeMs': time_ms + duration,
+                'tabId': 471877758,
+                'frameId': 0,
+            })
+            time_ms += duration
+
+    name = f"Synthetic flow with {n_events} events"
+    steps = ([{'id': _uuid(rng), 'type': 'CHAPTER', 'title': name}] + steps +
+             [{'id': _uuid(rng), 'type': 'CHAPTER', 'title': 'Thanks for watching'}])
+
+    return {
+        'name': name,
+        'description': '',
+        'createdBy': 'synthetic',
+        'teamId': f"team-{seed}",
+        'useCase': 'promotional',
+        'hasUsedAI': False,
+        'schemaVersion': '1.1.0',
+        'status': 1,
+        'created': {'_seconds': START_TIME_MS // 1000, '_nanoseconds': 0},
+        'capturedEvents': events,
+        'steps': steps,
+    }
+
+
+def write_flow(path, n_events, **options):
+    """Generate a flow and write it as JSON, returning its size in bytes"""
+    data = json.dumps(generate_flow(n_events, **options)).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--steps', type=int, default=None,
+                        help="Maximum IMAGE steps (default: one per click)")
+    parser.add_argument('--hotspots', type=int, default=1,
+                        help="Hotspots per IMAGE step")
+    parser.add_argument('--urls', type=int, default=20,
+                        help="Number of distinct page URLs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='synthetic-flow.json')
+    args = parser.parse_args()
+
+    size = write_flow(args.output, args.events, n_steps=args.steps,
+                      hotspots_per_step=args.hotspots, n_urls=args.urls,
+                      seed=args.seed)
+    print(f"Wrote {args.output} ({args.events} events, {size / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
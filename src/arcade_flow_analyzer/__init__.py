@@ -2,14 +2,37 @@
 Arcade Flow Analyzer
 
 A Python package for analyzing Arcade flow data and generating reports.
+
+Exports are imported on first access (see _lazy), so `import
+arcade_flow_analyzer` stays cheap and process_flow does not pull in pandas,
+langchain or openai.
 """
 
-from .models import FlowData, CapturedEvent, Step, Timestamp, ClickContext, PageContext
-from .extractors import process_flow, save_to_csv, basic_extractor_main
-from .analysis import preprocess_csv, summarize_actions
-from .visualization import generate_flow_image
+from ._lazy import lazy_exports
 
 __version__ = "0.1.0"
+
+_EXPORTS = {
+    "FlowData": ".models",
+    "CapturedEvent": ".models",
+    "Step": ".models",
+    "Timestamp": ".models",
+    "ClickContext": ".models",
+    "PageContext": ".models",
+    "parse_flow": ".models",
+    "InvalidFlowError": ".models",
+    "process_flow": ".extractors",
+    "save_to_csv": ".extractors",
+    "basic_extractor_main": ".extractors",
+    "preprocess_csv": ".analysis",
+    "summarize_actions": ".analysis",
+    "summarize_variants": ".analysis",
+    "generate_flow_image": ".visualization",
+    "create_markdown_report": ".report",
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
 __all__ = [
     "FlowData",
     "CapturedEvent", 
@@ -17,10 +40,14 @@ __all__ = [
     "Timestamp",
     "ClickContext",
     "PageContext",
+    "parse_flow",
+    "InvalidFlowError",
     "process_flow",
     "save_to_csv",
     "basic_extractor_main",
     "preprocess_csv",
     "summarize_actions",
-    "generate_flow_image"
+    "summarize_variants",
+    "generate_flow_image",
+    "create_markdown_report"
 ]
@@ -0,0 +1,34 @@
+"""
+Lazy package exports (PEP 562).
+
+Importing the package must stay cheap: pandas, langchain and openai take
+seconds to import, and most entry points (extraction workers, the CLI's
+--help) never touch them. Packages list their exports with the submodule
+that defines each one, and the submodule is only imported on first access.
+"""
+
+import importlib
+import sys
+
+
+def lazy_exports(package, exports):
+    """Return (__getattr__, __dir__) for a package with lazily imported exports
+
+    exports maps each exported name to the relative submodule defining it,
+    e.g. {'process_flow': '.extractors'}, or to 'submodule:attribute' when the
+    name differs there. A name is imported on first access and then stored on
+    the package, so later lookups are plain attribute reads.
+    """
+    def __getattr__(name):
+        target = exports.get(name)
+        if target is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        module_name, _, attribute = target.partition(':')
+        value = getattr(importlib.import_module(module_name, package), attribute or name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
@@ -2,7 +2,20 @@
 Analysis module for processing and summarizing user journey data.
 """
 
-from .csv_preprocessor import preprocess_csv
-from .summarize import summarize_actions
+from .._lazy import lazy_exports
 
-__all__ = ['preprocess_csv', 'summarize_actions']
+_EXPORTS = {
+    'preprocess_csv': '.csv_preprocessor',
+    'SearchTermExtractor': '.search_terms',
+    'get_search_term_extractor': '.search_terms',
+    'summarize_actions': '.summarize',
+    'asummarize_actions': '.summarize',
+    'summarize_variants': '.variants',
+    'pick_variant': '.variants',
+    'VARIANTS': '.variants',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = ['preprocess_csv', 'SearchTermExtractor', 'get_search_term_extractor', 'summarize_actions', 'asummarize_actions',
+           'summarize_variants', 'pick_variant', 'VARIANTS']
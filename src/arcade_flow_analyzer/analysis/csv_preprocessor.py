@@ -3,38 +3,17 @@ CSV preprocessing for extracting search terms and creating action descriptions.
 """
 
 import pandas as pd
-import re
-from urllib.parse import unquote
+
+from ..extractors.events import EVENT_FIELDS, EventTable
+from ..telemetry import span
+from .search_terms import get_search_term_extractor
 
 
 def extract_search_term_from_url(page_url):
     """Extract search term from URL parameters"""
     if not page_url or pd.isna(page_url):
         return ""
-    page_url = str(page_url)
-
-    # Common search parameter patterns across different sites
-    # Patterns are AI Generated
-    search_patterns = [
-        r'searchTermRaw=([^&]+)',
-        r'searchTerm=([^&]+)',
-        r'[?&]q=([^&]+)',
-        r'[?&]k=([^&]+)',
-        r'[?&]st=([^&]+)',
-        r'[?&]query=([^&]+)',
-        r'[?&]search=([^&]+)',
-        r'[?&]term=([^&]+)',
-        r'[?&]keywords=([^&]+)',
-    ]
-
-    for pattern in search_patterns:
-        match = re.search(pattern, page_url, re.IGNORECASE)
-        if match:
-            search_term = match.group(1)
-            # URL decode the search term
-            return unquote(search_term)
-
-    return ""
+    return get_search_term_extractor()(str(page_url))
 
 
 def create_action_description(row):
@@ -55,27 +34,114 @@ def create_action_description(row):
         return f"Performed {row['type']} action"
 
 
-def preprocess_csv(input_path, output_path):
-    """Preprocess CSV to add search term extraction"""
-    df = pd.read_csv(input_path)
+# Number of rows after a click that are checked for typing and search terms
+SEARCH_WINDOW = 5
+
+
+def find_click_search_terms(df):
+    """Return the search term associated with each click that precedes typing
+
+    A click gets the first non-empty URL search term from the next
+    SEARCH_WINDOW rows, but only if one of those rows is a typing event.
+    Computed with shifted columns instead of a per-row scan.
+    """
+    types = df['type']
+    terms = df['search_term_from_url']
+
+    typing_ahead = pd.Series(False, index=df.index)
+    term_ahead = pd.Series("", index=df.index, dtype=object)
+
+    # Walk from the farthest row back to the nearest so the nearest
+    # non-empty search term ends up winning
+    for offset in range(SEARCH_WINDOW, 0, -1):
+        typing_ahead |= types.shift(-offset).eq('typing')
+        shifted = terms.shift(-offset, fill_value="")
+        term_ahead = shifted.where(shifted != "", term_ahead)
 
+    return term_ahead.where(types.eq('click') & typing_ahead, "")
+
+
+def describe_actions(df):
+    """Vectorized equivalent of applying create_action_description per row"""
+    types = df['type'].astype(str)
+    click_text = df['click_text'].astype(str)
+    term = df['extracted_search_term']
+    has_term = term != ""
+
+    descriptions = "Performed " + types + " action"
+    descriptions = descriptions.mask(types == 'scrolling', "Scrolled the page")
+    descriptions = descriptions.mask(types == 'typing', "Typed text")
+    descriptions = descriptions.mask(
+        (types == 'typing') & has_term,
+        "Typed text (likely searching for: " + term + ")"
+    )
+    descriptions = descriptions.mask(
+        types == 'click', "Clicked on '" + click_text + "'"
+    )
+    descriptions = descriptions.mask(
+        (types == 'click') & has_term,
+        "Clicked on '" + click_text + "' (searching for: " + term + ")"
+    )
+    return descriptions
+
+
+def preprocess_actions(df):
+    """Add search term extraction and action descriptions to an actions frame"""
     df['search_term_from_url'] = df['page_url'].apply(extract_search_term_from_url)
-    df['extracted_search_term'] = ""
 
     # Checking if a click action was followed by typing
     # Used to extract search terms from URLs
-    for i in range(len(df)):
-        if df.iloc[i]['type'] == 'click':
-            for j in range(i + 1, min(i + 6, len(df))):
-                if df.iloc[j]['type'] == 'typing':
-                    for k in range(i + 1, min(i + 6, len(df))):
-                        search_term = extract_search_term_from_url(df.iloc[k]['page_url'])
-                        if search_term:
-                            df.iloc[i, df.columns.get_loc('extracted_search_term')] = search_term
-                            break
-                    break
-
-    df['action_description'] = df.apply(create_action_description, axis=1)
+    df['extracted_search_term'] = find_click_search_terms(df)
+
+    df['action_description'] = describe_actions(df)
+    return df
+
+
+def events_to_frame(events):
+    """Build the actions frame directly from process_flow event rows"""
+    if isinstance(events, EventTable):
+        df = pd.DataFrame(events.columns(), columns=EVENT_FIELDS)
+    else:
+        df = pd.DataFrame(list(events), columns=EVENT_FIELDS)
+    df['duration_seconds'] = df['duration_seconds'].astype(float)
+    return df
+
+
+def read_actions_csv(path):
+    """Read an actions CSV back into the frame it was written from
+
+    Blank cells stay empty strings instead of becoming NaN, so prompts and
+    cache keys built from the frame match those of an in-memory run.
+    """
+    return pd.read_csv(path, keep_default_na=False)
+
+
+def load_processed_actions(input_path=None, flow=None, output_path=None):
+    """Return the preprocessed actions frame for a flow
+
+    Uses the in-memory events of a process_flow result when `flow` is given,
+    otherwise reads the actions CSV at input_path. The processed rows are
+    only written to output_path if one is given.
+    """
+    with span('preprocess', source='memory' if flow is not None else 'csv') as preprocess_span:
+        if flow is not None:
+            df = events_to_frame(flow['events'])
+        else:
+            df = read_actions_csv(input_path)
+
+        df = preprocess_actions(df)
+        preprocess_span.set(rows=len(df))
+
+        if output_path:
+            df.to_csv(output_path, index=False)
+    return df
+
+
+def preprocess_csv(input_path, output_path):
+    """Preprocess CSV to add search term extraction"""
+    df = read_actions_csv(input_path)
+
+    df = preprocess_actions(df)
 
     # Save processed data
     df.to_csv(output_path, index=False)
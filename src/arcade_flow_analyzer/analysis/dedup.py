@@ -0,0 +1,201 @@
+"""
+Deduplication of summary chain calls across flows.
+
+Many flows are recordings of the same journey by different users. Their
+events differ (timestamps, ids), so each has its own flow hash and its own
+summary cache entries, yet they need the same summary. Two layers in front of
+the chains avoid paying for it again:
+
+- Exact prompts: the steps chain output is cached by the hash of the rendered
+  steps prompt, and the summary by the hash of the steps it summarizes, so a
+  flow whose prompt matches one already sent is served from the cache.
+- Near duplicates (opt-in): each summarized flow is indexed by a MinHash
+  signature of its action sequence, built from the same fields the steps
+  prompt shows (shingles of consecutive prompt lines). When
+  ARCADE_DEDUP_THRESHOLD is set, a flow whose estimated Jaccard similarity to
+  an indexed flow reaches it reuses that flow's steps and summary, and so its
+  image, which is keyed by the summary text. Earlier versions of the same
+  flow (same flow_identity) are never reused, so an edit is always analyzed.
+
+The index lives in the cache: one entry per flow with its signature, and
+LSH band entries listing the flows sharing a band of signature values.
+Index updates are read-modify-write, so concurrent writers may drop an
+entry; that only costs a missed reuse.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+
+from arcade_flow_analyzer.caching import cache_key, text_hash
+from arcade_flow_analyzer.analysis.prompt_builder import format_action
+
+# Threshold used when ARCADE_DEDUP_THRESHOLD is 'on'
+DEFAULT_THRESHOLD = 0.9
+# Bump when the signature tokens change, so old index entries are not compared
+SIGNATURE_VERSION = 2
+
+# Consecutive actions per shingle
+SHINGLE_SIZE = 3
+# MinHash values per signature, split into LSH bands of BAND_ROWS values
+NUM_PERM = 64
+BAND_ROWS = 4
+# Flows remembered per band entry, newest first
+MAX_BAND_FLOWS = 50
+
+_MASK64 = (1 << 64) - 1
+_rng = random.Random(0x5EED)
+# Odd multipliers and offsets of the multiply-shift hash functions
+_HASH_A = [_rng.getrandbits(64) | 1 for _ in range(NUM_PERM)]
+_HASH_B = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+
+_SPACES = re.compile(r'\s+')
+
+
+def get_dedup_threshold():
+    """The near-duplicate threshold from ARCADE_DEDUP_THRESHOLD, None when off
+
+    Near-duplicate reuse is off unless the variable is set; 'on' selects
+    DEFAULT_THRESHOLD.
+    """
+    value = os.getenv('ARCADE_DEDUP_THRESHOLD', '').strip().lower()
+    if not value or value in ('off', 'none', 'false'):
+        return None
+    if value in ('on', 'true'):
+        return DEFAULT_THRESHOLD
+    try:
+        threshold = float(value)
+    except ValueError:
+        threshold = None
+    if threshold is None or not 0 < threshold <= 1:
+        raise ValueError(f"ARCADE_DEDUP_THRESHOLD must be in (0, 1], 'on' or 'off', got {value}")
+    return threshold
+
+
+def normalize_action(action):
+    """The full-detail prompt line of an action, with case and spacing normalized
+
+    Only what the steps prompt shows counts, so two flows are near duplicates
+    only if their prompts are: a changed label, click text or page title
+    changes the token.
+    """
+    return _SPACES.sub(' ', format_action(action, 'full').lower()).strip()
+
+
+def action_tokens(actions):
+    """The normalized action sequence of a processed actions frame
+
+    Repeats of the same action are collapsed, so the sequence does not depend
+    on how many times a user scrolled or typed.
+    """
+    tokens = []
+    for description, page_title, hotspot_label in zip(
+            actions['action_description'], actions['page_title'], actions['hotspot_label']):
+        token = normalize_action({'action_description': description,
+                                  'page_title': page_title,
+                                  'hotspot_label': hotspot_label})
+        if not tokens or tokens[-1] != token:
+            tokens.append(token)
+    return tokens
+
+
+def shingles(tokens, size=SHINGLE_SIZE):
+    """The set of runs of size consecutive tokens (the whole sequence if shorter)"""
+    if len(tokens) <= size:
+        return {"\x1f".join(tokens)}
+    return {"\x1f".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash signature (NUM_PERM ints) of a set of strings"""
+    import numpy as np
+
+    values = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(),
+                        'little') for shingle in shingle_set),
+        dtype=np.uint64, count=len(shingle_set)
+    )
+    a = np.array(_HASH_A, dtype=np.uint64)[:, None]
+    b = np.array(_HASH_B, dtype=np.uint64)[:, None]
+    # Multiply-shift hashing; uint64 arithmetic wraps modulo 2**64
+    with np.errstate(over='ignore'):
+        hashed = (a * values[None, :] + b) >> np.uint64(32)
+    return hashed.min(axis=1).tolist()
+
+
+def action_signature(actions):
+    """MinHash signature of a processed actions frame"""
+    return minhash(shingles(action_tokens(actions)))
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+def steps_prompt_key(context, steps_prompt_id, model):
+    """Cache key of the steps generated for a rendered steps prompt"""
+    return cache_key(text_hash(context), 'steps-prompt', steps_prompt_id, model)
+
+
+def summary_prompt_key(steps, summary_prompt, model):
+    """Cache key of the summary generated from a list of steps"""
+    return cache_key(text_hash(steps), 'summary-prompt', summary_prompt, model)
+
+
+class DedupIndex:
+    """Near-duplicate index of the flows summarized with one prompt and model"""
+
+    def __init__(self, cache, steps_prompt_id, model):
+        self.cache = cache
+        self.steps_prompt_id = steps_prompt_id
+        self.model = model
+
+    def _signature_key(self, flow_hash):
+        return cache_key(flow_hash, f'dedup-signature-v{SIGNATURE_VERSION}',
+                         self.steps_prompt_id, self.model)
+
+    def _band_keys(self, signature):
+        return [cache_key(text_hash(f"{start}:{signature[start:start + BAND_ROWS]}"),
+                          f'dedup-band-v{SIGNATURE_VERSION}', self.steps_prompt_id, self.model)
+                for start in range(0, NUM_PERM, BAND_ROWS)]
+
+    def add(self, flow_hash, signature, flow_id=None):
+        """Index a summarized flow under its signature and flow identity"""
+        self.cache.set_text(self._signature_key(flow_hash),
+                            json.dumps({'signature': signature, 'flow_id': flow_id}))
+        for band_key in self._band_keys(signature):
+            stored = self.cache.get_text(band_key)
+            flows = json.loads(stored) if stored else []
+            if flow_hash in flows:
+                continue
+            self.cache.set_text(band_key, json.dumps([flow_hash] + flows[:MAX_BAND_FLOWS - 1]))
+
+    def find(self, flow_hash, signature, threshold, flow_id=None):
+        """Return (flow_hash, similarity) of the most similar other indexed flow
+
+        Only flows sharing at least one band with signature are compared, and
+        other versions of the flow identified by flow_id are skipped; None if
+        none reaches threshold.
+        """
+        candidates = []
+        for band_key in self._band_keys(signature):
+            stored = self.cache.get_text(band_key)
+            for candidate in json.loads(stored) if stored else []:
+                if candidate != flow_hash and candidate not in candidates:
+                    candidates.append(candidate)
+
+        best = None
+        for candidate in candidates:
+            stored = self.cache.get_text(self._signature_key(candidate))
+            if stored is None:
+                continue
+            entry = json.loads(stored)
+            if flow_id is not None and entry['flow_id'] == flow_id:
+                continue
+            score = similarity(signature, entry['signature'])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
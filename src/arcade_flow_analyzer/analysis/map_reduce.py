@@ -0,0 +1,179 @@
+"""
+Map-reduce summarization for very long flows.
+
+The processed actions are split into segments at page changes (and at a
+maximum segment length). Each segment is summarized independently and
+concurrently (map), then the segment summaries are merged into one
+step-by-step list (reduce). Segment summaries are cached by the hash of the
+segment's prompt context, so when a flow is edited only the segments that
+actually changed are sent to the model again.
+"""
+
+import asyncio
+
+from arcade_flow_analyzer.analysis.prompt_builder import build_actions_prompt
+from arcade_flow_analyzer.caching import cache_key, text_hash
+from arcade_flow_analyzer.retry import (
+    DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT, call_with_retry
+)
+
+DEFAULT_SEGMENT_ACTIONS = 100
+DEFAULT_SEGMENT_TOKEN_BUDGET = 2000
+DEFAULT_MAP_CONCURRENCY = 4
+
+MAP_PROMPT = """You are an AI assistant that summarizes user actions in detail.
+The lines below are one segment of a longer user journey, in order. 'page' is
+the title of the page the action happened on and 'hint' is the guidance shown
+to the user; repeated actions are marked (xN). Provide a concise step-by-step
+list of what the user did in this segment. Here are the actions:
+
+{context}"""
+
+REDUCE_PROMPT = """You are an AI assistant that summarizes user actions in detail.
+Below are step-by-step summaries of consecutive segments of one user journey,
+in order. Merge them into a single clear, step-by-step list of the user's
+journey, removing repetition between segments. No need to include time stamps
+or other metadata.
+
+{context}"""
+
+
+def split_segments(actions, max_actions=DEFAULT_SEGMENT_ACTIONS):
+    """Split processed actions into segments at page changes
+
+    Rows without a page title (typing, scrolling) stay with the current
+    segment. Segments never exceed max_actions rows.
+    """
+    segments = []
+    start = 0
+    current_page = None
+    page_titles = actions['page_title'].tolist()
+
+    for i, page_title in enumerate(page_titles):
+        has_page = isinstance(page_title, str) and page_title != ''
+        page_changed = has_page and current_page is not None and page_title != current_page
+        if i > start and (page_changed or i - start >= max_actions):
+            segments.append(actions.iloc[start:i])
+            start = i
+        if has_page:
+            current_page = page_title
+
+    if start < len(page_titles):
+        segments.append(actions.iloc[start:])
+    return segments
+
+
+def _segment_contexts(actions, max_actions, token_budget, model):
+    contexts = []
+    for segment in split_segments(actions, max_actions):
+        context, _ = build_actions_prompt(segment, token_budget, model)
+        contexts.append(context)
+    return contexts
+
+
+def _segment_key(context, model):
+    return cache_key(text_hash(context), 'segment-steps', MAP_PROMPT, model)
+
+
+def _cached_segments(keys, cache):
+    """Look up cached summaries for the distinct segment keys"""
+    cached = {}
+    for key in keys:
+        if key not in cached:
+            summary = cache.get_text(key)
+            if summary is not None:
+                cached[key] = summary
+    return cached
+
+
+def _missing_segments(keys, cached):
+    """Map each uncached key to the first segment index that produces it
+
+    Repeated segments (e.g. the same page visited twice) are only
+    summarized once.
+    """
+    missing = {}
+    for i, key in enumerate(keys):
+        if key not in cached and key not in missing:
+            missing[key] = i
+    return missing
+
+
+def _reduce_context(segment_summaries):
+    return "\n\n".join(f"Segment {i}:\n{summary.strip()}"
+                       for i, summary in enumerate(segment_summaries, 1))
+
+
+def _build_chains(llm):
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    map_chain = (ChatPromptTemplate.from_messages([("system", MAP_PROMPT)]) |
+                 llm | StrOutputParser())
+    reduce_chain = (ChatPromptTemplate.from_messages([("system", REDUCE_PROMPT)]) |
+                    llm | StrOutputParser())
+    return map_chain, reduce_chain
+
+
+def map_reduce_steps(actions, llm, cache, model,
+                     max_actions=DEFAULT_SEGMENT_ACTIONS,
+                     token_budget=DEFAULT_SEGMENT_TOKEN_BUDGET,
+                     concurrency=DEFAULT_MAP_CONCURRENCY):
+    """Summarize actions segment by segment and merge the results
+
+    Uncached segments are summarized concurrently with Runnable.batch.
+    Returns (steps, stats).
+    """
+    contexts = _segment_contexts(actions, max_actions, token_budget, model)
+    keys = [_segment_key(context, model) for context in contexts]
+    cached = _cached_segments(keys, cache)
+    missing = _missing_segments(keys, cached)
+
+    map_chain, reduce_chain = _build_chains(llm)
+    print(f"Map-reduce: {len(contexts)} segments, {len(missing)} to summarize")
+
+    if missing:
+        results = map_chain.batch([{"context": contexts[i]} for i in missing.values()],
+                                  config={"max_concurrency": concurrency})
+        for key, result in zip(missing, results):
+            cached[key] = result
+            cache.set_text(key, result)
+
+    summaries = [cached[key] for key in keys]
+    steps = reduce_chain.invoke({"context": _reduce_context(summaries)})
+    stats = {'segments': len(contexts), 'segments_generated': len(missing)}
+    return steps, stats
+
+
+async def amap_reduce_steps(actions, llm, cache, model, semaphore=None,
+                            timeout=DEFAULT_TIMEOUT,
+                            max_retries=DEFAULT_MAX_RETRIES,
+                            max_actions=DEFAULT_SEGMENT_ACTIONS,
+                            token_budget=DEFAULT_SEGMENT_TOKEN_BUDGET):
+    """Async variant of map_reduce_steps; every call goes through call_with_retry"""
+    contexts = await asyncio.to_thread(_segment_contexts, actions, max_actions,
+                                       token_budget, model)
+    keys = [_segment_key(context, model) for context in contexts]
+    cached = await asyncio.to_thread(_cached_segments, keys, cache)
+    missing = _missing_segments(keys, cached)
+
+    map_chain, reduce_chain = _build_chains(llm)
+    print(f"Map-reduce: {len(contexts)} segments, {len(missing)} to summarize")
+
+    async def summarize_segment(key, i):
+        result = await call_with_retry(
+            lambda: map_chain.ainvoke({"context": contexts[i]}),
+            semaphore, timeout, max_retries
+        )
+        await asyncio.to_thread(cache.set_text, key, result)
+        cached[key] = result
+
+    await asyncio.gather(*(summarize_segment(key, i) for key, i in missing.items()))
+
+    summaries = [cached[key] for key in keys]
+    steps = await call_with_retry(
+        lambda: reduce_chain.ainvoke({"context": _reduce_context(summaries)}),
+        semaphore, timeout, max_retries
+    )
+    stats = {'segments': len(contexts), 'segments_generated': len(missing)}
+    return steps, stats
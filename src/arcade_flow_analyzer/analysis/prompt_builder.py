@@ -0,0 +1,123 @@
+"""
+Compact, token-budgeted prompt context for the steps chain.
+
+Instead of one verbose "column: value" document per CSV row, each action
+becomes a single numbered line with only the fields the model needs:
+
+    3. Clicked on 'Add to cart' | page: Razor A5 Lux Kick Scooter : Target | hint: Click *Add to cart* ...
+    4. Scrolled the page (x3)
+
+Consecutive identical actions are collapsed, and the context is shrunk to fit
+a token budget by first dropping hotspot hints, then page titles, and finally
+omitting actions from the middle of the journey.
+"""
+
+import functools
+import itertools
+
+DEFAULT_TOKEN_BUDGET = 3000
+
+# Approximate characters per token when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+# Progressively less detailed line formats tried to fit the budget
+DETAIL_LEVELS = ['full', 'no hints', 'descriptions only']
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model):
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # Unknown model, tiktoken missing or its BPE files unavailable offline
+        return None
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Count tokens with tiktoken, falling back to a character estimate"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def _text(value):
+    if value is None or value != value:  # None or NaN
+        return ''
+    return str(value).strip()
+
+
+def format_action(row, detail='full'):
+    """Format one processed action (a dict-like row) as a compact line body"""
+    parts = [_text(row['action_description'])]
+    if detail in ('full', 'no hints') and _text(row['page_title']):
+        parts.append(f"page: {_text(row['page_title'])}")
+    if detail == 'full' and _text(row['hotspot_label']):
+        parts.append(f"hint: {_text(row['hotspot_label'])}")
+    return " | ".join(parts)
+
+
+def collapse_repeats(actions):
+    """Collapse runs of identical consecutive actions into 'action (xN)'"""
+    collapsed = []
+    previous = None
+    count = 0
+    for action in actions:
+        if action == previous:
+            count += 1
+            continue
+        if previous is not None:
+            collapsed.append(previous if count == 1 else f"{previous} (x{count})")
+        previous = action
+        count = 1
+    if previous is not None:
+        collapsed.append(previous if count == 1 else f"{previous} (x{count})")
+    return collapsed
+
+
+def _fit_by_omitting(lines, line_tokens, budget, model):
+    """Drop lines from the middle until the remainder fits the budget"""
+    prefix = list(itertools.accumulate(line_tokens, initial=0))
+    total_tokens = prefix[-1]
+    head = len(lines) // 2
+    tail = len(lines) - head
+    while head + tail > 0:
+        omitted = len(lines) - head - tail
+        marker = f"... ({omitted} actions omitted) ..."
+        kept_tokens = prefix[head] + total_tokens - prefix[len(lines) - tail]
+        if kept_tokens + count_tokens(marker, model) <= budget:
+            return lines[:head] + [marker] + lines[len(lines) - tail:], omitted
+        # Shrink the longer side first so the start and end stay balanced
+        if head >= tail:
+            head -= 1
+        else:
+            tail -= 1
+    return [f"... ({len(lines)} actions omitted) ..."], len(lines)
+
+
+def build_actions_prompt(df, token_budget=DEFAULT_TOKEN_BUDGET, model="gpt-3.5-turbo"):
+    """Build the compact action context for a processed actions frame
+
+    Returns (context, stats) where stats reports the row, line and token
+    counts, the detail level used and how many actions were omitted.
+    """
+    rows = df.to_dict('records')
+    stats = {'rows': len(rows), 'token_budget': token_budget, 'omitted': 0}
+
+    for detail in DETAIL_LEVELS:
+        actions = collapse_repeats(format_action(row, detail) for row in rows)
+        lines = [f"{i}. {action}" for i, action in enumerate(actions, 1)]
+        context = "\n".join(lines)
+        tokens = count_tokens(context, model)
+        if tokens <= token_budget:
+            stats.update(lines=len(lines), tokens=tokens, detail=detail)
+            return context, stats
+
+    # Even bare descriptions are over budget: keep the start and end
+    line_tokens = [count_tokens(line, model) + 1 for line in lines]
+    lines, omitted = _fit_by_omitting(lines, line_tokens, token_budget, model)
+    context = "\n".join(lines)
+    stats.update(lines=len(lines), tokens=count_tokens(context, model),
+                 detail=DETAIL_LEVELS[-1], omitted=omitted)
+    return context, stats
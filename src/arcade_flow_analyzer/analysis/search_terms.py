@@ -0,0 +1,118 @@
+"""
+Search term extraction from page URLs.
+
+The query string (and a parameter-style fragment) is parsed once with
+urllib.parse and the configured parameter names are looked up in priority
+order, case-insensitively. Sites can override the parameter names, and
+results are memoized per URL since flows revisit the same handful of pages.
+
+Rules can be loaded from a JSON config file:
+
+    {
+        "default": ["searchTermRaw", "searchTerm", "q"],
+        "sites": {"amazon.com": ["k", "field-keywords"]}
+    }
+
+Site keys match the URL host and any of its subdomains.
+"""
+
+import functools
+import json
+import os
+from urllib.parse import parse_qsl, urlsplit
+
+# Common search parameter names across different sites, in priority order
+DEFAULT_SEARCH_PARAMS = [
+    'searchTermRaw',
+    'searchTerm',
+    'q',
+    'k',
+    'st',
+    'query',
+    'search',
+    'term',
+    'keywords',
+]
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+class SearchTermExtractor:
+    """Memoized URL search term extractor with per-site parameter rules"""
+
+    def __init__(self, params=None, site_params=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.params = [name.lower() for name in (params or DEFAULT_SEARCH_PARAMS)]
+        self.site_params = {
+            site.lower(): [name.lower() for name in names]
+            for site, names in (site_params or {}).items()
+        }
+        self._extract = functools.lru_cache(maxsize=cache_size)(self._extract_uncached)
+
+    @classmethod
+    def from_config(cls, config_path, cache_size=DEFAULT_CACHE_SIZE):
+        """Build an extractor from a JSON rules file"""
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+        return cls(config.get('default'), config.get('sites'), cache_size)
+
+    def __call__(self, page_url):
+        if not page_url or not isinstance(page_url, str):
+            return ""
+        return self._extract(page_url)
+
+    def _params_for_host(self, host):
+        """Site-specific parameter names first, then the defaults"""
+        for site, names in self.site_params.items():
+            if host == site or host.endswith('.' + site):
+                return names + [name for name in self.params if name not in names]
+        return self.params
+
+    def _extract_uncached(self, page_url):
+        if '=' not in page_url:
+            return ""
+        try:
+            parts = urlsplit(page_url)
+        except ValueError:
+            return ""
+
+        # First value wins for each parameter, matching names case-insensitively
+        values = {}
+        for component in (parts.query, parts.fragment):
+            for name, value in parse_qsl(component):
+                values.setdefault(name.lower(), value)
+
+        if not values:
+            return ""
+
+        for name in self._params_for_host((parts.hostname or '').lower()):
+            if values.get(name):
+                return values[name]
+        return ""
+
+    def cache_info(self):
+        """Return the underlying lru_cache statistics"""
+        return self._extract.cache_info()
+
+    @property
+    def hit_rate(self):
+        info = self.cache_info()
+        lookups = info.hits + info.misses
+        return info.hits / lookups if lookups else 0.0
+
+    def cache_clear(self):
+        self._extract.cache_clear()
+
+
+_default_extractor = None
+
+
+def get_search_term_extractor():
+    """Return the shared extractor, loading rules from ARCADE_SEARCH_PARAMS if set"""
+    global _default_extractor
+    if _default_extractor is None:
+        config_path = os.getenv('ARCADE_SEARCH_PARAMS')
+        if config_path:
+            _default_extractor = SearchTermExtractor.from_config(config_path)
+        else:
+            _default_extractor = SearchTermExtractor()
+    return _default_extractor
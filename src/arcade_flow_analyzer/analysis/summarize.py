@@ -5,21 +5,34 @@ Included agentic and non-agentic options.
 Non-agentic chain seems to perform better.
 
 LangChain csv agent is still experimental.
-"""
 
-import os
-from dotenv import load_dotenv
+LangChain and pandas are imported inside the functions that use them, so
+importing this module (e.g. for a cache lookup) stays cheap.
 
-from arcade_flow_analyzer.analysis.csv_preprocessor import preprocess_csv
+The chain approach is deduplicated across flows (see dedup): chain outputs
+are also cached by their exact prompt, and a near-duplicate of an already
+summarized flow reuses that flow's steps and summary.
+"""
 
-from langchain_openai import ChatOpenAI
-from langchain_experimental.agents.agent_toolkits import create_csv_agent
-from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.documents import Document
+import asyncio
+import math
+import os
 
-load_dotenv()
+from arcade_flow_analyzer.analysis.dedup import (
+    DedupIndex, action_signature, get_dedup_threshold, steps_prompt_key, summary_prompt_key
+)
+from arcade_flow_analyzer.analysis.map_reduce import (
+    MAP_PROMPT, REDUCE_PROMPT, amap_reduce_steps, map_reduce_steps
+)
+from arcade_flow_analyzer.analysis.prompt_builder import (
+    DEFAULT_TOKEN_BUDGET, build_actions_prompt
+)
+from arcade_flow_analyzer.caching import cache_key, flow_hash_from_csv, get_cache
+from arcade_flow_analyzer.providers import CHAT_MODEL, get_provider
+from arcade_flow_analyzer.retry import (
+    DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT, call_with_retry
+)
+from arcade_flow_analyzer.telemetry import span, track_llm_usage
 
 BASE_PROMPT = """You are an AI assistant that summarizes user actions in detail
 from a CSV file. The CSV file now has columns including 'action_description'
@@ -27,97 +40,373 @@ to help you understand the user's journey. Your task is to provide a clear,
 step-by-step list of the user's journey. No need to include time stamps or
 other metadata."""
 
+STEPS_PROMPT = f"{BASE_PROMPT} Here is the data:\n\n{{context}}"
 
-def summarize_actions(force_regenerate=False, agent=False):
-    if not os.getenv('OPENAI_API_KEY'):
-        print("Please create a .env file with: "
-              "'OPENAI_API_KEY=your_api_key_here'")
-        return
+COMPACT_STEPS_PROMPT = """You are an AI assistant that summarizes user actions in detail.
+Each line below is one user action, in order. 'page' is the title of the page
+the action happened on and 'hint' is the guidance shown to the user; repeated
+actions are marked (xN). Your task is to provide a clear, step-by-step list of
+the user's journey. Here are the actions:
+
+{context}"""
+
+SUMMARY_PROMPT = (
+    "Based on the following step-by-step list of user actions, "
+    "provide a clear narrative summary of the user's journey. The steps are in order and should be summarized in a way that is easy to understand and follow:\n\n{context}"
+)
+
+
+def _steps_prompt_id(compact_prompt, token_budget, map_reduce=False):
+    """Identify the steps prompt, including how its context is built"""
+    if map_reduce:
+        return f"{MAP_PROMPT}\n{REDUCE_PROMPT}"
+    if compact_prompt:
+        return f"{COMPACT_STEPS_PROMPT}\n[token_budget={token_budget}]"
+    return STEPS_PROMPT
+
+
+def _chain_cache_keys(flow_hash, steps_prompt_id=STEPS_PROMPT, model=CHAT_MODEL):
+    # The model is part of every key, so switching models never serves stale results
+    steps_key = cache_key(flow_hash, 'steps-chain', steps_prompt_id, model)
+    summary_key = cache_key(flow_hash, 'summary-chain',
+                            steps_prompt_id + SUMMARY_PROMPT, model)
+    return steps_key, summary_key
 
-    # Preprocess the CSV
-    input_csv = 'cache/actions.csv'
-    processed_csv = 'cache/processed_actions.csv'
 
-    # Separate cache files for agentic vs non-agentic approaches
+def summary_cache_keys(flow_hash, agent=False, compact_prompt=True,
+                       token_budget=DEFAULT_TOKEN_BUDGET, map_reduce=False,
+                       model=CHAT_MODEL):
+    """Return (steps_key, summary_key) of a summarize_actions result
+
+    steps_key is None for the agentic approach, which only caches a summary.
+    """
     if agent:
-        summary_cache = 'cache/ai-summary-agentic.txt'
-    else:
-        steps_cache = 'cache/ai-steps-chain.txt'
-        summary_cache = 'cache/ai-summary-chain.txt'
+        return None, cache_key(flow_hash, 'summary-agentic', BASE_PROMPT, model)
+    return _chain_cache_keys(flow_hash,
+                             _steps_prompt_id(compact_prompt, token_budget, map_reduce),
+                             model)
+
+
+def _build_chains(llm, compact_prompt=False):
+    """Build the steps chain and the summary-from-steps chain"""
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import ChatPromptTemplate
+
+    steps_prompt = ChatPromptTemplate.from_messages([
+        ("system", COMPACT_STEPS_PROMPT if compact_prompt else STEPS_PROMPT)
+    ])
+    summary_prompt = ChatPromptTemplate.from_messages([
+        ("system", SUMMARY_PROMPT)
+    ])
+    return (create_stuff_documents_chain(llm, steps_prompt),
+            create_stuff_documents_chain(llm, summary_prompt))
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value).strip()
+
+
+def actions_to_documents(df, source='actions'):
+    """Convert processed actions into one Document per row
+
+    Produces the same page content CSVLoader would for the processed CSV
+    written with to_csv, without writing and re-reading the file: blank and
+    NaN cells both render as an empty value (CSVLoader reads raw strings, so
+    it never sees 'nan'), and other values are stripped strings. Frames read
+    back with read_actions_csv give the same documents as in-memory ones.
+    """
+    from langchain_core.documents import Document
+
+    columns = list(df.columns)
+    return [
+        Document(
+            page_content="\n".join(f"{column}: {_format_value(value)}"
+                                   for column, value in zip(columns, row)),
+            metadata={"source": source, "row": i}
+        )
+        for i, row in enumerate(df.itertuples(index=False, name=None))
+    ]
+
+
+def _steps_context(actions, compact_prompt, token_budget, model=CHAT_MODEL):
+    """Build the steps chain documents, plus prompt stats in compact mode"""
+    from langchain_core.documents import Document
+
+    if not compact_prompt:
+        return actions_to_documents(actions), None
+
+    context, stats = build_actions_prompt(actions, token_budget, model)
+    print(f"Prompt: {stats['rows']} actions -> {stats['lines']} lines, "
+          f"{stats['tokens']}/{stats['token_budget']} tokens "
+          f"(detail: {stats['detail']}, omitted: {stats['omitted']})")
+    return [Document(page_content=context)], stats
+
+
+def _documents_text(docs):
+    """The context the stuff chains render from docs"""
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def _cached_output(cache, key, force_regenerate, current_span):
+    """Look up a chain output cached under its exact prompt"""
+    output = None if force_regenerate else cache.get_text(key)
+    current_span.set(cache='miss' if output is None else 'hit')
+    return output
+
+
+def _emit(on_chunk, section, text):
+    """Hand a whole output to on_chunk (cached or not generated by streaming)"""
+    if on_chunk is not None:
+        on_chunk(section, str(text))
+
+
+def _invoke_chain(chain, inputs, on_chunk=None, section=None):
+    """Run a chain, streaming its output to on_chunk(section, text) if given"""
+    if on_chunk is None:
+        return chain.invoke(inputs)
+    chunks = []
+    for chunk in chain.stream(inputs):
+        if chunk:
+            chunks.append(chunk)
+            on_chunk(section, chunk)
+    return "".join(chunks)
+
+
+def _astream_chain(chain, inputs, on_chunk, section):
+    """make_call for call_with_retry streaming a chain's output to on_chunk
+
+    Once part of the output has been handed on, a failed call is not retried,
+    since on_chunk cannot take that text back.
+    """
+    streamed = []
+
+    async def stream():
+        if streamed:
+            raise RuntimeError(f"{section} stream interrupted after partial output")
+        async for chunk in chain.astream(inputs):
+            if chunk:
+                streamed.append(chunk)
+                on_chunk(section, chunk)
+        return "".join(streamed)
+
+    return stream
+
+
+def _dedup_index(cache, steps_prompt_id, model):
+    """(index, threshold) for near-duplicate reuse, (None, None) when it is off"""
+    threshold = get_dedup_threshold()
+    if threshold is None:
+        return None, None
+    return DedupIndex(cache, steps_prompt_id, model), threshold
+
 
-    if not os.path.exists(input_csv):
+def _reuse_near_duplicate(index, threshold, signature, flow_hash, flow_id, cache,
+                          steps_key, summary_key):
+    """Serve a flow from the cached steps and summary of a near-duplicate
+
+    The reused texts are also stored under the flow's own keys, so its next
+    lookup is a plain cache hit. Returns None without a usable match.
+    """
+    reused = None
+    with span('summary-dedup') as dedup_span:
+        match = index.find(flow_hash, signature, threshold, flow_id)
+        if match:
+            duplicate_keys = _chain_cache_keys(match[0], index.steps_prompt_id, index.model)
+            steps, summary = (cache.get_text(key) for key in duplicate_keys)
+            if steps is not None and summary is not None:
+                reused = {'steps': steps, 'summary': summary, 'duplicate_of': match[0],
+                          'similarity': round(match[1], 3)}
+            dedup_span.set(similarity=round(match[1], 3))
+        dedup_span.set(cache='hit' if reused else 'miss')
+
+    if reused:
+        cache.set_text(steps_key, reused['steps'])
+        cache.set_text(summary_key, reused['summary'])
+        print(f"Reusing the AI analysis of near-duplicate flow {match[0][:12]} "
+              f"(similarity {match[1]:.2f})")
+    return reused
+
+
+def _resolve_flow_id(flow, flow_id):
+    if flow_id is None and flow is not None:
+        return flow.get('flow_id')
+    return flow_id
+
+
+def _resolve_flow_hash(input_csv, flow, flow_hash):
+    if flow_hash is not None:
+        return flow_hash
+    if flow is not None and flow.get('flow_hash'):
+        return flow['flow_hash']
+    return flow_hash_from_csv(input_csv)
+
+
+def summarize_actions(force_regenerate=False, agent=False,
+                      input_csv='cache/actions.csv', processed_csv=None,
+                      flow_hash=None, cache=None, flow=None,
+                      compact_prompt=True, token_budget=DEFAULT_TOKEN_BUDGET,
+                      map_reduce=False, provider=None, actions=None, on_chunk=None,
+                      flow_id=None):
+    """Summarize the user journey of a flow
+
+    Pass the result of process_flow as `flow` to work entirely in memory;
+    otherwise the actions are read from input_csv. The processed actions are
+    only exported to processed_csv if a path is given. `actions` skips
+    preprocessing with an already processed actions frame (e.g. one shared by
+    several variants, see variants.summarize_variants).
+
+    By default the steps chain sees a compact, token-budgeted action list
+    (see prompt_builder); compact_prompt=False sends every processed row.
+    map_reduce=True summarizes page segments concurrently and merges them,
+    for flows too long for a single prompt (see map_reduce).
+
+    on_chunk(section, text) receives the 'steps' and then the 'summary' text
+    as it is generated, token by token where the chat model streams; cached
+    or reused outputs arrive in one piece (see report.ReportStream).
+
+    flow_id (default: flow['flow_id']) identifies the flow across edits, so
+    near-duplicate reuse never serves an earlier version of it (see dedup).
+
+    The chat model comes from `provider` (default: get_provider(), OpenAI
+    unless ARCADE_PROVIDER=stub). Results are cached under a key derived from
+    the flow content, the prompts and the model, so each distinct flow keeps
+    its own cached summary.
+    Returns a dict with 'summary' (and 'steps' for the chain approach, plus
+    'prompt_stats' or 'map_reduce_stats' when the steps were freshly generated).
+    """
+    provider = provider or get_provider()
+    missing_configuration = provider.missing_configuration()
+    if missing_configuration:
+        print(missing_configuration)
+        return
+
+    if flow is None and actions is None and not os.path.exists(input_csv):
         print(f"CSV file not found: {input_csv}")
         return
 
-    preprocess_csv(input_csv, processed_csv)
+    cache = cache or get_cache()
+    flow_hash = _resolve_flow_hash(input_csv, flow, flow_hash)
+
+    # Separate cache entries for agentic vs non-agentic approaches
+    steps_key, summary_key = summary_cache_keys(flow_hash, agent, compact_prompt,
+                                                token_budget, map_reduce,
+                                                provider.chat_model_name)
+
     approach = "Agentic" if agent else "Chain"
 
-    # Check for cached files
-    if agent:
-        if not force_regenerate and os.path.exists(summary_cache):
-            print(f"Using cached AI summary ({approach} approach):")
-            with open(summary_cache, 'r') as f:
-                cached_summary = f.read()
-            print("=" * 60)
-            print(cached_summary)
-            print("=" * 60)
-            return
-    else:
-        if (not force_regenerate and
-                os.path.exists(steps_cache) and
-                os.path.exists(summary_cache)):
-            print(f"Using cached AI analysis ({approach} approach):")
-            with open(steps_cache, 'r') as f:
-                cached_steps = f.read()
-            with open(summary_cache, 'r') as f:
-                cached_summary = f.read()
-            print("=" * 60)
-            print("STEPS:")
-            print(cached_steps)
-            print("\nSUMMARY:")
-            print(cached_summary)
-            print("=" * 60)
-            return
-
-    llm = ChatOpenAI(temperature=0.60)
+    # Check for cached results
+    if not force_regenerate:
+        if agent:
+            with span('summary-cache', approach='agentic') as lookup_span:
+                cached_summary = cache.get_text(summary_key)
+                lookup_span.set(cache='miss' if cached_summary is None else 'hit')
+            if cached_summary is not None:
+                print(f"Using cached AI summary ({approach} approach):")
+                print("=" * 60)
+                print(cached_summary)
+                print("=" * 60)
+                _emit(on_chunk, 'summary', cached_summary)
+                return {'summary': cached_summary}
+        else:
+            with span('summary-cache', approach='chain') as lookup_span:
+                cached_steps = cache.get_text(steps_key)
+                cached_summary = cache.get_text(summary_key)
+                cache_hit = cached_steps is not None and cached_summary is not None
+                lookup_span.set(cache='hit' if cache_hit else 'miss')
+            if cache_hit:
+                print(f"Using cached AI analysis ({approach} approach):")
+                print("=" * 60)
+                print("STEPS:")
+                print(cached_steps)
+                print("\nSUMMARY:")
+                print(cached_summary)
+                print("=" * 60)
+                _emit(on_chunk, 'steps', cached_steps)
+                _emit(on_chunk, 'summary', cached_summary)
+                return {'steps': cached_steps, 'summary': cached_summary}
+
+    from arcade_flow_analyzer.analysis.csv_preprocessor import load_processed_actions
+    from langchain_core.documents import Document
+
+    if actions is None:
+        actions = load_processed_actions(input_csv, flow, processed_csv)
+
+    llm = provider.chat_model(temperature=0.60)
 
     if agent:
         # LangChain agent
         print("Generating new AI summary (Agentic approach):")
+        from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
 
-        agent_executer = create_csv_agent(
-            llm, processed_csv, verbose=True,
+        agent_executer = create_pandas_dataframe_agent(
+            llm, actions, verbose=True,
             allow_dangerous_code=True,
-            handle_parsing_errors=True
+            agent_executor_kwargs={'handle_parsing_errors': True}
         )
 
-        result = agent_executer.invoke(BASE_PROMPT)
+        with span('agent-chain', rows=len(actions)) as agent_span, \
+                track_llm_usage(agent_span):
+            result = agent_executer.invoke(BASE_PROMPT)
 
         print(result)
 
     else:
+        steps_prompt_id = _steps_prompt_id(compact_prompt, token_budget, map_reduce)
+        index, threshold = _dedup_index(cache, steps_prompt_id, provider.chat_model_name)
+        signature = action_signature(actions) if index else None
+        if index and not force_regenerate:
+            reused = _reuse_near_duplicate(index, threshold, signature, flow_hash,
+                                           _resolve_flow_id(flow, flow_id), cache,
+                                           steps_key, summary_key)
+            if reused:
+                _emit(on_chunk, 'steps', reused['steps'])
+                _emit(on_chunk, 'summary', reused['summary'])
+                return reused
+
         print("Generating new AI summary (Chain approach):")
-        loader = CSVLoader(file_path=processed_csv)
-        docs = loader.load()
+        steps_chain, summary_chain = _build_chains(llm, compact_prompt)
+        prompt_stats = map_reduce_stats = None
 
         # First chain: Generate steps
-        steps_prompt = ChatPromptTemplate.from_messages([
-            ("system", f"{BASE_PROMPT} Here is the data:\n\n{{context}}")
-        ])
-        steps_chain = create_stuff_documents_chain(llm, steps_prompt)
-        steps_result = steps_chain.invoke({"context": docs})
+        with span('steps-chain', rows=len(actions), map_reduce=map_reduce) as steps_span, \
+                track_llm_usage(steps_span):
+            if map_reduce:
+                steps_result, map_reduce_stats = map_reduce_steps(
+                    actions, llm, cache, provider.chat_model_name
+                )
+                steps_span.set(**map_reduce_stats)
+                _emit(on_chunk, 'steps', steps_result)
+            else:
+                docs, prompt_stats = _steps_context(actions, compact_prompt, token_budget,
+                                                    provider.chat_model_name)
+                prompt_key = steps_prompt_key(_documents_text(docs), steps_prompt_id,
+                                              provider.chat_model_name)
+                steps_result = _cached_output(cache, prompt_key, force_regenerate, steps_span)
+                if steps_result is None:
+                    steps_result = _invoke_chain(steps_chain, {"context": docs}, on_chunk,
+                                                 'steps')
+                    cache.set_text(prompt_key, str(steps_result))
+                else:
+                    _emit(on_chunk, 'steps', steps_result)
+            steps_span.set(output_chars=len(str(steps_result)))
 
         # Second chain: Generate summary from steps
         # Convert steps_result to a document for the second chain
         steps_doc = Document(page_content=str(steps_result))
+        prompt_key = summary_prompt_key(str(steps_result), SUMMARY_PROMPT,
+                                        provider.chat_model_name)
 
-        summary_prompt = ChatPromptTemplate.from_messages([
-            ("system", "Based on the following step-by-step list of user actions, "
-             "provide a clear narrative summary of the user's journey. The steps are in order and should be summarized in a way that is easy to understand and follow:\n\n{context}")
-        ])
-
-        summary_chain = create_stuff_documents_chain(llm, summary_prompt)
-        summary_result = summary_chain.invoke({"context": [steps_doc]})
+        with span('summary-chain') as summary_span, track_llm_usage(summary_span):
+            summary_result = _cached_output(cache, prompt_key, force_regenerate, summary_span)
+            if summary_result is None:
+                summary_result = _invoke_chain(summary_chain, {"context": [steps_doc]},
+                                               on_chunk, 'summary')
+                cache.set_text(prompt_key, str(summary_result))
+            else:
+                _emit(on_chunk, 'summary', summary_result)
+            summary_span.set(output_chars=len(str(summary_result)))
 
         print("=" * 60)
         print("STEPS:")
@@ -128,16 +417,145 @@ def summarize_actions(force_regenerate=False, agent=False):
 
     # Save the result to cache
     if agent:
-        with open(summary_cache, 'w') as f:
-            f.write(str(result))
-        print(f"Summary saved to {summary_cache} ({approach} approach)")
-    else:
-        with open(steps_cache, 'w') as f:
-            f.write(str(steps_result))
-        with open(summary_cache, 'w') as f:
-            f.write(str(summary_result))
-        print(f"Steps saved to {steps_cache} ({approach} approach)")
-        print(f"Summary saved to {summary_cache} ({approach} approach)")
+        _emit(on_chunk, 'summary', result)
+        summary_path = cache.set_text(summary_key, str(result))
+        print(f"Summary saved to {summary_path} ({approach} approach)")
+        return {'summary': str(result)}
+
+    steps_path = cache.set_text(steps_key, str(steps_result))
+    summary_path = cache.set_text(summary_key, str(summary_result))
+    if index:
+        index.add(flow_hash, signature, _resolve_flow_id(flow, flow_id))
+    print(f"Steps saved to {steps_path} ({approach} approach)")
+    print(f"Summary saved to {summary_path} ({approach} approach)")
+    return {'steps': str(steps_result), 'summary': str(summary_result),
+            'prompt_stats': prompt_stats, 'map_reduce_stats': map_reduce_stats}
+
+
+async def asummarize_actions(force_regenerate=False,
+                             input_csv='cache/actions.csv', processed_csv=None,
+                             flow_hash=None, cache=None, flow=None, semaphore=None,
+                             timeout=DEFAULT_TIMEOUT,
+                             max_retries=DEFAULT_MAX_RETRIES,
+                             compact_prompt=True,
+                             token_budget=DEFAULT_TOKEN_BUDGET,
+                             map_reduce=False, provider=None, on_chunk=None,
+                             flow_id=None):
+    """Async variant of summarize_actions (chain approach only)
+
+    Each LLM call acquires `semaphore`, is bounded by `timeout` seconds and is
+    retried with backoff on rate-limit errors, so many flows can be summarized
+    concurrently while staying within API concurrency limits. File work runs
+    in threads to keep the event loop free. on_chunk is called on the event
+    loop; a streamed call that fails after its first chunk is not retried.
+    """
+    provider = provider or get_provider()
+    missing_configuration = provider.missing_configuration()
+    if missing_configuration:
+        print(missing_configuration)
+        return
+
+    if flow is None and not os.path.exists(input_csv):
+        print(f"CSV file not found: {input_csv}")
+        return
+
+    cache = cache or get_cache()
+    flow_hash = await asyncio.to_thread(_resolve_flow_hash, input_csv, flow,
+                                        flow_hash)
+    flow_id = _resolve_flow_id(flow, flow_id)
+
+    steps_prompt_id = _steps_prompt_id(compact_prompt, token_budget, map_reduce)
+    steps_key, summary_key = _chain_cache_keys(flow_hash, steps_prompt_id,
+                                               provider.chat_model_name)
+
+    if not force_regenerate:
+        with span('summary-cache', approach='chain') as lookup_span:
+            cached_steps = cache.get_text(steps_key)
+            cached_summary = cache.get_text(summary_key)
+            cache_hit = cached_steps is not None and cached_summary is not None
+            lookup_span.set(cache='hit' if cache_hit else 'miss')
+        if cache_hit:
+            print(f"Using cached AI analysis for flow {flow_hash[:12]}")
+            _emit(on_chunk, 'steps', cached_steps)
+            _emit(on_chunk, 'summary', cached_summary)
+            return {'steps': cached_steps, 'summary': cached_summary}
+
+    from arcade_flow_analyzer.analysis.csv_preprocessor import load_processed_actions
+    from langchain_core.documents import Document
+
+    actions = await asyncio.to_thread(load_processed_actions, input_csv, flow,
+                                      processed_csv)
+
+    index, threshold = _dedup_index(cache, steps_prompt_id, provider.chat_model_name)
+    signature = await asyncio.to_thread(action_signature, actions) if index else None
+    if index and not force_regenerate:
+        reused = await asyncio.to_thread(_reuse_near_duplicate, index, threshold,
+                                         signature, flow_hash, flow_id, cache,
+                                         steps_key, summary_key)
+        if reused:
+            _emit(on_chunk, 'steps', reused['steps'])
+            _emit(on_chunk, 'summary', reused['summary'])
+            return reused
+
+    # Retries are handled by call_with_retry so backoff respects the semaphore
+    llm = provider.chat_model(temperature=0.60, max_retries=0)
+    steps_chain, summary_chain = _build_chains(llm, compact_prompt)
+    prompt_stats = map_reduce_stats = None
+
+    print(f"Generating new AI summary for flow {flow_hash[:12]}")
+    with span('steps-chain', rows=len(actions), map_reduce=map_reduce) as steps_span, \
+            track_llm_usage(steps_span):
+        if map_reduce:
+            steps_result, map_reduce_stats = await amap_reduce_steps(
+                actions, llm, cache, provider.chat_model_name, semaphore, timeout,
+                max_retries
+            )
+            steps_span.set(**map_reduce_stats)
+            _emit(on_chunk, 'steps', steps_result)
+        else:
+            docs, prompt_stats = await asyncio.to_thread(_steps_context, actions,
+                                                         compact_prompt, token_budget,
+                                                         provider.chat_model_name)
+            prompt_key = steps_prompt_key(_documents_text(docs), steps_prompt_id,
+                                          provider.chat_model_name)
+            steps_result = await asyncio.to_thread(_cached_output, cache, prompt_key,
+                                                   force_regenerate, steps_span)
+            if steps_result is None:
+                inputs = {"context": docs}
+                make_call = (_astream_chain(steps_chain, inputs, on_chunk, 'steps')
+                             if on_chunk else lambda: steps_chain.ainvoke(inputs))
+                steps_result = await call_with_retry(make_call, semaphore, timeout,
+                                                     max_retries)
+                await asyncio.to_thread(cache.set_text, prompt_key, str(steps_result))
+            else:
+                _emit(on_chunk, 'steps', steps_result)
+        steps_span.set(output_chars=len(str(steps_result)))
+
+    steps_doc = Document(page_content=str(steps_result))
+    prompt_key = summary_prompt_key(str(steps_result), SUMMARY_PROMPT,
+                                    provider.chat_model_name)
+    with span('summary-chain') as summary_span, track_llm_usage(summary_span):
+        summary_result = await asyncio.to_thread(_cached_output, cache, prompt_key,
+                                                 force_regenerate, summary_span)
+        if summary_result is None:
+            inputs = {"context": [steps_doc]}
+            make_call = (_astream_chain(summary_chain, inputs, on_chunk, 'summary')
+                         if on_chunk else lambda: summary_chain.ainvoke(inputs))
+            summary_result = await call_with_retry(make_call, semaphore, timeout,
+                                                   max_retries)
+            await asyncio.to_thread(cache.set_text, prompt_key, str(summary_result))
+        else:
+            _emit(on_chunk, 'summary', summary_result)
+        summary_span.set(output_chars=len(str(summary_result)))
+
+    await asyncio.to_thread(cache.set_text, steps_key, str(steps_result))
+    summary_path = await asyncio.to_thread(cache.set_text, summary_key,
+                                           str(summary_result))
+    if index:
+        await asyncio.to_thread(index.add, flow_hash, signature, flow_id)
+    print(f"Summary saved to {summary_path}")
+    return {'steps': str(steps_result), 'summary': str(summary_result),
+            'prompt_stats': prompt_stats, 'map_reduce_stats': map_reduce_stats}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+"""
+Summary variants run side by side.
+
+summarize_actions can summarize a flow with the two-chain approach, the
+map-reduce chains or the pandas dataframe agent. summarize_variants runs
+several of these variants concurrently on the same preprocessed actions, each
+through summarize_actions so each keeps its own cache entries, and records
+what each one took to generate: wall time, LLM calls, tokens and estimated
+cost. The metrics are cached next to the variant's output, so a variant
+served from the cache still reports its generation cost.
+
+pick_variant chooses the variant a report is built from: the preferred one
+when it succeeded, otherwise the fastest.
+"""
+
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from arcade_flow_analyzer.analysis.prompt_builder import DEFAULT_TOKEN_BUDGET
+from arcade_flow_analyzer.analysis.summarize import (
+    _resolve_flow_hash, summarize_actions, summary_cache_keys
+)
+from arcade_flow_analyzer.caching import cache_key, get_cache
+from arcade_flow_analyzer.providers import get_provider
+from arcade_flow_analyzer.telemetry import Tracer, get_tracer, span, use_tracer
+
+# summarize_actions options of each variant
+VARIANTS = {
+    'chain': {},
+    'map_reduce': {'map_reduce': True},
+    'agentic': {'agent': True},
+}
+DEFAULT_VARIANTS = ['chain', 'agentic']
+
+USAGE_ATTRIBUTES = ['llm_calls', 'prompt_tokens', 'completion_tokens', 'cost_usd']
+
+
+def parse_variants(value):
+    """Parse a comma-separated variant list, e.g. 'chain,agentic'"""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in VARIANTS]
+    if unknown or not names:
+        raise ValueError(f"Unknown summary variants: {unknown or value!r} "
+                         f"(expected some of {sorted(VARIANTS)})")
+    return list(dict.fromkeys(names))
+
+
+def _variant_keys(name, flow_hash, compact_prompt, token_budget, model):
+    options = VARIANTS[name]
+    return summary_cache_keys(flow_hash, options.get('agent', False), compact_prompt,
+                              token_budget, options.get('map_reduce', False), model)
+
+
+def _metrics_key(summary_key):
+    return cache_key(summary_key, 'variant-metrics', '', '')
+
+
+def _run_variant(name, keys, cache, force_regenerate, summarize_kwargs):
+    """Run one variant under its own tracer and return its result record"""
+    record = {'variant': name, 'steps': None, 'summary': None, 'cached': False,
+              'seconds': None, 'error': None}
+    tracer = Tracer()
+    with use_tracer(tracer), span('summary-variant', variant=name) as variant_span:
+        started = time.perf_counter()
+        try:
+            result = summarize_actions(force_regenerate=force_regenerate, cache=cache,
+                                       **summarize_kwargs, **VARIANTS[name])
+        except Exception as e:
+            result = None
+            record['error'] = f"{type(e).__name__}: {e}".splitlines()[0]
+        seconds = round(time.perf_counter() - started, 3)
+
+        if result:
+            # The agent answers the steps prompt, so its output doubles as the steps
+            record['steps'] = result.get('steps') or result['summary']
+            record['summary'] = result['summary']
+        elif not record['error']:
+            record['error'] = "summarization returned no result"
+
+        record['cached'] = any(s['name'] == 'summary-cache' and
+                               s['attributes'].get('cache') == 'hit' for s in tracer.spans)
+        usage = {attribute: round(sum(s['attributes'].get(attribute, 0)
+                                      for s in tracer.spans), 6)
+                 for attribute in USAGE_ATTRIBUTES}
+
+        metrics_key = _metrics_key(keys[1])
+        if record['cached']:
+            # Report what the cached output took to generate, when it was recorded
+            stored = cache.get_text(metrics_key)
+            if stored is not None:
+                record.update(json.loads(stored))
+        elif not record['error']:
+            record.update(usage, seconds=seconds)
+            cache.set_text(metrics_key, json.dumps({'seconds': seconds, **usage}))
+        variant_span.set(cache='hit' if record['cached'] else 'miss', **usage)
+        if record['error']:
+            variant_span.set(error=record['error'])
+
+    return record, list(tracer.spans)
+
+
+def pick_variant(variants, prefer=None):
+    """Choose the variant to report: prefer, if it succeeded, else the fastest
+
+    Variants whose generation time is unknown (cached before their metrics
+    were recorded) rank after timed ones. Returns None when all failed.
+    """
+    succeeded = [variant for variant in variants if not variant['error']]
+    for variant in succeeded:
+        if variant['variant'] == prefer:
+            return variant
+    if not succeeded:
+        return None
+    if prefer:
+        print(f"Preferred variant {prefer} is not available, reporting the fastest")
+    return min(succeeded, key=lambda variant: (variant['seconds'] is None,
+                                               variant['seconds'] or 0))
+
+
+def summarize_variants(variants=None, prefer=None, force_regenerate=False,
+                       input_csv='cache/actions.csv', processed_csv=None,
+                       flow_hash=None, cache=None, flow=None, compact_prompt=True,
+                       token_budget=DEFAULT_TOKEN_BUDGET, provider=None, flow_id=None):
+    """Summarize a flow with several variants concurrently
+
+    The actions are preprocessed once (and not at all when every variant is
+    cached) and shared by all variants; the agent gets its own copy since it
+    runs generated code against the frame. Returns the summarize_actions-like
+    dict of the variant chosen by pick_variant, with 'variant' naming it and
+    'variants' listing every variant's record: steps, summary, cached,
+    seconds, llm_calls, prompt/completion tokens, cost_usd and error.
+    """
+    variants = variants or DEFAULT_VARIANTS
+    provider = provider or get_provider()
+    missing_configuration = provider.missing_configuration()
+    if missing_configuration:
+        print(missing_configuration)
+        return
+
+    cache = cache or get_cache()
+    flow_hash = _resolve_flow_hash(input_csv, flow, flow_hash)
+    keys = {name: _variant_keys(name, flow_hash, compact_prompt, token_budget,
+                                provider.chat_model_name)
+            for name in variants}
+
+    actions = None
+    if force_regenerate or not all(cache.contains(key, '.txt')
+                                   for name in variants for key in keys[name] if key):
+        from arcade_flow_analyzer.analysis.csv_preprocessor import load_processed_actions
+
+        actions = load_processed_actions(input_csv, flow, processed_csv)
+
+    tracer = get_tracer()
+    with span('summary-variants', variants=','.join(variants)), \
+            ThreadPoolExecutor(max_workers=len(variants)) as pool:
+        futures = []
+        for name in variants:
+            variant_actions = actions
+            if actions is not None and VARIANTS[name].get('agent'):
+                variant_actions = actions.copy()
+            summarize_kwargs = {'input_csv': input_csv, 'flow_hash': flow_hash,
+                                'flow': flow, 'compact_prompt': compact_prompt,
+                                'token_budget': token_budget, 'provider': provider,
+                                'actions': variant_actions, 'flow_id': flow_id}
+            # Copy the context so the variant spans nest under this one
+            futures.append(pool.submit(contextvars.copy_context().run, _run_variant,
+                                       name, keys[name], cache, force_regenerate,
+                                       summarize_kwargs))
+
+        records = []
+        for future in futures:
+            record, spans = future.result()
+            for span_dict in spans:
+                tracer.export(span_dict)
+            records.append(record)
+
+    chosen = pick_variant(records, prefer)
+    for record in records:
+        status = record['error'] or ('cached' if record['cached'] else 'generated')
+        seconds = f"{record['seconds']:.2f}s" if record['seconds'] is not None else "?"
+        print(f"Variant {record['variant']}: {seconds} ({status})")
+    if chosen is None:
+        print("Every summary variant failed")
+        return
+
+    print(f"Reporting the {chosen['variant']} variant")
+    return {'steps': chosen['steps'], 'summary': chosen['summary'],
+            'variant': chosen['variant'], 'variants': records}
+
+
+def format_variant_table(variants, chosen=None):
+    """Render variant records as markdown table lines"""
+    lines = [
+        "| Variant | Time (s) | Cached | LLM calls | Tokens in/out | Cost (USD) | Status |",
+        "| --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for variant in variants:
+        seconds = f"{variant['seconds']:.2f}" if variant['seconds'] is not None else ''
+        tokens = (f"{variant['prompt_tokens']}/{variant['completion_tokens']}"
+                  if 'prompt_tokens' in variant else '')
+        cost = f"{variant['cost_usd']:.4f}" if 'cost_usd' in variant else ''
+        if variant['error']:
+            status = f"failed: {variant['error']}"
+        else:
+            status = 'reported' if variant['variant'] == chosen else ''
+        lines.append(f"| {variant['variant']} | {seconds} | "
+                     f"{'yes' if variant['cached'] else 'no'} | "
+                     f"{variant.get('llm_calls', '')} | {tokens} | {cost} | {status} |")
+    return lines
@@ -0,0 +1,26 @@
+"""
+Caching module for storing generated AI artifacts keyed by flow content.
+"""
+
+from .._lazy import lazy_exports
+
+_EXPORTS = {
+    'FlowHasher': '.keys',
+    'flow_hash': '.keys',
+    'flow_hash_from_csv': '.keys',
+    'text_hash': '.keys',
+    'cache_key': '.keys',
+    'CacheBackend': '.base',
+    'DiskCache': '.disk_cache',
+    'SQLiteCache': '.sqlite_cache',
+    'RedisCache': '.redis_cache',
+    'ArtifactCache': '.artifacts',
+    'create_cache': '.artifacts',
+    'get_cache': '.artifacts',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = ['FlowHasher', 'flow_hash', 'flow_hash_from_csv', 'text_hash', 'cache_key',
+           'CacheBackend', 'DiskCache', 'SQLiteCache', 'RedisCache', 'ArtifactCache',
+           'create_cache', 'get_cache']
@@ -0,0 +1,105 @@
+"""
+Artifact cache: text artifacts in the configured backend, binary blobs on disk.
+
+Steps and summaries are small and go to the configured backend
+(disk, SQLite or Redis) so every worker sharing it sees the same results.
+Image bytes are kept out-of-line in a content-addressed DiskCache: they are
+large, the pipeline needs them as files (report links, HTTP responses), and
+keeping them out of SQLite/Redis keeps those stores small. Point
+ARCADE_CACHE_DIR at a shared volume to share images between nodes as well.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from .base import CacheBackend
+from .disk_cache import (
+    DEFAULT_CACHE_DIR, DEFAULT_MAX_AGE_SECONDS, DEFAULT_MAX_BYTES, DiskCache
+)
+from .sqlite_cache import DEFAULT_SQLITE_PATH, SQLiteCache
+
+# Suffixes stored in the text backend; everything else is a blob
+TEXT_SUFFIXES = ('.txt',)
+
+CACHE_BACKENDS = ['disk', 'sqlite', 'redis']
+
+
+class ArtifactCache(CacheBackend):
+    """Route text artifacts to a backend and binary blobs to a DiskCache"""
+
+    def __init__(self, store: CacheBackend, blobs: DiskCache):
+        self.store = store
+        self.blobs = blobs
+
+    def _backend_for(self, suffix: str) -> CacheBackend:
+        return self.store if suffix in TEXT_SUFFIXES else self.blobs
+
+    def get(self, key: str, suffix: str = "") -> Optional[bytes]:
+        return self._backend_for(suffix).get(key, suffix)
+
+    def set(self, key: str, data: bytes, suffix: str = "") -> str:
+        return self._backend_for(suffix).set(key, data, suffix)
+
+    def delete(self, key: str, suffix: str = ""):
+        self._backend_for(suffix).delete(key, suffix)
+
+    def contains(self, key: str, suffix: str = "") -> bool:
+        return self._backend_for(suffix).contains(key, suffix)
+
+    def close(self):
+        self.store.close()
+        self.blobs.close()
+
+    def path_for(self, key: str, suffix: str = "") -> Path:
+        """Return the file path of a blob entry"""
+        return self.blobs.path_for(key, suffix)
+
+
+def create_cache(backend: str = 'disk', url: Optional[str] = None,
+                 root: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_seconds: Optional[float] = DEFAULT_MAX_AGE_SECONDS) -> ArtifactCache:
+    """Build an ArtifactCache for the named backend
+
+    url is the SQLite database path or the Redis URL. Blobs always go to a
+    DiskCache under root; with the disk backend text artifacts do too.
+    """
+    blobs = DiskCache(root=root, max_bytes=max_bytes, max_age_seconds=max_age_seconds)
+    if backend == 'disk':
+        store = blobs
+    elif backend == 'sqlite':
+        store = SQLiteCache(url or DEFAULT_SQLITE_PATH, ttl=max_age_seconds)
+    elif backend == 'redis':
+        # The redis client is slow to import, so only load it when selected
+        from .redis_cache import DEFAULT_REDIS_URL, RedisCache
+
+        store = RedisCache(url or DEFAULT_REDIS_URL, ttl=max_age_seconds)
+    else:
+        raise ValueError(f"Unknown cache backend: {backend} "
+                         f"(expected one of {CACHE_BACKENDS})")
+    return ArtifactCache(store, blobs)
+
+
+_default_cache = None
+
+
+def get_cache() -> ArtifactCache:
+    """Return the shared cache, configured from the environment
+
+    ARCADE_CACHE_BACKEND selects disk (default), sqlite or redis and
+    ARCADE_CACHE_URL the SQLite path or Redis URL. ARCADE_CACHE_DIR,
+    ARCADE_CACHE_MAX_BYTES and ARCADE_CACHE_MAX_AGE_SECONDS (also the
+    per-entry TTL for SQLite and Redis) override the defaults.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = create_cache(
+            backend=os.getenv('ARCADE_CACHE_BACKEND', 'disk'),
+            url=os.getenv('ARCADE_CACHE_URL'),
+            root=os.getenv('ARCADE_CACHE_DIR', DEFAULT_CACHE_DIR),
+            max_bytes=int(os.getenv('ARCADE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+            max_age_seconds=float(os.getenv('ARCADE_CACHE_MAX_AGE_SECONDS',
+                                            DEFAULT_MAX_AGE_SECONDS)),
+        )
+    return _default_cache
@@ -0,0 +1,39 @@
+"""
+Cache backend interface.
+
+A backend stores opaque bytes per (key, suffix). Keys come from cache_key and
+the suffix names the artifact type ('.txt' for chain output, '.png' for
+images), so one key space can hold several artifacts.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class CacheBackend(ABC):
+    """Interface implemented by the disk, SQLite and Redis backends"""
+
+    @abstractmethod
+    def get(self, key: str, suffix: str = "") -> Optional[bytes]:
+        """Return the cached bytes for key, or None on a miss"""
+
+    @abstractmethod
+    def set(self, key: str, data: bytes, suffix: str = "") -> str:
+        """Store data under key and return a description of where it went"""
+
+    @abstractmethod
+    def delete(self, key: str, suffix: str = ""):
+        """Remove the entry for key if there is one"""
+
+    def close(self):
+        """Release connections held by the backend (a no-op by default)"""
+
+    def contains(self, key: str, suffix: str = "") -> bool:
+        return self.get(key, suffix) is not None
+
+    def get_text(self, key: str, suffix: str = ".txt") -> Optional[str]:
+        data = self.get(key, suffix)
+        return data.decode('utf-8') if data is not None else None
+
+    def set_text(self, key: str, text: str, suffix: str = ".txt") -> str:
+        return self.set(key, text.encode('utf-8'), suffix)
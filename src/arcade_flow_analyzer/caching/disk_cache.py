@@ -0,0 +1,148 @@
+"""
+Local on-disk cache for generated artifacts.
+
+Entries are stored as individual files under a two character fan-out
+directory (cache/store/ab/abcdef...). Writes go to a temporary file in the
+same directory and are moved into place with os.replace so readers never see
+a partially written entry.
+
+Reads refresh an entry's modification time, so max_age_seconds limits the
+time since an entry was last read or written, not since it was created:
+entries left unused for longer are treated as misses. The least recently
+used entries are evicted once the store grows past max_bytes.
+
+Eviction walks the whole store, so writes do not sweep every time: a sweep
+runs once a tenth of max_bytes has been written since the last one, or
+evict_interval_seconds after it. Between sweeps the store can exceed
+max_bytes by the bytes written since (also by other processes).
+"""
+
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .base import CacheBackend
+
+DEFAULT_CACHE_DIR = "cache/store"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_EVICT_INTERVAL_SECONDS = 60
+# Share of max_bytes written since the last sweep that triggers the next one
+EVICT_BYTES_FRACTION = 0.1
+
+
+class DiskCache(CacheBackend):
+    """Content-addressed file store with size and age based eviction"""
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_seconds: Optional[float] = DEFAULT_MAX_AGE_SECONDS,
+                 evict_interval_seconds: float = DEFAULT_EVICT_INTERVAL_SECONDS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.evict_interval_seconds = evict_interval_seconds
+        self._lock = threading.Lock()
+        self._written_bytes = 0
+        # No sweep yet: the first write sweeps what earlier runs left
+        self._last_evict = None
+
+    def path_for(self, key: str, suffix: str = "") -> Path:
+        """Return the file path an entry is (or would be) stored at"""
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def _is_expired(self, path: Path) -> bool:
+        if self.max_age_seconds is None:
+            return False
+        return time.time() - path.stat().st_mtime > self.max_age_seconds
+
+    def get(self, key: str, suffix: str = "") -> Optional[bytes]:
+        """Return the cached bytes for key, or None on a miss"""
+        path = self.path_for(key, suffix)
+        try:
+            if self._is_expired(path):
+                path.unlink(missing_ok=True)
+                return None
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        # Refresh the modification time so eviction is least recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def set(self, key: str, data: bytes, suffix: str = "") -> str:
+        """Atomically store data under key and return the entry path"""
+        path = self.path_for(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        if self._sweep_due(len(data)):
+            self.evict()
+        return str(path)
+
+    def delete(self, key: str, suffix: str = ""):
+        self.path_for(key, suffix).unlink(missing_ok=True)
+
+    def contains(self, key: str, suffix: str = "") -> bool:
+        path = self.path_for(key, suffix)
+        return path.exists() and not self._is_expired(path)
+
+    def _sweep_due(self, written: int) -> bool:
+        """Count bytes written and tell whether eviction should run now"""
+        with self._lock:
+            self._written_bytes += written
+            return (self._last_evict is None or
+                    self._written_bytes >= self.max_bytes * EVICT_BYTES_FRACTION or
+                    time.monotonic() - self._last_evict >= self.evict_interval_seconds)
+
+    def evict(self):
+        """Remove expired entries, then the oldest entries above max_bytes"""
+        with self._lock:
+            self._written_bytes = 0
+            self._last_evict = time.monotonic()
+        if not self.root.exists():
+            return
+
+        now = time.time()
+        entries = []
+        total_bytes = 0
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if (self.max_age_seconds is not None and
+                    now - stat.st_mtime > self.max_age_seconds):
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
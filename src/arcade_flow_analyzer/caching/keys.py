@@ -0,0 +1,86 @@
+"""
+Cache key derivation.
+
+Keys are content addressed: a flow is identified by a hash of its normalized
+extracted events, and a cached artifact by that hash combined with the stage,
+prompt and model that produced it. Changing any of them yields a new key.
+"""
+
+import csv
+import hashlib
+import json
+
+# Bump to invalidate every cached artifact after an incompatible change
+CACHE_VERSION = 1
+
+
+def _normalize_value(value):
+    """Normalize a single event value so CSV rows and dicts hash the same"""
+    if value is None:
+        return ''
+    return str(value)
+
+
+class FlowHasher:
+    """Incrementally hash a flow's events, one event at a time
+
+    Produces the same digest as flow_hash() without holding every event in
+    memory, so streamed flows can be keyed as they are extracted.
+    """
+
+    def __init__(self):
+        self._digest = hashlib.sha256(b'[')
+        self._count = 0
+
+    def add(self, event):
+        normalized = {key: _normalize_value(value) for key, value in event.items()}
+        self.add_serialized(json.dumps(normalized, sort_keys=True, separators=(',', ':')))
+
+    def add_serialized(self, serialized):
+        """Add an event already serialized the way add() serializes it"""
+        if self._count:
+            self._digest.update(b',')
+        self._digest.update(serialized.encode('utf-8'))
+        self._count += 1
+
+    def hexdigest(self) -> str:
+        digest = self._digest.copy()
+        digest.update(b']')
+        return digest.hexdigest()
+
+
+def flow_hash(events) -> str:
+    """Hash the normalized content of a flow's extracted events
+
+    events is any iterable of row dicts; an EventTable serializes its rows
+    itself, without building the dicts.
+    """
+    hasher = FlowHasher()
+    hash_rows = getattr(events, 'hash_rows', None)
+    if hash_rows is not None:
+        for serialized in hash_rows():
+            hasher.add_serialized(serialized)
+    else:
+        for event in events:
+            hasher.add(event)
+    return hasher.hexdigest()
+
+
+def flow_hash_from_csv(csv_path: str) -> str:
+    """Hash the events stored in an actions CSV written by save_to_csv"""
+    with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+        return flow_hash(csv.DictReader(csvfile))
+
+
+def text_hash(text: str) -> str:
+    """Hash arbitrary text content, e.g. a generated summary"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def cache_key(content_hash: str, stage: str, prompt: str, model: str) -> str:
+    """Build the cache key for an artifact produced from content_hash"""
+    payload = json.dumps(
+        [CACHE_VERSION, stage, content_hash, model, prompt],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
@@ -0,0 +1,64 @@
+"""
+Redis cache backend for sharing results across API workers and nodes.
+
+Entries are plain string keys (prefix + cache key + suffix) set with a
+per-entry expiry, so Redis itself drops stale results. Any server speaking the
+Redis protocol works; tests can pass a fakeredis client instead of a URL.
+
+Requires the optional `redis` dependency (pip install redis).
+"""
+
+from typing import Optional
+
+from .base import CacheBackend
+from .disk_cache import DEFAULT_MAX_AGE_SECONDS
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+DEFAULT_PREFIX = "arcade:"
+
+
+def _require_redis():
+    if redis is None:
+        raise ImportError("The Redis cache backend requires redis: pip install redis")
+
+
+class RedisCache(CacheBackend):
+    """Cache entries in Redis with a per-entry TTL"""
+
+    def __init__(self, url: str = DEFAULT_REDIS_URL,
+                 ttl: Optional[float] = DEFAULT_MAX_AGE_SECONDS,
+                 prefix: str = DEFAULT_PREFIX, client=None):
+        if client is None:
+            _require_redis()
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _name(self, key: str, suffix: str) -> str:
+        return f"{self.prefix}{key}{suffix}"
+
+    def get(self, key: str, suffix: str = "") -> Optional[bytes]:
+        return self.client.get(self._name(key, suffix))
+
+    def set(self, key: str, data: bytes, suffix: str = "",
+            ttl: Optional[float] = None) -> str:
+        """Store data under key, expiring after ttl seconds (default self.ttl)"""
+        ttl = self.ttl if ttl is None else ttl
+        name = self._name(key, suffix)
+        self.client.set(name, data, px=int(ttl * 1000) if ttl else None)
+        return name
+
+    def delete(self, key: str, suffix: str = ""):
+        self.client.delete(self._name(key, suffix))
+
+    def contains(self, key: str, suffix: str = "") -> bool:
+        return bool(self.client.exists(self._name(key, suffix)))
+
+    def close(self):
+        self.client.close()
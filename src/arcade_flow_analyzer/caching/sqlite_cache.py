@@ -0,0 +1,117 @@
+"""
+SQLite cache backend for single-node deployments.
+
+All entries live in one database file, so every process on the host (CLI
+runs, batch workers, API workers) shares the same cached results. The
+database runs in WAL mode so readers never block the writer, and each thread
+gets its own connection. Connections of threads that have exited are closed
+when the next one is opened, and close() closes the rest. Every entry carries
+its own expiry time.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .base import CacheBackend
+from .disk_cache import DEFAULT_MAX_AGE_SECONDS
+
+DEFAULT_SQLITE_PATH = "cache/store.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT NOT NULL,
+    suffix TEXT NOT NULL,
+    value BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (key, suffix)
+)
+"""
+
+
+class SQLiteCache(CacheBackend):
+    """Cache entries in a SQLite database with a per-entry TTL"""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH,
+                 ttl: Optional[float] = DEFAULT_MAX_AGE_SECONDS):
+        self.path = str(path)
+        self.ttl = ttl
+        self._local = threading.local()
+        # Thread -> its connection, so connections can be closed from any thread
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit; each statement is its own transaction. Only the
+            # owning thread uses the connection, but close() may run elsewhere
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+            with self._lock:
+                for thread in [t for t in self._connections if not t.is_alive()]:
+                    self._connections.pop(thread).close()
+                self._connections[threading.current_thread()] = conn
+        return conn
+
+    def close(self):
+        """Close every thread's connection; the next call reconnects"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+    def get(self, key: str, suffix: str = "") -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM entries WHERE key = ? AND suffix = ?",
+            (key, suffix)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key, suffix)
+            return None
+        return bytes(value)
+
+    def set(self, key: str, data: bytes, suffix: str = "",
+            ttl: Optional[float] = None) -> str:
+        """Store data under key, expiring after ttl seconds (default self.ttl)"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (key, suffix, value, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, suffix, sqlite3.Binary(data), now, now + ttl if ttl else None)
+        )
+        return f"{self.path}:{key}{suffix}"
+
+    def delete(self, key: str, suffix: str = ""):
+        self._connect().execute("DELETE FROM entries WHERE key = ? AND suffix = ?",
+                                (key, suffix))
+
+    def contains(self, key: str, suffix: str = "") -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM entries WHERE key = ? AND suffix = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (key, suffix, time.time())
+        ).fetchone()
+        return row is not None
+
+    def purge_expired(self) -> int:
+        """Delete every expired entry and return how many were removed"""
+        cursor = self._connect().execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),)
+        )
+        return cursor.rowcount
@@ -0,0 +1,399 @@
+"""
+Columnar analytics store for the events of every processed flow.
+
+With the store enabled (ARCADE_EVENT_STORE, or --event-store), the events
+process_flow extracts are appended to a Parquet dataset partitioned by team
+and date:
+
+    cache/events/team_id=<team>/date=<YYYY-MM-DD>/<flow_id>.parquet
+
+Each file holds one flow's events of one day (the UTC day of the event, or
+of the flow's creation for events without a timestamp). Files are named by
+the flow identity (see extractors.incremental.flow_identity) and replaced
+atomically, so a flow processed again, or an edited version of it, replaces
+its earlier events instead of adding to them; flow_hash is kept as a column
+and names the stored version. Two columns are derived
+as the flow is stored: current_page_url, the page of the row or of the
+nearest earlier row that has one (scrolls and typing carry no page of their
+own), and on clicks typing_latency_ms, the time until typing started when
+typing followed the click before any other click.
+
+Queries scan only the partitions and columns they need and aggregate record
+batches as they are read (pyarrow's Acero engine), so aggregates over
+millions of events keep memory bounded by the number of groups. aggregate()
+is the general query; scroll_time_by_page() and click_to_typing_latency()
+answer the common questions:
+
+    python -m arcade_flow_analyzer.event_store --team <team> --since 2025-09-01
+
+Requires the optional `pyarrow` dependency (pip install pyarrow).
+"""
+
+import argparse
+import functools
+import importlib.util
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+from .extractors.events import EventTable
+from .telemetry import span
+
+DEFAULT_STORE_PATH = "cache/events"
+
+# Partition value of flows without a team id (e.g. streamed extractions)
+UNKNOWN_TEAM = 'unknown'
+
+MS_PER_DAY = 86_400_000
+
+# Partition columns, encoded in the directory names
+PARTITION_COLUMNS = ['team_id', 'date']
+
+# Columns stored in each file, with their pyarrow type names
+STORED_COLUMNS = [
+    ('flow_id', 'string'),
+    ('flow_hash', 'string'),
+    ('flow_name', 'string'),
+    ('event_index', 'int32'),
+    ('type', 'string'),
+    ('event_ms', 'int64'),
+    ('start_ms', 'int64'),
+    ('end_ms', 'int64'),
+    ('duration_seconds', 'float64'),
+    ('typing_latency_ms', 'int64'),
+    ('click_id', 'string'),
+    ('click_text', 'string'),
+    ('hotspot_label', 'string'),
+    ('page_url', 'string'),
+    ('page_title', 'string'),
+    ('current_page_url', 'string'),
+]
+
+
+def pyarrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _require_pyarrow():
+    if not pyarrow_available():
+        raise ImportError("The event store requires pyarrow: pip install pyarrow")
+
+
+@functools.cache
+def stored_schema():
+    """The pyarrow schema of the stored files (without the partition columns)"""
+    import pyarrow as pa
+
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in STORED_COLUMNS])
+
+
+def _next_index(mask):
+    """For each row, the index of the first later row where mask holds (len if none)"""
+    import numpy as np
+
+    count = len(mask)
+    positions = np.where(mask, np.arange(count), count)
+    first_from = np.minimum.accumulate(positions[::-1])[::-1]
+    return np.append(first_from[1:], count)
+
+
+def typing_latencies(types, event_ms):
+    """Milliseconds from each click to the typing that follows it, -1 elsewhere
+
+    A click's typing is the next typing event, if it starts before the next
+    click.
+    """
+    import numpy as np
+
+    types = np.asarray(types, dtype=object)
+    is_click = types == 'click'
+    typing_at = _next_index(types == 'typing')
+    click_at = _next_index(is_click)
+    latencies = np.full(len(types), -1, dtype=np.int64)
+    followed = is_click & (typing_at < click_at)
+    rows = np.flatnonzero(followed)
+    latencies[rows] = event_ms[typing_at[rows]] - event_ms[rows]
+    # Out-of-order timestamps give no meaningful latency
+    latencies[latencies < 0] = -1
+    return latencies
+
+
+def current_pages(context_ids, page_urls):
+    """Context id of each row's page, carried forward to rows without one
+
+    page_urls is indexed by context id; 0 (no context) before the first page.
+    """
+    import numpy as np
+
+    has_page = np.array([bool(url) for url in page_urls])[context_ids]
+    positions = np.where(has_page, np.arange(len(context_ids)), 0)
+    latest = np.maximum.accumulate(positions) if len(positions) else positions
+    return np.where(has_page[latest], context_ids[latest], 0)
+
+
+def _day(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m-%d")
+
+
+def events_to_table(flow):
+    """(pyarrow table of a flow's events, UTC day number of each row)"""
+    import numpy as np
+    import pyarrow as pa
+
+    events = flow['events']
+    if not isinstance(events, EventTable):
+        raise TypeError("The event store needs the EventTable of process_flow, "
+                        "not streamed events")
+
+    time_ms = np.frombuffer(events.time_ms, dtype=np.int64)
+    start_ms = np.frombuffer(events.start_ms, dtype=np.int64)
+    end_ms = np.frombuffer(events.end_ms, dtype=np.int64)
+    # Clicks have a time, ranged events (typing, scrolling) a start
+    event_ms = np.where(time_ms > 0, time_ms, start_ms)
+    has_range = (start_ms > 0) & (end_ms > 0)
+    latencies = typing_latencies(events.types, event_ms)
+
+    context_index = np.frombuffer(events.context_ids, dtype=np.uint32)
+    context_ids = pa.array(context_index)
+    context_columns = list(zip(*events.contexts))
+    page_urls = pa.array(context_columns[2], pa.string())
+    count = len(events)
+
+    table = pa.table({
+        'flow_id': pa.array([flow['flow_id']] * count, pa.string()),
+        'flow_hash': pa.array([flow['flow_hash']] * count, pa.string()),
+        'flow_name': pa.array([flow['name']] * count, pa.string()),
+        'event_index': pa.array(np.arange(count, dtype=np.int32)),
+        'type': pa.array(events.types, pa.string()),
+        'event_ms': pa.array(event_ms, mask=event_ms <= 0),
+        'start_ms': pa.array(start_ms, mask=start_ms <= 0),
+        'end_ms': pa.array(end_ms, mask=end_ms <= 0),
+        'duration_seconds': pa.array(np.where(has_range, (end_ms - start_ms) / 1000.0, 0.0)),
+        'typing_latency_ms': pa.array(latencies, mask=latencies < 0),
+        'click_id': pa.array(events.click_ids, pa.string()),
+        'click_text': pa.array(context_columns[0], pa.string()).take(context_ids),
+        'hotspot_label': pa.array(context_columns[1], pa.string()).take(context_ids),
+        'page_url': page_urls.take(context_ids),
+        'page_title': pa.array(context_columns[3], pa.string()).take(context_ids),
+        'current_page_url': page_urls.take(
+            pa.array(current_pages(context_index, context_columns[2]))
+        ),
+    }, schema=stored_schema())
+
+    created_ms = flow.get('created_ms') or 0
+    days = np.where(event_ms > 0, event_ms, created_ms) // MS_PER_DAY
+    return table, days
+
+
+def _filter_expression(teams=None, start=None, end=None, where=None):
+    """Dataset filter for teams, an inclusive date range and an extra expression"""
+    import pyarrow.dataset as ds
+
+    conditions = []
+    if teams:
+        conditions.append(ds.field('team_id').isin([str(team) for team in teams]))
+    if start:
+        conditions.append(ds.field('date') >= str(start))
+    if end:
+        conditions.append(ds.field('date') <= str(end))
+    if where is not None:
+        conditions.append(where)
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+class EventStore:
+    """A partitioned Parquet dataset of extracted events"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = str(path)
+
+    def partition_dir(self, team_id, date):
+        # Team ids are URI-encoded, which the hive partitioning decodes
+        return Path(self.path) / f"team_id={quote(team_id, safe='')}" / f"date={date}"
+
+    def append(self, flow):
+        """Store the events of a process_flow result; return the rows written
+
+        Rows are written per date partition, each file replacing the one of
+        an earlier run or version of the same flow. Files of earlier versions
+        in dates this version has no events on are removed.
+        """
+        _require_pyarrow()
+        import numpy as np
+        import pyarrow.parquet as pq
+
+        team_id = flow.get('team_id') or UNKNOWN_TEAM
+        file_name = f"{flow['flow_id']}.parquet"
+        with span('event-store', events=len(flow['events'])) as store_span:
+            table, days = events_to_table(flow)
+            unique_days, day_rows = np.unique(days, return_inverse=True)
+            written = set()
+            for i, day in enumerate(unique_days):
+                rows = table if len(unique_days) == 1 else table.filter(day_rows == i)
+                directory = self.partition_dir(team_id, _day(int(day) * MS_PER_DAY))
+                written.add(directory / file_name)
+                directory.mkdir(parents=True, exist_ok=True)
+                # Dot-prefixed files are ignored by readers until renamed
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-",
+                                                suffix=".parquet")
+                os.close(fd)
+                try:
+                    pq.write_table(rows, tmp_path, compression='zstd')
+                    os.replace(tmp_path, directory / file_name)
+                except BaseException:
+                    Path(tmp_path).unlink(missing_ok=True)
+                    raise
+            team_dir = self.partition_dir(team_id, '').parent
+            for stale in set(team_dir.glob(f"date=*/{file_name}")) - written:
+                stale.unlink(missing_ok=True)
+            store_span.set(partitions=len(unique_days))
+        return table.num_rows
+
+    def dataset(self):
+        """The pyarrow dataset of every stored event, None while the store is empty"""
+        _require_pyarrow()
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if not os.path.isdir(self.path):
+            return None
+        partition_schema = pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS])
+        partitioning = ds.partitioning(partition_schema, flavor='hive')
+        # An explicit schema reads files written before a column was added
+        schema = pa.unify_schemas([stored_schema(), partition_schema])
+        dataset = ds.dataset(self.path, schema=schema, format='parquet',
+                             partitioning=partitioning)
+        return dataset if dataset.files else None
+
+    def aggregate(self, metrics, by=(), teams=None, start=None, end=None, where=None,
+                  order_by=None, descending=True, limit=None):
+        """Aggregate the stored events; return one dict per group
+
+        metrics maps each output name to (column, function), with Acero's
+        aggregate functions ('count', 'sum', 'mean', 'min', 'max',
+        'approximate_median', 'count_distinct', ...); nulls are skipped. by
+        lists the columns to group on, teams, start and end (inclusive
+        'YYYY-MM-DD' dates) select partitions, and where is an extra
+        pyarrow.dataset expression on the rows. Results are sorted on
+        order_by and cut to limit.
+        """
+        dataset = self.dataset()
+        if dataset is None:
+            return []
+        import pyarrow.acero as ac
+
+        by = list(by)
+        columns = sorted(set(by) | {column for column, _ in metrics.values()})
+        scanner = dataset.scanner(columns=columns,
+                                  filter=_filter_expression(teams, start, end, where))
+        aggregates = [(column, f"hash_{function}" if by else function, None, name)
+                      for name, (column, function) in metrics.items()]
+        plan = ac.Declaration.from_sequence([
+            ac.Declaration('record_batch_reader_source',
+                           ac.RecordBatchReaderSourceNodeOptions(scanner.to_reader())),
+            ac.Declaration('aggregate', ac.AggregateNodeOptions(aggregates, keys=by)),
+        ])
+        table = plan.to_table()
+        if order_by:
+            table = table.sort_by([(order_by, 'descending' if descending else 'ascending')])
+        if limit is not None:
+            table = table.slice(0, limit)
+        return table.to_pylist()
+
+    def scroll_time_by_page(self, limit=10, **filters):
+        """Pages with the most scrolling: scrolls, flows and seconds spent scrolling"""
+        import pyarrow.dataset as ds
+
+        return self.aggregate(
+            {'scrolls': ('duration_seconds', 'count'),
+             'flows': ('flow_id', 'count_distinct'),
+             'total_seconds': ('duration_seconds', 'sum'),
+             'mean_seconds': ('duration_seconds', 'mean')},
+            by=['current_page_url'], where=ds.field('type') == 'scrolling',
+            order_by='total_seconds', limit=limit, **filters
+        )
+
+    def click_to_typing_latency(self, by=(), **filters):
+        """Clicks followed by typing, with the median and mean latency in ms"""
+        return self.aggregate(
+            {'clicks': ('typing_latency_ms', 'count'),
+             'median_ms': ('typing_latency_ms', 'approximate_median'),
+             'mean_ms': ('typing_latency_ms', 'mean')},
+            by=by, **filters
+        )
+
+    def summary(self, **filters):
+        """Events, flows and teams stored"""
+        rows = self.aggregate({'events': ('event_index', 'count'),
+                               'flows': ('flow_id', 'count_distinct'),
+                               'teams': ('team_id', 'count_distinct')}, **filters)
+        return rows[0] if rows else {'events': 0, 'flows': 0, 'teams': 0}
+
+
+_stores = {}
+
+
+def get_event_store():
+    """The store at ARCADE_EVENT_STORE, None when the store is not enabled"""
+    path = os.getenv('ARCADE_EVENT_STORE')
+    if not path:
+        return None
+    if path not in _stores:
+        _stores[path] = EventStore(path)
+    return _stores[path]
+
+
+def store_flow_events(flow):
+    """Append a process_flow result to the enabled store; rows written or None"""
+    store = get_event_store()
+    if store is None:
+        return None
+    return store.append(flow)
+
+
+def _format_table(rows, columns):
+    lines = ["| " + " | ".join(columns) + " |",
+             "| " + " | ".join("---" for _ in columns) + " |"]
+    for row in rows:
+        values = [f"{row[column]:.2f}" if isinstance(row[column], float) else
+                  str(row[column] if row[column] is not None else '') for column in columns]
+        lines.append("| " + " | ".join(values) + " |")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate stats over the event store")
+    parser.add_argument('--store',
+                        default=os.getenv('ARCADE_EVENT_STORE') or DEFAULT_STORE_PATH,
+                        help="Store directory (default: $ARCADE_EVENT_STORE or "
+                             f"{DEFAULT_STORE_PATH})")
+    parser.add_argument('--team', action='append', dest='teams',
+                        help="Only this team (repeatable)")
+    parser.add_argument('--since', help="First date, YYYY-MM-DD")
+    parser.add_argument('--until', help="Last date, YYYY-MM-DD")
+    parser.add_argument('--limit', type=int, default=10, help="Pages listed (default: 10)")
+    args = parser.parse_args()
+
+    store = EventStore(args.store)
+    filters = {'teams': args.teams, 'start': args.since, 'end': args.until}
+    summary = store.summary(**filters)
+    print(f"{summary['events']} events from {summary['flows']} flows "
+          f"of {summary['teams']} teams")
+    print()
+    print("## Pages scrolled longest")
+    print()
+    print("\n".join(_format_table(store.scroll_time_by_page(args.limit, **filters),
+                                  ['current_page_url', 'scrolls', 'flows', 'total_seconds',
+                                   'mean_seconds'])))
+    print()
+    print("## Click-to-typing latency")
+    print()
+    print("\n".join(_format_table(store.click_to_typing_latency(**filters),
+                                  ['clicks', 'median_ms', 'mean_ms'])))
@@ -2,7 +2,24 @@
 Extractors module for parsing and extracting data from various sources.
 """
 
-from .extractor import process_flow, save_to_csv
-from .basic_extractor import main as basic_extractor_main
+from .._lazy import lazy_exports
 
-__all__ = ['process_flow', 'save_to_csv', 'basic_extractor_main']
+_EXPORTS = {
+    'process_flow': '.extractor',
+    'process_flow_bytes': '.extractor',
+    'save_to_csv': '.extractor',
+    'EventTable': '.events',
+    'process_flow_streaming': '.streaming',
+    'iter_flow_events': '.streaming',
+    'flow_identity': '.incremental',
+    'load_snapshot': '.incremental',
+    'save_snapshot': '.incremental',
+    'previous_image_summary': '.incremental',
+    'basic_extractor_main': '.basic_extractor:main',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = ['process_flow', 'process_flow_bytes', 'save_to_csv', 'EventTable', 'process_flow_streaming', 'iter_flow_events',
+           'flow_identity', 'load_snapshot', 'save_snapshot', 'previous_image_summary',
+           'basic_extractor_main']
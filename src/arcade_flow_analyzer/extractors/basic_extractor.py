@@ -1,6 +1,5 @@
-import json
 from pathlib import Path
-from ..models import FlowData
+from ..models import FlowData, parse_flow
 from pydantic import ValidationError
 
 
@@ -10,12 +9,12 @@ def load_flow_data():
     if not flow_json.exists():
         raise FileNotFoundError("flow.json not found!")
 
-    with open(flow_json, 'r') as f:
-        raw_data = json.load(f)
+    with open(flow_json, 'rb') as f:
+        raw_bytes = f.read()
     
     try:
-        # Validate the data using Pydantic model
-        flow_data = FlowData(**raw_data)
+        # Validate the data using Pydantic model, straight from the JSON bytes
+        flow_data = parse_flow(raw_bytes)
         print("JSON passes flow model validation")
         return flow_data
     except ValidationError as e:
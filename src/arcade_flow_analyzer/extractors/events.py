@@ -0,0 +1,232 @@
+"""
+Compact storage for extracted event rows.
+
+process_flow used to build one dict per event, with its three timestamps
+preformatted as datetime strings. An EventTable keeps the rows column-wise
+instead: timestamps as raw millisecond integers in arrays, and each row's
+step context (click text, hotspot label, page URL and title) as an index into
+a table of distinct contexts whose strings are interned, so the events of a
+step, and the pages they share, are stored once.
+
+Datetimes are formatted only when rows are read, through the dict view
+(iteration and indexing yield the same dicts as before), the tuple view used
+for CSV output (rows()) or the column view used for DataFrames (columns()).
+"""
+
+import functools
+import json
+import sys
+from array import array
+from datetime import datetime
+
+from ..models import InvalidFlowError
+
+EVENT_FIELDS = [
+    'type', 'timestamp_datetime', 'start_time_datetime', 'end_time_datetime',
+    'duration_seconds', 'click_text', 'hotspot_label', 'page_url',
+    'page_title', 'clickId',
+]
+
+# Step fields copied onto the rows of the step's events (see step_context)
+CONTEXT_FIELDS = ('click_text', 'hotspot_label', 'page_url', 'page_title')
+EMPTY_CONTEXT = ('', '', '', '')
+
+# Below 2**32 seconds, ms / 1000.0 is accurate to well under a microsecond,
+# so formatting the whole seconds and appending the milliseconds gives
+# exactly what fromtimestamp() on the float does
+_EXACT_MS_LIMIT = 2 ** 32 * 1000
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_minute(minutes):
+    """Local "%Y-%m-%d %H:%M:" of a minute since the epoch
+
+    None when the local UTC offset is not a whole number of minutes (some
+    historical zones), where seconds have to be formatted one by one.
+    """
+    dt = datetime.fromtimestamp(minutes * 60)
+    if dt.second:
+        return None
+    return dt.strftime("%Y-%m-%d %H:%M:")
+
+
+def ms_to_datetime(timestamp_ms: int) -> str:
+    """Convert milliseconds timestamp to readable datetime"""
+    if timestamp_ms and timestamp_ms > 0:
+        try:
+            if type(timestamp_ms) is int and timestamp_ms < _EXACT_MS_LIMIT:
+                seconds, millis = divmod(timestamp_ms, 1000)
+                minutes, second = divmod(seconds, 60)
+                prefix = _format_minute(minutes)
+                if prefix is not None:
+                    return f"{prefix}{second:02d}.{millis:03d}"
+                dt = datetime.fromtimestamp(seconds)
+                return f"{dt.strftime('%Y-%m-%d %H:%M:%S')}.{millis:03d}"
+            timestamp_seconds = timestamp_ms / 1000.0
+            dt = datetime.fromtimestamp(timestamp_seconds)
+            return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        except Exception:
+            return ""
+    return ""
+
+
+def duration_seconds(start_ms, end_ms):
+    """Event duration, 0 unless both ends are known"""
+    if start_ms and end_ms:
+        return (end_ms - start_ms) / 1000.0
+    return 0
+
+
+class EventTable:
+    """The extracted event rows of a flow, stored column-wise
+
+    Reads like the list of row dicts process_flow used to return: len(),
+    iteration and indexing yield dicts keyed by EVENT_FIELDS, built when the
+    row is read.
+    """
+
+    def __init__(self):
+        self.types = []
+        self.time_ms = array('q')
+        self.start_ms = array('q')
+        self.end_ms = array('q')
+        self.click_ids = []
+        self.context_ids = array('I')
+        self.contexts = [EMPTY_CONTEXT]
+        self._context_index = {EMPTY_CONTEXT: 0}
+
+    def add_context(self, context):
+        """Return the id of a step context, registering it if it is new
+
+        context is a step_context dict or a sequence in CONTEXT_FIELDS order.
+        """
+        if isinstance(context, dict):
+            context = tuple(context.get(field, '') for field in CONTEXT_FIELDS)
+        else:
+            context = tuple(context or EMPTY_CONTEXT)
+        context_id = self._context_index.get(context)
+        if context_id is None:
+            context = tuple(sys.intern(value) for value in context)
+            context_id = self._context_index[context] = len(self.contexts)
+            self.contexts.append(context)
+        return context_id
+
+    def append(self, event_type, time_ms, start_ms, end_ms, click_id, context_id=0):
+        """Append a row from raw event fields and a context id"""
+        try:
+            self.time_ms.append(time_ms or 0)
+            self.start_ms.append(start_ms or 0)
+            self.end_ms.append(end_ms or 0)
+        except OverflowError:
+            raise InvalidFlowError(f"Validation failed: event timestamp out of range "
+                                   f"({time_ms}, {start_ms}, {end_ms})")
+        self.types.append(sys.intern(event_type))
+        self.click_ids.append(click_id or '')
+        self.context_ids.append(context_id)
+
+    def append_event(self, event, context_id=0):
+        """Append the row of a CapturedEvent"""
+        self.append(event.type, event.timeMs, event.startTimeMs, event.endTimeMs,
+                    event.clickId, context_id)
+
+    def raw_row(self, index):
+        """A row as JSON-serializable raw values, as taken by append_raw"""
+        return [self.types[index], self.time_ms[index], self.start_ms[index],
+                self.end_ms[index], self.click_ids[index],
+                list(self.contexts[self.context_ids[index]])]
+
+    def append_raw(self, row):
+        """Append a row returned by raw_row (possibly of another table)"""
+        event_type, time_ms, start_ms, end_ms, click_id, context = row
+        self.append(event_type, time_ms, start_ms, end_ms, click_id,
+                    self.add_context(context))
+
+    def __len__(self):
+        return len(self.types)
+
+    def rows(self):
+        """Yield each row as a tuple of values in EVENT_FIELDS order"""
+        contexts = self.contexts
+        for event_type, time_ms, start_ms, end_ms, click_id, context_id in zip(
+                self.types, self.time_ms, self.start_ms, self.end_ms,
+                self.click_ids, self.context_ids):
+            click_text, hotspot_label, page_url, page_title = contexts[context_id]
+            yield (event_type, ms_to_datetime(time_ms), ms_to_datetime(start_ms),
+                   ms_to_datetime(end_ms), duration_seconds(start_ms, end_ms),
+                   click_text, hotspot_label, page_url, page_title, click_id)
+
+    def __iter__(self):
+        for row in self.rows():
+            yield dict(zip(EVENT_FIELDS, row))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        click_text, hotspot_label, page_url, page_title = self.contexts[self.context_ids[index]]
+        start_ms, end_ms = self.start_ms[index], self.end_ms[index]
+        return dict(zip(EVENT_FIELDS, (
+            self.types[index], ms_to_datetime(self.time_ms[index]),
+            ms_to_datetime(start_ms), ms_to_datetime(end_ms),
+            duration_seconds(start_ms, end_ms),
+            click_text, hotspot_label, page_url, page_title, self.click_ids[index],
+        )))
+
+    def columns(self):
+        """The rows column-wise, as {field: list of values}"""
+        contexts = [self.contexts[context_id] for context_id in self.context_ids]
+        click_text, hotspot_label, page_url, page_title = (
+            [list(column) for column in zip(*contexts)] if contexts else ([], [], [], [])
+        )
+        return {
+            'type': list(self.types),
+            'timestamp_datetime': [ms_to_datetime(ms) for ms in self.time_ms],
+            'start_time_datetime': [ms_to_datetime(ms) for ms in self.start_ms],
+            'end_time_datetime': [ms_to_datetime(ms) for ms in self.end_ms],
+            'duration_seconds': [duration_seconds(start_ms, end_ms)
+                                 for start_ms, end_ms in zip(self.start_ms, self.end_ms)],
+            'click_text': click_text,
+            'hotspot_label': hotspot_label,
+            'page_url': page_url,
+            'page_title': page_title,
+            'clickId': list(self.click_ids),
+        }
+
+    def hash_rows(self):
+        """Yield each row serialized the way FlowHasher serializes row dicts
+
+        Sorted keys, every value as a JSON string. Context fields are encoded
+        once per distinct context instead of once per row.
+        """
+        dumps = json.dumps
+        encoded = [(dumps(click_text), dumps(hotspot_label), dumps(page_title), dumps(page_url))
+                   for click_text, hotspot_label, page_url, page_title in self.contexts]
+        types = {}
+        for event_type, time_ms, start_ms, end_ms, click_id, context_id in zip(
+                self.types, self.time_ms, self.start_ms, self.end_ms,
+                self.click_ids, self.context_ids):
+            type_json = types.get(event_type)
+            if type_json is None:
+                type_json = types[event_type] = dumps(event_type)
+            click_text, hotspot_label, page_title, page_url = encoded[context_id]
+            # Datetime strings never need escaping
+            yield (f'{{"clickId":{dumps(click_id)},"click_text":{click_text},'
+                   f'"duration_seconds":"{duration_seconds(start_ms, end_ms)}",'
+                   f'"end_time_datetime":"{ms_to_datetime(end_ms)}",'
+                   f'"hotspot_label":{hotspot_label},"page_title":{page_title},'
+                   f'"page_url":{page_url},'
+                   f'"start_time_datetime":"{ms_to_datetime(start_ms)}",'
+                   f'"timestamp_datetime":"{ms_to_datetime(time_ms)}",'
+                   f'"type":{type_json}}}')
+
+    def __getstate__(self):
+        # The context index is rebuilt on unpickling rather than sent along
+        state = dict(self.__dict__)
+        del state['_context_index']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._context_index = {context: i for i, context in enumerate(self.contexts)}
+
+    def __repr__(self):
+        return f"<EventTable: {len(self)} events, {len(self.contexts)} contexts>"
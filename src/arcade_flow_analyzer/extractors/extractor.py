@@ -2,76 +2,133 @@
 Arcade Flow/Actions Extractor
 """
 
-import json
 import csv
+import os
+import tempfile
 from pathlib import Path
-from ..models import FlowData
+from ..models import CapturedEvent, InvalidFlowError, Step, parse_flow
+from ..caching import flow_hash
+from ..telemetry import span
+from .events import EVENT_FIELDS, EventTable, duration_seconds, ms_to_datetime
+from .incremental import flow_identity
 from pydantic import ValidationError
-from datetime import datetime
 
 
-def ms_to_datetime(timestamp_ms: int) -> str:
-    """Convert milliseconds timestamp to readable datetime"""
-    if timestamp_ms and timestamp_ms > 0:
+def step_context(step: Step):
+    """Extract the step fields that are copied onto matching event rows"""
+    context = {}
+    if step.clickContext:
+        context['click_text'] = step.clickContext.text or ''
+
+    if step.hotspots:
+        context['hotspot_label'] = step.hotspots[0].label or ''
+
+    if step.pageContext:
+        context['page_url'] = step.pageContext.url or ''
+        context['page_title'] = step.pageContext.title or ''
+    return context
+
+
+def build_event_row(event: CapturedEvent, context=None):
+    """Build the extracted row dict for one event, merged with its step context
+
+    Used where rows are produced one at a time (the streaming extractor);
+    process_flow stores its rows in an EventTable instead.
+    """
+    event_data = {
+        'type': event.type,
+        'timestamp_datetime': ms_to_datetime(event.timeMs or 0),
+        'start_time_datetime': ms_to_datetime(event.startTimeMs or 0),
+        'end_time_datetime': ms_to_datetime(event.endTimeMs or 0),
+        'duration_seconds': duration_seconds(event.startTimeMs, event.endTimeMs),
+        'click_text': '',
+        'hotspot_label': '',
+        'page_url': '',
+        'page_title': '',
+        'clickId': event.clickId or '',
+    }
+    if context:
+        event_data.update(context)
+    return event_data
+
+
+def build_event_table(flow_data, steps_lookup):
+    """Build the EventTable of a validated flow"""
+    events = EventTable()
+    context_ids = {step_id: events.add_context(context)
+                   for step_id, context in steps_lookup.items()}
+    for index, event in enumerate(flow_data.capturedEvents):
+        event_id = event.clickId or f"event_{index}"
+        events.append_event(event, context_ids.get(event_id, 0))
+    return events
+
+
+def process_flow(file_path: str, incremental=False, cache=None):
+    """Load JSON, validate with Pydantic, and extract basic event data
+
+    The result's 'events' is an EventTable: it reads like a list of row
+    dicts, with datetimes formatted as rows are read.
+    """
+    with open(file_path, 'rb') as f:
+        return process_flow_bytes(f.read(), incremental, cache)
+
+
+def process_flow_bytes(raw_bytes: bytes, incremental=False, cache=None):
+    """Validate and extract a flow from raw flow.json bytes (e.g. an upload)
+
+    The result's 'flow_id' identifies the flow across edits, while
+    'flow_hash' changes with every edit.
+
+    With incremental=True the flow is diffed against the cached snapshot of
+    its previous version and only the rows affected by the edit are rebuilt
+    (see extractors.incremental). The result then also carries 'diff',
+    'previous_image_summary' and the fields save_snapshot stores.
+    """
+    with span('validate', bytes=len(raw_bytes)):
         try:
-            timestamp_seconds = timestamp_ms / 1000.0
-            dt = datetime.fromtimestamp(timestamp_seconds)
-            return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        except Exception:
-            return ""
-    return ""
-
-
-def process_flow(file_path: str):
-    """Load JSON, validate with Pydantic, and extract basic event data"""
-    with open(file_path, 'r') as f:
-        raw_data = json.load(f)
-    try:
-        flow_data = FlowData(**raw_data)
-    except ValidationError as e:
-        raise ValueError(f"Validation failed: {e}")
-
-    events = []
-    steps_lookup = {step.id: step for step in flow_data.steps if step.id}
-
-    for event in flow_data.capturedEvents:
-        event_id = event.clickId or f"event_{len(events)}"
-        step_data = steps_lookup.get(event_id)
-
-        event_data = {
-            'type': event.type,
-            'timestamp_datetime': ms_to_datetime(event.timeMs or 0),
-            'start_time_datetime': ms_to_datetime(event.startTimeMs or 0),
-            'end_time_datetime': ms_to_datetime(event.endTimeMs or 0),
-            'duration_seconds': 0,
-            'click_text': '',
-            'hotspot_label': '',
-            'page_url': '',
-            'page_title': '',
-            'clickId': event.clickId or '',
+            flow_data = parse_flow(raw_bytes)
+        except ValidationError as e:
+            raise InvalidFlowError(f"Validation failed: {e}")
+
+    with span('extract', incremental=incremental) as extract_span:
+        steps_lookup = {step.id: step_context(step) for step in flow_data.steps if step.id}
+
+        flow_id = flow_identity(flow_data)
+        if incremental:
+            from .incremental import extract_incremental, load_snapshot
+
+            snapshot = load_snapshot(flow_id, cache)
+            events, event_keys, event_inputs, diff = extract_incremental(
+                flow_data, steps_lookup, snapshot
+            )
+            extract_span.set(rows_reused=diff['rows_reused'],
+                             rows_rebuilt=diff['rows_rebuilt'])
+            print(f"Incremental extraction: {diff['rows_rebuilt']}/{len(events)} rows "
+                  f"rebuilt ({diff['steps_changed']} steps changed, "
+                  f"{diff['events_added']} events added, "
+                  f"{diff['events_removed']} removed)")
+        else:
+            events = build_event_table(flow_data, steps_lookup)
+
+        result = {
+            'name': flow_data.name,
+            'flow_hash': flow_hash(events),
+            'flow_id': flow_id,
+            'events': events,
+            'team_id': flow_data.teamId,
+            'created_ms': (flow_data.created.seconds * 1000 +
+                           flow_data.created.nanoseconds // 1_000_000),
         }
-        if event.startTimeMs and event.endTimeMs:
-            event_data['duration_seconds'] = (event.endTimeMs - event.startTimeMs) / 1000.0
-        events.append(event_data)
-
-        if step_data and step_data.clickContext:
-            event_data['click_text'] = step_data.clickContext.text or ''
-        
-        if step_data and step_data.hotspots:
-            hotspot = step_data.hotspots
-            if hotspot:
-                event_data['hotspot_label'] = hotspot[0].label or ''
-        
-        if step_data and step_data.pageContext:
-            page_context = step_data.pageContext
-            page_url = page_context.url or ''
-            event_data['page_url'] = page_url
-            event_data['page_title'] = page_context.title or ''
-
-    return {
-        'name': flow_data.name,
-        'events': events
-    }
+        if incremental:
+            result.update({
+                'diff': diff,
+                'previous_image_summary': snapshot and snapshot.get('image_summary'),
+                'steps_lookup': steps_lookup,
+                'event_keys': event_keys,
+                'event_inputs': event_inputs,
+            })
+        extract_span.set(events=len(events))
+    return result
 
 
 def save_to_csv(data, output_path: str):
@@ -84,12 +141,29 @@ def save_to_csv(data, output_path: str):
 
     csv_path = cache_dir / output_path
 
-    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-        if data['events']:
-            fieldnames = data['events'][0].keys()
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(data['events'])
+    # Write to a temporary file and rename so concurrent batch workers
+    # never read a partially written CSV
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-", suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as csvfile:
+            events = data['events']
+            if isinstance(events, EventTable):
+                if len(events):
+                    writer = csv.writer(csvfile)
+                    writer.writerow(EVENT_FIELDS)
+                    writer.writerows(events.rows())
+            else:
+                # Events may be a lazy iterator, so write rows as they arrive
+                writer = None
+                for event in events:
+                    if writer is None:
+                        writer = csv.DictWriter(csvfile, fieldnames=EVENT_FIELDS)
+                        writer.writeheader()
+                    writer.writerow(event)
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
 
     return str(csv_path)
 
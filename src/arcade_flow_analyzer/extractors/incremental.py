@@ -0,0 +1,139 @@
+"""
+Incremental extraction for edited flows.
+
+A flow keeps its identity (team, author and creation time) across edits.
+After a flow has been analyzed, a snapshot of its step contexts, the raw
+fields of every captured event and the extracted rows is cached under that
+identity. When an edited version of the flow is extracted, the new version
+is diffed against the snapshot by step id and event clickId: a row is reused
+when the event's own fields and the step context copied onto it are
+unchanged, so only the rows touched by the edit are rebuilt.
+
+Reuse never depends on the identity being unique: a row is only reused when
+everything it is built from is equal, so a collision only costs reuse.
+"""
+
+import json
+from collections import Counter
+
+from ..caching import cache_key, get_cache, text_hash
+from .events import EventTable
+
+# Bump when the snapshot layout or the row format changes
+SNAPSHOT_VERSION = 2
+
+
+def identity_hash(team_id, created_by, created_seconds, created_nanoseconds) -> str:
+    """flow_identity from the raw fields (e.g. collected by a streaming parse)"""
+    identity = [team_id, created_by, created_seconds, created_nanoseconds]
+    return text_hash(json.dumps(identity))
+
+
+def flow_identity(flow_data) -> str:
+    """Identify a flow across edits (its content hash changes with every edit)"""
+    return identity_hash(flow_data.teamId, flow_data.createdBy,
+                         flow_data.created.seconds, flow_data.created.nanoseconds)
+
+
+def event_inputs(event):
+    """The captured event fields an extracted row is built from"""
+    return [event.type, event.timeMs, event.startTimeMs, event.endTimeMs, event.clickId]
+
+
+def _snapshot_key(flow_id):
+    return cache_key(flow_id, 'flow-snapshot', str(SNAPSHOT_VERSION), '')
+
+
+def load_snapshot(flow_id, cache=None):
+    """Return the cached snapshot of the last analyzed version, or None"""
+    cache = cache or get_cache()
+    content = cache.get_text(_snapshot_key(flow_id))
+    if content is None:
+        return None
+    snapshot = json.loads(content)
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def save_snapshot(flow, cache=None, image_summary=None):
+    """Cache a snapshot of an incrementally extracted flow
+
+    image_summary is the summary the flow's image was generated from; the
+    next version compares its summary against it to decide whether the image
+    can be reused. Does nothing for flows not extracted incrementally.
+    """
+    if not flow or 'event_keys' not in flow:
+        return None
+    cache = cache or get_cache()
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'flow_hash': flow['flow_hash'],
+        'steps': flow['steps_lookup'],
+        'keys': flow['event_keys'],
+        'inputs': flow['event_inputs'],
+        'rows': [flow['events'].raw_row(index) for index in range(len(flow['events']))],
+        'image_summary': image_summary,
+    }
+    return cache.set_text(_snapshot_key(flow['flow_id']), json.dumps(snapshot))
+
+
+def previous_image_summary(flow):
+    """The summary the previous version's image was generated from, if known"""
+    return (flow or {}).get('previous_image_summary')
+
+
+def extract_incremental(flow_data, steps_lookup, snapshot=None):
+    """Build the event rows, reusing unchanged rows from snapshot
+
+    Events are matched by clickId (or position, for events without one),
+    counting repeated clickIds. Returns (events, event_keys, event_inputs,
+    diff), where diff counts the steps and events added, removed and changed
+    and the rows reused and rebuilt.
+    """
+    snapshot = snapshot or {}
+    previous_steps = snapshot.get('steps', {})
+    previous_events = dict(zip(snapshot.get('keys', []),
+                               zip(snapshot.get('inputs', []), snapshot.get('rows', []))))
+
+    changed_steps = {step_id for step_id, context in steps_lookup.items()
+                     if step_id in previous_steps and previous_steps[step_id] != context}
+    added_steps = set(steps_lookup) - set(previous_steps)
+    removed_steps = set(previous_steps) - set(steps_lookup)
+    stale_steps = changed_steps | added_steps | removed_steps
+
+    events = EventTable()
+    context_ids = {step_id: events.add_context(context)
+                   for step_id, context in steps_lookup.items()}
+    keys, inputs = [], []
+    occurrences = Counter()
+    reused = changed = 0
+    for event in flow_data.capturedEvents:
+        event_id = event.clickId or f"event_{len(events)}"
+        occurrence = occurrences[event_id]
+        occurrences[event_id] += 1
+        key = f"{event_id}#{occurrence}" if occurrence else event_id
+
+        fields = event_inputs(event)
+        previous = previous_events.get(key)
+        if previous is not None and previous[0] == fields and event_id not in stale_steps:
+            events.append_raw(previous[1])
+            reused += 1
+        else:
+            events.append_event(event, context_ids.get(event_id, 0))
+            changed += previous is not None
+        keys.append(key)
+        inputs.append(fields)
+
+    added = sum(1 for key in keys if key not in previous_events)
+    diff = {
+        'steps_added': len(added_steps) if snapshot else 0,
+        'steps_removed': len(removed_steps),
+        'steps_changed': len(changed_steps),
+        'events_added': added,
+        'events_removed': len(set(previous_events) - set(keys)),
+        'events_changed': changed,
+        'rows_reused': reused,
+        'rows_rebuilt': len(events) - reused,
+    }
+    return events, keys, inputs, diff
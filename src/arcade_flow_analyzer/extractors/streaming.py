@@ -0,0 +1,115 @@
+"""
+Streaming Arcade Flow extractor
+
+Parses flow.json incrementally with ijson instead of loading the whole
+document. Steps are validated one at a time and reduced to the few fields
+copied onto event rows, then captured events are validated and yielded one
+at a time, so peak memory does not grow with the size of the flow.
+
+Requires the optional `ijson` dependency (pip install ijson).
+"""
+
+from pydantic import ValidationError
+
+from ..caching import FlowHasher
+from ..models import CapturedEvent, InvalidFlowError, Step
+from .extractor import build_event_row, step_context
+from .incremental import identity_hash
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _require_ijson():
+    if ijson is None:
+        raise ImportError("Streaming extraction requires ijson: pip install ijson")
+
+
+# Top-level fields flow_identity is computed from
+IDENTITY_PREFIXES = ('teamId', 'createdBy', 'created._seconds', 'created._nanoseconds')
+
+
+def scan_steps(file_path: str):
+    """Stream the steps, returning the flow name, the step context lookup and
+    the flow identity (see incremental.flow_identity)
+
+    Only the flow name, its identity fields and the per-step fields used for
+    event rows are kept.
+    """
+    _require_ijson()
+    name = None
+    steps_lookup = {}
+    identity = {}
+    builder = None
+
+    with open(file_path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == 'steps.item' and event == 'end_map':
+                    try:
+                        step = Step.model_validate(builder.value)
+                    except ValidationError as e:
+                        raise InvalidFlowError(f"Validation failed: {e}")
+                    if step.id:
+                        steps_lookup[step.id] = step_context(step)
+                    builder = None
+            elif prefix == 'steps.item' and event == 'start_map':
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix == 'name' and event == 'string':
+                name = value
+            elif prefix in IDENTITY_PREFIXES and event in ('string', 'number'):
+                identity[prefix] = value
+
+    if name is None:
+        raise InvalidFlowError("Validation failed: flow name is missing")
+    missing = [field for field in IDENTITY_PREFIXES if field not in identity]
+    if missing:
+        raise InvalidFlowError(f"Validation failed: flow {', '.join(missing)} missing")
+    return name, steps_lookup, identity_hash(*(identity[field] for field in IDENTITY_PREFIXES))
+
+
+def iter_captured_events(file_path: str):
+    """Yield validated CapturedEvent models one at a time"""
+    _require_ijson()
+    with open(file_path, 'rb') as f:
+        for item in ijson.items(f, 'capturedEvents.item', use_float=True):
+            try:
+                yield CapturedEvent.model_validate(item)
+            except ValidationError as e:
+                raise InvalidFlowError(f"Validation failed: {e}")
+
+
+def iter_flow_events(file_path: str, steps_lookup=None):
+    """Lazily yield extracted event rows, in the same format as process_flow"""
+    if steps_lookup is None:
+        _, steps_lookup, _ = scan_steps(file_path)
+
+    for index, event in enumerate(iter_captured_events(file_path)):
+        event_id = event.clickId or f"event_{index}"
+        yield build_event_row(event, steps_lookup.get(event_id))
+
+
+def process_flow_streaming(file_path: str):
+    """Streaming counterpart of process_flow
+
+    Returns the same dict, except 'events' is a lazy iterator. 'flow_hash'
+    and 'event_count' are filled in once the iterator has been consumed
+    (e.g. by save_to_csv).
+    """
+    name, steps_lookup, flow_id = scan_steps(file_path)
+    result = {'name': name, 'flow_hash': None, 'flow_id': flow_id, 'event_count': 0}
+
+    def events():
+        hasher = FlowHasher()
+        for event_data in iter_flow_events(file_path, steps_lookup):
+            hasher.add(event_data)
+            result['event_count'] += 1
+            yield event_data
+        result['flow_hash'] = hasher.hexdigest()
+
+    result['events'] = events()
+    return result
@@ -0,0 +1,18 @@
+"""
+Durable job queue for resumable batch runs.
+"""
+
+from .._lazy import lazy_exports
+
+_EXPORTS = {
+    'JobQueue': '.queue',
+    'LeaseLost': '.queue',
+    'DEFAULT_QUEUE_PATH': '.queue',
+    'STAGES': '.runner',
+    'run_job': '.runner',
+    'run_worker': '.runner',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = ['JobQueue', 'LeaseLost', 'DEFAULT_QUEUE_PATH', 'STAGES', 'run_job', 'run_worker']
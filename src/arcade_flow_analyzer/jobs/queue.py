@@ -0,0 +1,298 @@
+"""
+Durable SQLite job queue for batch runs.
+
+Each job tracks one flow file through the pipeline stages. Workers (threads
+or processes on the same host) lease a job for a limited time, record a
+checkpoint after every completed stage and renew the lease while they work.
+A job whose worker crashed is leased again once its lease expires, and a
+failed job is retried after a backoff, in both cases resuming after its last
+checkpointed stage. Jobs that keep failing are marked failed after
+max_attempts.
+
+Job rows are returned as dicts with the checkpoint and options decoded.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ..caching import text_hash
+
+DEFAULT_QUEUE_PATH = "cache/jobs.sqlite3"
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+# Delay before retrying a failed job, doubled on every attempt
+DEFAULT_RETRY_DELAY = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    flow_file TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    checkpoint TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    available_at REAL NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (flow_file, file_hash, options)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, available_at);
+"""
+
+# Job statuses; 'running' jobs hold a lease
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+class LeaseLost(Exception):
+    """The worker's lease on a job expired and another worker may own it"""
+
+
+def worker_name():
+    """A worker id unique on this host: hostname, process and thread"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _owner_alive(lease_owner):
+    """False if lease_owner is a worker process on this host that has exited"""
+    host, _, rest = (lease_owner or '').partition(':')
+    pid = rest.partition(':')[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _file_hash(flow_file):
+    with open(flow_file, 'rb') as f:
+        return text_hash(f.read().decode('utf-8', errors='replace'))
+
+
+class JobQueue:
+    """Jobs in a SQLite database shared by every worker on the host"""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # A connection must not be used across fork(), so each process opens its own
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit; multi-statement updates open their own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """An exclusive write transaction, so a job is never leased twice"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _decode(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['checkpoint'] = json.loads(job['checkpoint'])
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def enqueue(self, flow_file, options=None):
+        """Add a job for flow_file and return its id
+
+        Idempotent: a flow whose content and options already have a job keeps
+        that job. A failed job is made pending again with fresh attempts, so
+        it resumes from its last checkpoint.
+        """
+        file_hash = _file_hash(flow_file)
+        options = json.dumps(options or {}, sort_keys=True)
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, status FROM jobs WHERE flow_file = ? AND file_hash = ? "
+                "AND options = ?", (flow_file, file_hash, options)
+            ).fetchone()
+            if row is None:
+                return conn.execute(
+                    "INSERT INTO jobs (flow_file, file_hash, options, status, checkpoint, "
+                    "attempts, max_attempts, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, '{}', 0, ?, ?, ?, ?)",
+                    (flow_file, file_hash, options, PENDING, self.max_attempts, now, now, now)
+                ).lastrowid
+            if row['status'] == FAILED:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, "
+                    "updated_at = ? WHERE id = ?", (PENDING, now, now, row['id'])
+                )
+            return row['id']
+
+    def lease(self, worker_id=None):
+        """Lease the next runnable job for worker_id, or return None
+
+        Runnable jobs are pending jobs past their retry delay and running jobs
+        whose lease expired, or whose worker on this host has exited. An
+        expired job that has used all its attempts is marked failed instead.
+        """
+        worker_id = worker_id or worker_name()
+        now = time.time()
+        with self._transaction() as conn:
+            running = conn.execute("SELECT id, lease_owner FROM jobs WHERE status = ? "
+                                   "AND lease_expires_at > ?", (RUNNING, now)).fetchall()
+            for row in running:
+                if not _owner_alive(row['lease_owner']):
+                    conn.execute("UPDATE jobs SET lease_expires_at = ? WHERE id = ?",
+                                 (now, row['id']))
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE (status = ? AND available_at <= ?) "
+                    "OR (status = ? AND lease_expires_at <= ?) ORDER BY id LIMIT 1",
+                    (PENDING, now, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row['status'] == RUNNING and row['attempts'] >= row['max_attempts']:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, lease_owner = NULL, error = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (FAILED, f"lease of {row['lease_owner']} expired "
+                                 f"after {row['attempts']} attempts", now, row['id'])
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, worker_id, now + self.lease_seconds, now, row['id'])
+                )
+                return self._decode(conn.execute("SELECT * FROM jobs WHERE id = ?",
+                                                 (row['id'],)).fetchone())
+
+    def _update_leased(self, job_id, worker_id, assignments, values):
+        """Update a job only while worker_id holds its lease"""
+        cursor = self._connect().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            (*values, time.time(), job_id, RUNNING, worker_id)
+        )
+        if cursor.rowcount != 1:
+            raise LeaseLost(f"job {job_id} is no longer leased by {worker_id}")
+
+    def renew(self, job_id, worker_id):
+        """Extend the lease on a job"""
+        self._update_leased(job_id, worker_id, "lease_expires_at = ?",
+                            (time.time() + self.lease_seconds,))
+
+    def checkpoint(self, job_id, worker_id, stage, checkpoint):
+        """Record that stage completed with checkpoint, and extend the lease"""
+        self._update_leased(job_id, worker_id,
+                            "stage = ?, checkpoint = ?, lease_expires_at = ?",
+                            (stage, json.dumps(checkpoint), time.time() + self.lease_seconds))
+
+    def complete(self, job_id, worker_id):
+        """Mark a leased job done"""
+        self._update_leased(job_id, worker_id,
+                            "status = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                            "error = NULL", (DONE,))
+
+    def fail(self, job_id, worker_id, error, retry=True):
+        """Release a leased job after an error
+
+        The job is retried after retry_delay * 2**(attempts - 1) seconds,
+        or marked failed once it has used max_attempts or if retry is False.
+        """
+        job = self.get(job_id)
+        if not retry or job['attempts'] >= job['max_attempts']:
+            self._update_leased(job_id, worker_id,
+                                "status = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                                "error = ?", (FAILED, error))
+            return FAILED
+        delay = self.retry_delay * 2 ** (job['attempts'] - 1)
+        self._update_leased(job_id, worker_id,
+                            "status = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                            "available_at = ?, error = ?",
+                            (PENDING, time.time() + delay, error))
+        return PENDING
+
+    @contextmanager
+    def keep_leased(self, job_id, worker_id, interval=None):
+        """Renew the lease on a job in the background while the block runs
+
+        A lost lease is only reported by the next checkpoint; renewal stops
+        quietly.
+        """
+        interval = interval or self.lease_seconds / 3
+        stopped = threading.Event()
+
+        def renew():
+            while not stopped.wait(interval):
+                try:
+                    self.renew(job_id, worker_id)
+                except LeaseLost:
+                    return
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def get(self, job_id):
+        return self._decode(self._connect().execute(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def jobs(self, job_ids=None):
+        """Return all jobs, or the given ones, in id order"""
+        rows = self._connect().execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        jobs = [self._decode(row) for row in rows]
+        if job_ids is not None:
+            wanted = set(job_ids)
+            jobs = [job for job in jobs if job['id'] in wanted]
+        return jobs
+
+    def counts(self):
+        """Number of jobs per status"""
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def next_retry_at(self):
+        """Earliest time a pending job becomes runnable, None if none is pending"""
+        row = self._connect().execute(
+            "SELECT MIN(available_at) AS at FROM jobs WHERE status = ?", (PENDING,)
+        ).fetchone()
+        return row['at']
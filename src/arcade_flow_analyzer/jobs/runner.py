@@ -0,0 +1,182 @@
+"""
+Resumable pipeline runs over the job queue.
+
+A job runs the pipeline STAGES in order. After each stage its outputs (small
+results and the paths of files it wrote) are merged into the job's
+checkpoint, so whichever worker picks the job up again, after a crash, an
+expired lease or a failed attempt, continues with the next stage. The
+extracted and preprocessed actions are kept in per-job CSVs under cache/
+until the job is done; if a file the next stage reads has gone, the job is
+rewound to the stage that writes it.
+"""
+
+import os
+import time
+from pathlib import Path
+
+from ..models import InvalidFlowError
+from ..ratelimit import create_scheduler, request_priority, set_scheduler
+from ..telemetry import span
+from .queue import DEFAULT_QUEUE_PATH, PENDING, JobQueue, LeaseLost, worker_name
+
+STAGES = ['extract', 'preprocess', 'summarize', 'image', 'report']
+
+# stage: (checkpoint field it reads, stage writing that field)
+STAGE_INPUTS = {
+    'preprocess': ('actions_csv', 'extract'),
+    'summarize': ('processed_csv', 'preprocess'),
+    'report': ('image_file', 'image'),
+}
+
+# Checkpoint fields naming per-job files removed once the job is done
+INTERMEDIATE_FILES = ['actions_csv', 'processed_csv']
+
+# Errors in the flow itself (failed validation, missing file): retrying cannot help
+PERMANENT_ERRORS = (InvalidFlowError,)
+
+
+def _extract(job, state):
+    from ..event_store import store_flow_events
+    from ..extractors import process_flow, save_to_csv
+
+    if not os.path.exists(job['flow_file']):
+        raise InvalidFlowError(f"Flow file not found: {job['flow_file']}")
+    result = process_flow(job['flow_file'])
+    store_flow_events(result)
+    return {'name': result['name'], 'flow_hash': result['flow_hash'],
+            'flow_id': result['flow_id'], 'events': len(result['events']),
+            'actions_csv': save_to_csv(result, f"job-{job['id']}-actions.csv")}
+
+
+def _preprocess(job, state):
+    from ..analysis.csv_preprocessor import load_processed_actions
+
+    processed_csv = os.path.join("cache", f"job-{job['id']}-processed.csv")
+    load_processed_actions(state['actions_csv'], output_path=processed_csv)
+    return {'processed_csv': processed_csv}
+
+
+def _summarize(job, state):
+    from ..analysis import summarize_actions
+    from ..analysis.csv_preprocessor import read_actions_csv
+
+    analysis = summarize_actions(input_csv=state['actions_csv'],
+                                 flow_hash=state['flow_hash'],
+                                 flow_id=state.get('flow_id'),
+                                 actions=read_actions_csv(state['processed_csv']),
+                                 map_reduce=job['options'].get('map_reduce', False))
+    if not analysis:
+        raise RuntimeError("summarization returned no result")
+    return {'steps': analysis['steps'], 'summary': analysis['summary']}
+
+
+def _image(job, state):
+    from ..visualization import generate_flow_image
+
+    image_file = generate_flow_image(state['summary'])
+    if not image_file:
+        raise RuntimeError("image generation returned no result")
+    return {'image_file': image_file}
+
+
+def _report(job, state):
+    from ..report import create_markdown_report
+
+    output_dir = job['options'].get('output_dir', 'reports')
+    os.makedirs(output_dir, exist_ok=True)
+    report_file = create_markdown_report(
+        state['steps'], state['summary'], state['image_file'],
+        os.path.join(output_dir,
+                     f"{Path(job['flow_file']).stem}-{state['flow_hash'][:12]}.md")
+    )
+    if not report_file:
+        raise RuntimeError("report: missing results")
+    return {'report_file': report_file}
+
+
+STAGE_FUNCTIONS = {
+    'extract': _extract,
+    'preprocess': _preprocess,
+    'summarize': _summarize,
+    'image': _image,
+    'report': _report,
+}
+
+
+def first_stage(job):
+    """Index in STAGES of the first stage a job still has to run"""
+    index = STAGES.index(job['stage']) + 1 if job['stage'] else 0
+    # Rewind while the next stage's input file is gone (e.g. the cache was pruned)
+    while index < len(STAGES) and STAGES[index] in STAGE_INPUTS:
+        field, producer = STAGE_INPUTS[STAGES[index]]
+        if os.path.exists(job['checkpoint'].get(field) or ''):
+            break
+        index = STAGES.index(producer)
+    return index
+
+
+def run_job(queue, job, worker_id):
+    """Run the remaining stages of a leased job, checkpointing after each"""
+    state = dict(job['checkpoint'])
+    first = first_stage(job)
+    if first:
+        print(f"Job {job['id']}: resuming {job['flow_file']} at {STAGES[first]}")
+    with queue.keep_leased(job['id'], worker_id), \
+            span('job', job_id=job['id'], attempt=job['attempts'], first_stage=STAGES[first]):
+        for stage in STAGES[first:]:
+            state.update(STAGE_FUNCTIONS[stage](job, state))
+            queue.checkpoint(job['id'], worker_id, stage, state)
+    queue.complete(job['id'], worker_id)
+
+    for field in INTERMEDIATE_FILES:
+        if state.get(field):
+            Path(state[field]).unlink(missing_ok=True)
+    return state
+
+
+def run_worker(queue_path=DEFAULT_QUEUE_PATH, worker_id=None, provider=None,
+               max_retry_wait=60.0, rate_share=None, **queue_options):
+    """Lease and run jobs until none is left to run; return how many ran
+
+    Jobs waiting for a retry are waited for (up to max_retry_wait seconds at
+    a time); jobs leased by other live workers are left to them. provider
+    names the model provider to use, for workers started without the
+    parent's configuration. Model calls are scheduled at batch priority,
+    within rate_share of the rate limits (default: $ARCADE_RATE_SHARE; see
+    ratelimit) when workers run side by side.
+    """
+    if provider:
+        from ..providers import create_provider, set_provider
+
+        set_provider(create_provider(provider))
+    if rate_share is not None:
+        set_scheduler(create_scheduler(rate_share))
+
+    queue = JobQueue(queue_path, **queue_options)
+    worker_id = worker_id or worker_name()
+    ran = 0
+    with request_priority('batch'):
+        while True:
+            job = queue.lease(worker_id)
+            if job is None:
+                retry_at = queue.next_retry_at()
+                if retry_at is None:
+                    return ran
+                time.sleep(min(max(retry_at - time.time(), 0.1), max_retry_wait))
+                continue
+
+            ran += 1
+            try:
+                run_job(queue, job, worker_id)
+                print(f"Job {job['id']} done: {job['flow_file']}")
+            except LeaseLost as e:
+                print(f"Job {job['id']}: {e}")
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}".splitlines()[0]
+                try:
+                    status = queue.fail(job['id'], worker_id, error,
+                                        retry=not isinstance(e, PERMANENT_ERRORS))
+                except LeaseLost:
+                    continue
+                print(f"Job {job['id']} {'will be retried' if status == PENDING else 'failed'}"
+                      f" after attempt {job['attempts']}: {error}")
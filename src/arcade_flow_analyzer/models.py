@@ -13,6 +13,10 @@ from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
+class InvalidFlowError(ValueError):
+    """flow.json content that fails validation or cannot be extracted"""
+
+
 class Timestamp(BaseModel):
     seconds: int = Field(alias="_seconds")
     nanoseconds: int = Field(alias="_nanoseconds")
@@ -77,3 +81,12 @@ class FlowData(BaseModel):
     class Config:
         populate_by_name = True
         validate_assignment = True
+
+
+def parse_flow(data) -> FlowData:
+    """Parse flow.json content (bytes or str) directly into FlowData
+
+    Validation runs straight from the JSON bytes with model_validate_json,
+    skipping the intermediate Python dict tree built by json.load.
+    """
+    return FlowData.model_validate_json(data)
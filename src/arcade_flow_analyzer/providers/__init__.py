@@ -0,0 +1,25 @@
+"""
+Model providers supplying the chat model and image generation.
+"""
+
+from .._lazy import lazy_exports
+
+_EXPORTS = {
+    'ModelProvider': '.base',
+    'OpenAIProvider': '.openai_provider',
+    'StubProvider': '.stub',
+    'placeholder_png': '.canned',
+    'CHAT_MODEL': '.openai_provider',
+    'IMAGE_MODEL': '.openai_provider',
+    'IMAGE_PRESETS': '.openai_provider',
+    'PROVIDERS': '.registry',
+    'create_provider': '.registry',
+    'get_provider': '.registry',
+    'set_provider': '.registry',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = ['ModelProvider', 'OpenAIProvider', 'StubProvider', 'placeholder_png',
+           'CHAT_MODEL', 'IMAGE_MODEL', 'IMAGE_PRESETS', 'PROVIDERS', 'create_provider',
+           'get_provider', 'set_provider']
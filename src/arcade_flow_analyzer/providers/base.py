@@ -0,0 +1,55 @@
+"""
+Model provider interface.
+
+A provider supplies the chat model used by the summary chains and the image
+generation call. The model names are part of every cache key, so results
+from different providers never mix.
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+
+class ModelProvider(ABC):
+    """Interface implemented by the OpenAI and stub providers"""
+
+    name = None
+    chat_model_name = None
+    image_model_name = None
+
+    # Named image size/quality presets: the request options for each, plus
+    # 'cost_usd', the estimated price of one image for cost reporting
+    image_presets = {}
+    default_image_preset = None
+
+    def missing_configuration(self):
+        """Return a message describing missing setup, or None when ready"""
+        return None
+
+    @abstractmethod
+    def chat_model(self, temperature=0.6, max_retries=None):
+        """Return a LangChain chat model
+
+        max_retries=0 disables client-side retries, for callers that retry
+        through call_with_retry.
+        """
+
+    def image_options(self, preset=None):
+        """Resolve an image preset (default: $ARCADE_IMAGE_PRESET) to its options
+
+        The options always include 'model' and 'cost_usd'.
+        """
+        preset = preset or os.getenv('ARCADE_IMAGE_PRESET') or self.default_image_preset
+        if preset not in self.image_presets:
+            raise ValueError(f"Unknown image preset: {preset} "
+                             f"(expected one of {sorted(self.image_presets)})")
+        return {'model': self.image_model_name, 'cost_usd': 0.0,
+                **self.image_presets[preset]}
+
+    @abstractmethod
+    def generate_image(self, prompt, preset=None):
+        """Generate an image for prompt and return the PNG bytes"""
+
+    @abstractmethod
+    async def agenerate_image(self, prompt, preset=None):
+        """Async variant of generate_image, without client-side retries"""
@@ -0,0 +1,53 @@
+"""
+Canned model responses shared by the offline stubs.
+
+The stub provider (providers.stub) and the stub OpenAI server
+(service.stub_openai) answer with the same prompt-dependent step list and
+placeholder images, so a flow analyzed against either gets the same output.
+Only the standard library is used, so the stub server does not need the
+LangChain or OpenAI clients.
+"""
+
+import hashlib
+import struct
+import zlib
+
+PLACEHOLDER_SIZE = 64
+
+
+def placeholder_png(width=PLACEHOLDER_SIZE, height=PLACEHOLDER_SIZE,
+                    color=(33, 66, 231)):
+    """Encode a solid-color RGB PNG"""
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data +
+                struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    row = b'\x00' + bytes(color) * width
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(row * height)) + chunk(b'IEND', b''))
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def stub_steps(prompt):
+    """The canned, prompt-dependent chat response"""
+    digest = _digest(prompt)[:8]
+    return (f"1. Opened the starting page (stub {digest}).\n"
+            "2. Searched for a product.\n"
+            "3. Selected a result and added it to the cart.\n"
+            "4. Proceeded to checkout.")
+
+
+def stub_chat_response(prompt):
+    """(content, prompt_tokens, completion_tokens) of the canned chat response"""
+    content = stub_steps(prompt)
+    return content, len(prompt) // 4, len(content) // 4
+
+
+def stub_image(prompt, size='1024x1024'):
+    """Placeholder PNG of the given 'WxH' size, tinted by the prompt hash"""
+    width, height = map(int, size.split('x'))
+    return placeholder_png(width, height, color=tuple(bytes.fromhex(_digest(prompt)[:6])))
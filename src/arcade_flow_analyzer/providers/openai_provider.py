@@ -0,0 +1,115 @@
+"""
+OpenAI model provider (ChatOpenAI for the chains, the Image API for images).
+
+The openai and langchain_openai clients are imported when first used. All
+calls share one pooled HTTP client (one per event loop for async calls), whose
+event hooks admit each request through the rate-limit scheduler and feed it
+the rate-limit headers of each response (see ratelimit).
+"""
+
+import asyncio
+import base64
+import os
+import threading
+import weakref
+
+from dotenv import load_dotenv
+
+from ..ratelimit import ASYNC_HTTP_HOOKS, HTTP_HOOKS
+from .base import ModelProvider
+
+CHAT_MODEL = "gpt-3.5-turbo"
+IMAGE_MODEL = "dall-e-3"
+
+# Request options and list price per image. dall-e-2 at 256x256 is the
+# cheapest and fastest option, meant for previews.
+IMAGE_PRESETS = {
+    'preview': {'model': 'dall-e-2', 'size': '256x256', 'cost_usd': 0.016},
+    'standard': {'size': '1024x1024', 'quality': 'standard', 'cost_usd': 0.04},
+    'hd': {'size': '1024x1024', 'quality': 'hd', 'cost_usd': 0.08},
+}
+DEFAULT_IMAGE_PRESET = 'standard'
+
+
+class OpenAIProvider(ModelProvider):
+    """Calls the OpenAI API; needs OPENAI_API_KEY"""
+
+    name = 'openai'
+    image_presets = IMAGE_PRESETS
+    default_image_preset = DEFAULT_IMAGE_PRESET
+
+    def __init__(self, chat_model_name=CHAT_MODEL, image_model_name=IMAGE_MODEL):
+        # OPENAI_API_KEY may come from a .env file
+        load_dotenv()
+        self.chat_model_name = chat_model_name
+        self.image_model_name = image_model_name
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._client = None
+        # Async clients are bound to the event loop they were created on
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def missing_configuration(self):
+        if not os.getenv('OPENAI_API_KEY'):
+            return "Please create a .env file with: 'OPENAI_API_KEY=your_api_key_here'"
+        return None
+
+    def http_client(self):
+        """The pooled HTTP client shared by every synchronous call"""
+        with self._lock:
+            if self._http_client is None:
+                from openai import DefaultHttpxClient
+
+                self._http_client = DefaultHttpxClient(event_hooks=HTTP_HOOKS)
+            return self._http_client
+
+    def _async_client(self):
+        """(pooled HTTP client, AsyncOpenAI) of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.get(loop)
+            if clients is None:
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+                http_client = DefaultAsyncHttpxClient(event_hooks=ASYNC_HTTP_HOOKS)
+                clients = self._async_clients[loop] = (
+                    http_client, AsyncOpenAI(max_retries=0, http_client=http_client)
+                )
+            return clients
+
+    def chat_model(self, temperature=0.6, max_retries=None):
+        from langchain_openai import ChatOpenAI
+
+        # Streamed responses report token usage too (see telemetry.track_llm_usage)
+        options = {'http_client': self.http_client(), 'stream_usage': True}
+        try:
+            options['http_async_client'] = self._async_client()[0]
+        except RuntimeError:
+            # No running event loop: only the synchronous client is used
+            pass
+        if max_retries is not None:
+            options['max_retries'] = max_retries
+        return ChatOpenAI(model=self.chat_model_name, temperature=temperature, **options)
+
+    def _image_request(self, prompt, preset):
+        request = {key: value for key, value in self.image_options(preset).items()
+                   if key != 'cost_usd'}
+        # The dall-e models return a URL unless asked for the image itself
+        if request['model'].startswith('dall-e'):
+            request['response_format'] = 'b64_json'
+        return {'prompt': prompt, **request}
+
+    def generate_image(self, prompt, preset=None):
+        from openai import OpenAI
+
+        http_client = self.http_client()
+        with self._lock:
+            if self._client is None:
+                self._client = OpenAI(http_client=http_client)
+        result = self._client.images.generate(**self._image_request(prompt, preset))
+        return base64.b64decode(result.data[0].b64_json)
+
+    async def agenerate_image(self, prompt, preset=None):
+        _, client = self._async_client()
+        result = await client.images.generate(**self._image_request(prompt, preset))
+        return base64.b64decode(result.data[0].b64_json)
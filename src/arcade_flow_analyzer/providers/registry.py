@@ -0,0 +1,56 @@
+"""
+Provider selection.
+
+ARCADE_PROVIDER selects 'openai' (default) or 'stub'. The stub is configured
+with ARCADE_STUB_LATENCY (seconds per call), ARCADE_STUB_ERROR_RATE (0-1),
+ARCADE_STUB_ERRORS (comma separated: rate_limit,timeout), ARCADE_STUB_SEED and
+ARCADE_STUB_RPM / ARCADE_STUB_TPM (emulated API rate limits).
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+PROVIDERS = ['openai', 'stub']
+
+_default_provider = None
+
+
+def create_provider(name='openai'):
+    """Build a provider by name, configuring the stub from the environment
+
+    Provider modules are imported here, so only the selected one is loaded.
+    """
+    if name == 'openai':
+        from .openai_provider import OpenAIProvider
+
+        return OpenAIProvider()
+    if name == 'stub':
+        from .stub import StubProvider
+
+        error_kinds = os.getenv('ARCADE_STUB_ERRORS')
+        return StubProvider(
+            latency=float(os.getenv('ARCADE_STUB_LATENCY', 0)),
+            error_rate=float(os.getenv('ARCADE_STUB_ERROR_RATE', 0)),
+            error_kinds=error_kinds.split(',') if error_kinds else None,
+            seed=int(os.getenv('ARCADE_STUB_SEED', 0)),
+            rpm=float(os.getenv('ARCADE_STUB_RPM', 0)) or None,
+            tpm=float(os.getenv('ARCADE_STUB_TPM', 0)) or None,
+        )
+    raise ValueError(f"Unknown provider: {name} (expected one of {PROVIDERS})")
+
+
+def get_provider():
+    """Return the shared provider selected by ARCADE_PROVIDER"""
+    global _default_provider
+    if _default_provider is None:
+        # ARCADE_PROVIDER and the API key may come from a .env file
+        load_dotenv()
+        _default_provider = create_provider(os.getenv('ARCADE_PROVIDER', 'openai'))
+    return _default_provider
+
+
+def set_provider(provider):
+    """Replace the shared provider (e.g. with a configured StubProvider)"""
+    global _default_provider
+    _default_provider = provider
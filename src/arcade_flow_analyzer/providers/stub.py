@@ -0,0 +1,251 @@
+"""
+Deterministic offline model provider for load testing.
+
+The stub chat model answers every prompt with a canned step list derived from
+a hash of the prompt, so identical prompts always get identical answers, and
+the image call returns a placeholder PNG tinted by the prompt hash (see
+canned, shared with the stub OpenAI server). Both
+sleep for a configurable latency (spread over the tokens of a streamed chat
+response) and can inject the same errors the OpenAI
+client raises (rate limits and timeouts), so throughput, concurrency limits
+and retry behavior of the whole pipeline can be measured without network.
+
+Given rpm and/or tpm, the stub also emulates the API's per-minute rate
+limits: calls go through the shared rate-limit scheduler, every response
+reports x-ratelimit-* headers to it, and calls beyond the limits fail with a
+429 the way the API's would.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from openai import APITimeoutError, RateLimitError
+
+from ..ratelimit import (
+    DEFAULT_COMPLETION_TOKENS, TokenBucket, estimate_tokens, get_scheduler
+)
+from .base import ModelProvider
+from .canned import stub_chat_response, stub_image
+
+STUB_CHAT_MODEL = "stub-chat"
+STUB_IMAGE_MODEL = "stub-image"
+
+ERROR_KINDS = ['rate_limit', 'timeout']
+
+# Same names and sizes as the OpenAI presets, so derivatives are realistic
+STUB_IMAGE_PRESETS = {
+    'preview': {'size': '256x256'},
+    'standard': {'size': '1024x1024', 'quality': 'standard'},
+    'hd': {'size': '1024x1024', 'quality': 'hd'},
+}
+
+_STUB_REQUEST = httpx.Request('POST', 'https://stub.invalid/v1')
+
+
+class StubChatModel(BaseChatModel):
+    """LangChain chat model backed by a StubProvider"""
+
+    provider: Any
+
+    @property
+    def _llm_type(self):
+        return 'arcade-stub'
+
+    @staticmethod
+    def _tokens(messages):
+        """Tokens budgeted for a call, as ratelimit.request_cost does for the API"""
+        return (sum(estimate_tokens(str(message.content)) for message in messages) +
+                DEFAULT_COMPLETION_TOKENS)
+
+    @staticmethod
+    def _response(messages):
+        """(content, usage metadata) of the canned response"""
+        prompt = "\n".join(str(message.content) for message in messages)
+        content, input_tokens, output_tokens = stub_chat_response(prompt)
+        return content, {'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                         'total_tokens': input_tokens + output_tokens}
+
+    def _result(self, messages):
+        content, usage = self._response(messages)
+        message = AIMessage(content=content, usage_metadata=usage,
+                            response_metadata={'model_name': STUB_CHAT_MODEL})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages):
+        """The canned response as word chunks; usage is reported on the last"""
+        content, usage = self._response(messages)
+        words = content.split(' ')
+        chunks = [AIMessageChunk(content=word + ' ') for word in words[:-1]]
+        chunks.append(AIMessageChunk(content=words[-1], usage_metadata=usage,
+                                     response_metadata={'model_name': STUB_CHAT_MODEL}))
+        return [ChatGenerationChunk(message=chunk) for chunk in chunks]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs):
+        tokens = self._tokens(messages)
+        self.provider.schedule(STUB_CHAT_MODEL, tokens)
+        self.provider.before_call(STUB_CHAT_MODEL, tokens)
+        time.sleep(self.provider.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage],
+                         stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs):
+        tokens = self._tokens(messages)
+        await self.provider.aschedule(STUB_CHAT_MODEL, tokens)
+        self.provider.before_call(STUB_CHAT_MODEL, tokens)
+        await asyncio.sleep(self.provider.latency)
+        return self._result(messages)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs):
+        tokens = self._tokens(messages)
+        self.provider.schedule(STUB_CHAT_MODEL, tokens)
+        self.provider.before_call(STUB_CHAT_MODEL, tokens)
+        chunks = self._chunks(messages)
+        for chunk in chunks:
+            time.sleep(self.provider.latency / len(chunks))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage],
+                       stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        tokens = self._tokens(messages)
+        await self.provider.aschedule(STUB_CHAT_MODEL, tokens)
+        self.provider.before_call(STUB_CHAT_MODEL, tokens)
+        chunks = self._chunks(messages)
+        for chunk in chunks:
+            await asyncio.sleep(self.provider.latency / len(chunks))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class StubProvider(ModelProvider):
+    """Offline provider with configurable latency and error injection
+
+    Each call fails with probability error_rate, raising one of error_kinds
+    ('rate_limit' -> openai.RateLimitError, 'timeout' -> openai.APITimeoutError).
+    Failures are drawn from a seeded RNG, so a run is reproducible. calls and
+    errors count every chat and image call made and every injected error.
+    rpm and tpm emulate per-model API rate limits; rate_limited counts the
+    calls rejected for exceeding them.
+    """
+
+    name = 'stub'
+    chat_model_name = STUB_CHAT_MODEL
+    image_model_name = STUB_IMAGE_MODEL
+    image_presets = STUB_IMAGE_PRESETS
+    default_image_preset = 'standard'
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_kinds=None, seed=0,
+                 rpm=None, tpm=None):
+        error_kinds = list(error_kinds or ERROR_KINDS)
+        unknown = set(error_kinds) - set(ERROR_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown stub error kinds: {sorted(unknown)} "
+                             f"(expected some of {ERROR_KINDS})")
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_kinds = error_kinds
+        self.rpm = rpm
+        self.tpm = tpm
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # model: {'requests': bucket, 'tokens': bucket} of the emulated API limits
+        self._limits = {}
+
+    @property
+    def emulates_limits(self):
+        return bool(self.rpm or self.tpm)
+
+    def schedule(self, model, tokens=0):
+        """Wait for the shared scheduler to admit a call, when emulating limits"""
+        if self.emulates_limits:
+            get_scheduler().acquire(model, tokens)
+
+    async def aschedule(self, model, tokens=0):
+        if self.emulates_limits:
+            await get_scheduler().aacquire(model, tokens)
+
+    def _check_limits(self, model, tokens):
+        """Take a call from the emulated limits; return (admitted, headers)"""
+        now = time.monotonic()
+        if model not in self._limits:
+            self._limits[model] = {kind: TokenBucket(limit, now)
+                                   for kind, limit in [('requests', self.rpm),
+                                                       ('tokens', self.tpm)] if limit}
+        buckets = self._limits[model]
+        costs = {'requests': 1, 'tokens': tokens}
+        for bucket in buckets.values():
+            bucket.refill(now)
+        wait = max(bucket.wait_time(costs[kind]) for kind, bucket in buckets.items())
+        headers = {}
+        for kind, bucket in buckets.items():
+            if not wait:
+                bucket.level -= costs[kind]
+            headers[f'x-ratelimit-limit-{kind}'] = str(int(bucket.capacity))
+            headers[f'x-ratelimit-remaining-{kind}'] = str(max(int(bucket.level), 0))
+        if wait:
+            headers['retry-after-ms'] = str(max(int(wait * 1000), 1))
+        return not wait, headers
+
+    def before_call(self, model=None, tokens=0):
+        """Count the call and raise an emulated or injected error
+
+        When emulating limits, the outcome and rate-limit headers of the call
+        are reported to the shared scheduler.
+        """
+        with self._lock:
+            self.calls += 1
+            admitted, headers = True, None
+            if self.emulates_limits:
+                admitted, headers = self._check_limits(model, tokens)
+                if not admitted:
+                    self.rate_limited += 1
+            kind = None
+            if admitted and self.error_rate and self._rng.random() < self.error_rate:
+                self.errors += 1
+                kind = self._rng.choice(self.error_kinds)
+
+        if headers is not None:
+            get_scheduler().observe(model, headers, 200 if admitted else 429)
+            if not admitted:
+                response = httpx.Response(429, headers=headers, request=_STUB_REQUEST)
+                raise RateLimitError("Stub rate limit exceeded", response=response, body=None)
+        if kind == 'rate_limit':
+            response = httpx.Response(429, request=_STUB_REQUEST)
+            raise RateLimitError("Stub rate limit", response=response, body=None)
+        if kind == 'timeout':
+            raise APITimeoutError(request=_STUB_REQUEST)
+
+    def chat_model(self, temperature=0.6, max_retries=None):
+        return StubChatModel(provider=self)
+
+    def _image(self, prompt, preset):
+        return stub_image(prompt, self.image_options(preset)['size'])
+
+    def generate_image(self, prompt, preset=None):
+        model = self.image_options(preset)['model']
+        self.schedule(model)
+        self.before_call(model)
+        time.sleep(self.latency)
+        return self._image(prompt, preset)
+
+    async def agenerate_image(self, prompt, preset=None):
+        model = self.image_options(preset)['model']
+        await self.aschedule(model)
+        self.before_call(model)
+        await asyncio.sleep(self.latency)
+        return self._image(prompt, preset)
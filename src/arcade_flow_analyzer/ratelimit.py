@@ -0,0 +1,444 @@
+"""
+Shared rate-limit scheduler for model calls.
+
+Every chat and image request is admitted by one RateScheduler before it is
+sent. The scheduler keeps a requests-per-minute and a tokens-per-minute token
+bucket per model, sized from ARCADE_RPM and ARCADE_TPM until the API reports
+its own limits: the x-ratelimit-limit-* response headers then become the
+bucket sizes, and x-ratelimit-remaining-* caps what the buckets hold. A 429
+pauses the model for its retry-after time (1s without one); when the API
+sends no limit headers, each 429 also halves the model's rate, which recovers
+step by step as requests succeed again.
+
+The scheduler only sees its own process's requests. A process using the
+same API key as others takes ARCADE_RATE_SHARE (0-1, default 1) of the
+configured and reported limits; job queue workers split their parent's share
+evenly, so --queue --workers N stays within one budget. Other processes
+(e.g. several service workers, or the service next to a queue run) need
+their shares set so that they add up to at most 1.
+
+Requests waiting for budget are admitted in priority order, 'interactive'
+(the HTTP service, single-flow runs) before 'batch' (batch runs and queue
+workers), first come first served within a priority. The priority comes from
+the context (see request_priority), so it follows a flow into threads and
+asyncio tasks that copy the context. Priorities only order the requests of
+one process; between processes, give interactive ones the larger share. Time
+spent waiting is recorded as a 'rate-limit-wait' span.
+
+The OpenAI provider applies the scheduler through event hooks on the pooled
+HTTP clients it shares between calls (see request_hook and response_hook);
+the stub provider calls acquire and observe directly.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+from .telemetry import span
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+# Completion tokens budgeted for a chat request that sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+# Pause after a 429 that says nothing about when to retry
+DEFAULT_RETRY_AFTER = 1.0
+# Without limit headers, 429s never shrink a rate below this share of its default
+MIN_RATE_FACTOR = 1 / 16
+# Share of the default rate regained per successful response after a 429
+RATE_RECOVERY = 1 / 20
+
+PRIORITIES = {'interactive': 0, 'batch': 1}
+DEFAULT_PRIORITY = 'interactive'
+
+_priority = contextvars.ContextVar('arcade_request_priority', default=DEFAULT_PRIORITY)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Schedule the model calls made in the block (and tasks it starts) at priority"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown request priority: {priority} "
+                         f"(expected one of {list(PRIORITIES)})")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def estimate_tokens(text):
+    """Rough token count of text (4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def request_cost(body):
+    """(model, tokens) budgeted for a JSON API request body
+
+    Chat requests count their prompt plus max_tokens, as the API does for
+    its token limit; other requests (images) only count against the request
+    limit.
+    """
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError):
+        return None, 0
+    if not isinstance(payload, dict):
+        return None, 0
+    model = payload.get('model')
+    messages = payload.get('messages')
+    if not isinstance(messages, list):
+        return model, 0
+
+    prompt_tokens = 0
+    for message in messages:
+        content = message.get('content') if isinstance(message, dict) else None
+        if isinstance(content, list):
+            content = " ".join(part.get('text', '') for part in content
+                               if isinstance(part, dict))
+        prompt_tokens += estimate_tokens(content or '')
+    completion_tokens = (payload.get('max_tokens') or payload.get('max_completion_tokens')
+                         or DEFAULT_COMPLETION_TOKENS)
+    return model, prompt_tokens + completion_tokens * (payload.get('n') or 1)
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket refilled at capacity per minute"""
+
+    def __init__(self, per_minute, now):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.level = min(self.capacity,
+                         self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # More than a minute's budget is admitted from a full bucket, into debt
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def resize(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = min(self.level, self.capacity)
+
+
+class _ModelLimits:
+    """The request and token buckets of one model
+
+    rpm and tpm are this process's budget; the limits and remaining counts
+    reported by the API are for the whole key and are scaled by share.
+    """
+
+    def __init__(self, rpm, tpm, now, share=1.0):
+        self.share = share
+        self.default_rpm = rpm
+        self.default_tpm = tpm
+        self.requests = TokenBucket(rpm, now)
+        self.tokens = TokenBucket(tpm, now)
+        self.paused_until = 0.0
+        # Set once the API has reported its limits; they replace the defaults
+        self.reported = False
+
+    def wait_time(self, tokens, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.paused_until - now, self.requests.wait_time(1),
+                   self.tokens.wait_time(tokens) if tokens else 0.0)
+
+    def take(self, tokens):
+        self.requests.level -= 1
+        self.tokens.level -= tokens
+
+    def observe(self, headers, status, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        limit_requests = _header_number(headers, 'x-ratelimit-limit-requests')
+        limit_tokens = _header_number(headers, 'x-ratelimit-limit-tokens')
+        if limit_requests:
+            self.requests.resize(limit_requests * self.share)
+            self.reported = True
+        if limit_tokens:
+            self.tokens.resize(limit_tokens * self.share)
+            self.reported = True
+        # The API's count is authoritative, but only ever lowers ours: requests
+        # admitted here may not have reached it yet
+        for bucket, header in [(self.requests, 'x-ratelimit-remaining-requests'),
+                               (self.tokens, 'x-ratelimit-remaining-tokens')]:
+            remaining = _header_number(headers, header)
+            if remaining is not None:
+                bucket.level = min(bucket.level, remaining * self.share)
+
+        if status == 429:
+            retry_after = _header_number(headers, 'retry-after-ms')
+            retry_after = retry_after / 1000 if retry_after is not None else (
+                _header_number(headers, 'retry-after') or DEFAULT_RETRY_AFTER)
+            self.paused_until = max(self.paused_until, now + retry_after)
+            if not self.reported:
+                self.requests.resize(max(self.requests.capacity / 2,
+                                         self.default_rpm * MIN_RATE_FACTOR))
+                self.tokens.resize(max(self.tokens.capacity / 2,
+                                       self.default_tpm * MIN_RATE_FACTOR))
+        elif status < 400 and not self.reported:
+            self.requests.capacity = min(self.default_rpm, self.requests.capacity +
+                                         self.default_rpm * RATE_RECOVERY)
+            self.tokens.capacity = min(self.default_tpm, self.tokens.capacity +
+                                       self.default_tpm * RATE_RECOVERY)
+
+
+class _Waiter:
+    """A request waiting for admission, woken by the dispatcher thread"""
+
+    __slots__ = ('tokens', 'event', 'loop', 'future', 'cancelled')
+
+    def __init__(self, tokens, loop=None):
+        self.tokens = tokens
+        self.cancelled = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+            self.future = None
+        else:
+            self.event = None
+            self.future = loop.create_future()
+
+    def grant(self):
+        if self.event is not None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        except RuntimeError:
+            # The waiting event loop has closed
+            pass
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateScheduler:
+    """Admits model requests within per-model RPM/TPM budgets, by priority
+
+    share (0-1) is the fraction of rpm, tpm and the API's reported limits
+    this scheduler may use, for processes sharing one API key. stats counts,
+    per priority, the requests admitted, those that had to wait and the
+    seconds they waited, plus the 429 responses observed.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, share=1.0):
+        if not 0 < share <= 1:
+            raise ValueError(f"Rate limit share must be in (0, 1], got {share}")
+        self.share = share
+        self.rpm = rpm * share
+        self.tpm = tpm * share
+        self.stats = {'rate_limited': 0,
+                      **{priority: {'admitted': 0, 'waited': 0, 'wait_seconds': 0.0}
+                         for priority in PRIORITIES}}
+        self._limits = {}
+        # model: heap of (priority rank, arrival, waiter)
+        self._queues = {}
+        self._arrival = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._dispatcher = None
+
+    def _model_limits(self, model, now):
+        limits = self._limits.get(model)
+        if limits is None:
+            limits = self._limits[model] = _ModelLimits(self.rpm, self.tpm, now, self.share)
+        return limits
+
+    def _try_admit(self, model, tokens, priority):
+        """Admit at once if nobody is waiting and budget allows (lock held)"""
+        if self._queues.get(model):
+            return False
+        now = time.monotonic()
+        limits = self._model_limits(model, now)
+        if limits.wait_time(tokens, now) > 0:
+            return False
+        limits.take(tokens)
+        self.stats[priority]['admitted'] += 1
+        return True
+
+    def _enqueue(self, model, waiter, priority):
+        heapq.heappush(self._queues.setdefault(model, []),
+                       (PRIORITIES[priority], next(self._arrival), waiter))
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch_forever,
+                                                name='rate-scheduler', daemon=True)
+            self._dispatcher.start()
+        self._wakeup.notify()
+
+    def _dispatch(self, now):
+        """Admit waiting requests that fit; return seconds until the next might"""
+        next_wait = None
+        for model, queue in self._queues.items():
+            limits = self._model_limits(model, now)
+            while queue:
+                waiter = queue[0][2]
+                if waiter.cancelled:
+                    heapq.heappop(queue)
+                    continue
+                wait = limits.wait_time(waiter.tokens, now)
+                if wait > 0:
+                    next_wait = wait if next_wait is None else min(next_wait, wait)
+                    break
+                heapq.heappop(queue)
+                limits.take(waiter.tokens)
+                waiter.grant()
+        return next_wait
+
+    def _dispatch_forever(self):
+        with self._lock:
+            while True:
+                self._wakeup.wait(self._dispatch(time.monotonic()))
+
+    def _record_wait(self, priority, seconds):
+        with self._lock:
+            stats = self.stats[priority]
+            stats['admitted'] += 1
+            stats['waited'] += 1
+            stats['wait_seconds'] += seconds
+
+    def acquire(self, model=None, tokens=0, priority=None):
+        """Block until a request of tokens to model may be sent"""
+        priority = priority or current_priority()
+        with self._lock:
+            if self._try_admit(model, tokens, priority):
+                return
+            waiter = _Waiter(tokens)
+            self._enqueue(model, waiter, priority)
+
+        with span('rate-limit-wait', model=model, tokens=tokens, priority=priority):
+            started = time.monotonic()
+            waiter.event.wait()
+        self._record_wait(priority, time.monotonic() - started)
+
+    async def aacquire(self, model=None, tokens=0, priority=None):
+        """Async variant of acquire; waiting does not block the event loop"""
+        priority = priority or current_priority()
+        with self._lock:
+            if self._try_admit(model, tokens, priority):
+                return
+            waiter = _Waiter(tokens, asyncio.get_running_loop())
+            self._enqueue(model, waiter, priority)
+
+        with span('rate-limit-wait', model=model, tokens=tokens, priority=priority):
+            started = time.monotonic()
+            try:
+                await waiter.future
+            except BaseException:
+                # Cancelled (e.g. timed out); the dispatcher skips the waiter
+                waiter.cancelled = True
+                raise
+        self._record_wait(priority, time.monotonic() - started)
+
+    def observe(self, model, headers, status=200):
+        """Adapt the model's limits to a response's rate-limit headers"""
+        now = time.monotonic()
+        with self._lock:
+            self._model_limits(model, now).observe(headers, status, now)
+            if status == 429:
+                self.stats['rate_limited'] += 1
+            self._wakeup.notify()
+
+    def limits(self):
+        """Current {model: {rpm, tpm, paused_seconds}}"""
+        now = time.monotonic()
+        with self._lock:
+            return {model: {'rpm': limits.requests.capacity,
+                            'tpm': limits.tokens.capacity,
+                            'paused_seconds': round(max(limits.paused_until - now, 0), 3)}
+                    for model, limits in self._limits.items()}
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_rate_share():
+    """This process's share of the rate limits, from ARCADE_RATE_SHARE"""
+    return float(os.getenv('ARCADE_RATE_SHARE', 1))
+
+
+def create_scheduler(share=None):
+    """Build a scheduler sized by ARCADE_RPM and ARCADE_TPM
+
+    share defaults to get_rate_share().
+    """
+    return RateScheduler(rpm=float(os.getenv('ARCADE_RPM', DEFAULT_RPM)),
+                         tpm=float(os.getenv('ARCADE_TPM', DEFAULT_TPM)),
+                         share=get_rate_share() if share is None else share)
+
+
+def get_scheduler():
+    """Return the shared scheduler (see create_scheduler)"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = create_scheduler()
+        return _default_scheduler
+
+
+def set_scheduler(scheduler):
+    """Replace the shared scheduler"""
+    global _default_scheduler
+    with _default_lock:
+        _default_scheduler = scheduler
+
+
+def _request_cost(request):
+    try:
+        model, tokens = request_cost(request.content)
+    except Exception:
+        # Streamed or multipart bodies are only budgeted as a request
+        model, tokens = None, 0
+    request.extensions['arcade_model'] = model
+    return model, tokens
+
+
+def request_hook(request):
+    """httpx request hook admitting the request through the shared scheduler"""
+    model, tokens = _request_cost(request)
+    get_scheduler().acquire(model, tokens)
+
+
+def response_hook(response):
+    """httpx response hook feeding rate-limit headers to the shared scheduler"""
+    get_scheduler().observe(response.request.extensions.get('arcade_model'),
+                            response.headers, response.status_code)
+
+
+async def arequest_hook(request):
+    model, tokens = _request_cost(request)
+    await get_scheduler().aacquire(model, tokens)
+
+
+async def aresponse_hook(response):
+    response_hook(response)
+
+
+HTTP_HOOKS = {'request': [request_hook], 'response': [response_hook]}
+ASYNC_HTTP_HOOKS = {'request': [arequest_hook], 'response': [aresponse_hook]}
@@ -0,0 +1,293 @@
+"""
+Markdown report generation
+
+create_markdown_report writes a finished analysis at once. ReportStream
+writes the same report section by section while the analysis runs: the
+steps and summary as the chat model produces them, then the image section
+once the image is ready.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from .caching import get_cache
+from .telemetry import span
+from .visualization.derivatives import find_derivatives
+
+
+REPORT_TEMPLATE = """# Arcade Flow Analysis Report
+
+*Generated on: {timestamp}*
+
+## User Journey Steps
+
+{steps}
+
+## Summary
+
+{summary}
+
+{variants}## Flow Marketing Visualization (Generated with OpenAI's Image API and gpt-image-1 model)
+
+[![Generated Flow Image]({image_link})]({full_image_link})
+
+---
+*This report was generated by the Arcade Flow Analyzer*
+
+"""
+
+# Stands in for the image section of a report file while the image is generated
+IMAGE_PLACEHOLDER = "*Generating the flow visualization...*\n"
+
+VARIANTS_SECTION = """## Summary Variants
+
+{table}
+
+*Reported variant: {chosen}*
+
+"""
+
+
+def render_variants_section(variants, chosen_variant=None):
+    """Render the variant comparison section ('' without variants)"""
+    if not variants:
+        return ''
+    from .analysis.variants import format_variant_table
+
+    return VARIANTS_SECTION.format(table="\n".join(format_variant_table(variants,
+                                                                        chosen_variant)),
+                                   chosen=chosen_variant)
+
+
+def render_markdown_report(steps_content, summary_content, image_link,
+                           timestamp=None, full_image_link=None, variants=None,
+                           chosen_variant=None):
+    """Render the markdown report text for one analyzed flow
+
+    image_link is embedded (e.g. a thumbnail) and links to full_image_link
+    (default: image_link). variants (from summarize_variants) adds a table
+    comparing the summary variants, marking chosen_variant as reported.
+    """
+    if timestamp is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    return REPORT_TEMPLATE.format(timestamp=timestamp,
+                                  steps=steps_content.strip(),
+                                  summary=summary_content.strip(),
+                                  variants=render_variants_section(variants, chosen_variant),
+                                  image_link=image_link,
+                                  full_image_link=full_image_link or image_link)
+
+
+def report_image_files(image_file, cache):
+    """Return (embedded, linked) image files for a report
+
+    The thumbnail is embedded and links to the compressed copy when those
+    derivatives exist (see visualization.derivatives), otherwise the PNG is
+    used for both.
+    """
+    derivatives = find_derivatives(Path(image_file).stem, cache)
+    full_image_file = derivatives.get('compressed', image_file)
+    return derivatives.get('thumbnail', full_image_file), full_image_file
+
+
+def report_image_links(image_file, report_file, cache=None):
+    """(embedded, linked) image paths relative to report_file's directory
+
+    Linking relative to the report lets reports in other dirs resolve them.
+    """
+    report_dir = os.path.dirname(os.path.abspath(report_file))
+    return tuple(os.path.relpath(path, report_dir)
+                 for path in report_image_files(image_file, cache or get_cache()))
+
+
+def create_markdown_report(steps_content, summary_content, image_file,
+                           report_file=None, cache=None, variants=None,
+                           chosen_variant=None):
+    """Create a markdown report with the analysis results
+
+    The report is rendered on every call, so its timestamp is current; the
+    analysis it is rendered from is what the caches hold. variants and
+    chosen_variant (the 'variants' and 'variant' of a summarize_variants
+    result) add the variant comparison. cache is where image derivatives
+    are looked up.
+    """
+    missing = []
+    if not steps_content:
+        missing.append('steps')
+    if not summary_content:
+        missing.append('summary')
+    if not image_file or not os.path.exists(image_file):
+        missing.append('image')
+
+    if missing:
+        print(f"Cannot create report - missing results: {missing}")
+        return None
+
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    if report_file is None:
+        report_file = f'flow-analysis-report-{timestamp}.md'
+
+    with span('report') as report_span:
+        image_link, full_image_link = report_image_links(image_file, report_file, cache)
+        markdown_content = render_markdown_report(steps_content, summary_content,
+                                                  image_link, timestamp, full_image_link,
+                                                  variants, chosen_variant)
+
+        with open(report_file, 'w') as f:
+            f.write(markdown_content)
+        report_span.set(bytes=len(markdown_content.encode('utf-8')))
+
+    print(f"Markdown report created: {report_file}")
+    return report_file
+
+
+def _template_parts():
+    """REPORT_TEMPLATE split around the steps, the summary and the variants"""
+    head, rest = REPORT_TEMPLATE.split('{steps}')
+    middle, rest = rest.split('{summary}')
+    summary_end, image_section = rest.split('{variants}')
+    return head, middle, summary_end, image_section
+
+
+class ReportStream:
+    """A markdown report written to `out` as its sections are produced
+
+    feed(section, text) appends steps or summary text as it is generated (it
+    is the on_chunk callback of summarize_actions), image_pending() marks the
+    summary complete, and finish() adds the image section. start() writes
+    the heading straight away. Every piece is
+    flushed as soon as it is written, so the report can be followed while the
+    analysis runs. The finished text is the one render_markdown_report
+    produces. When `out` is seekable (a file), a placeholder stands in for the
+    image section until finish() replaces it.
+    """
+
+    def __init__(self, out, timestamp=None):
+        self.out = out
+        # The path of a report written to a file
+        self.report_file = getattr(out, 'name', None)
+        self.timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.sections = {'steps': '', 'summary': ''}
+        self.image_link = self.full_image_link = None
+        self.complete = False
+        self.first_content_at = None
+        self._head, self._middle, self._summary_end, self._image_section = _template_parts()
+        self._parts = []
+        self._section = None
+        # Whitespace held back until more text follows, as the report is stripped
+        self._pending = ''
+        self._placeholder_at = None
+        self._started_at = time.monotonic()
+
+    @property
+    def text(self):
+        """The markdown written so far (without the image placeholder)"""
+        return ''.join(self._parts)
+
+    @property
+    def first_content_ms(self):
+        """Milliseconds from the start of the report to its first steps text"""
+        if self.first_content_at is None:
+            return None
+        return round((self.first_content_at - self._started_at) * 1000, 1)
+
+    def _write(self, text):
+        self._parts.append(text)
+        self.out.write(text)
+        self.out.flush()
+
+    def _enter(self, section):
+        if self._section is None:
+            self._write(self._head.format(timestamp=self.timestamp))
+            self._section = 'steps'
+        if section == 'summary' and self._section == 'steps':
+            self._write(self._middle)
+            self._section, self._pending = 'summary', ''
+        if section == 'image' and self._section != 'image':
+            self._enter('summary')
+            self._write(self._summary_end)
+            self._section = 'image'
+        if section != self._section:
+            raise ValueError(f"Report section {section} cannot follow {self._section}")
+
+    def start(self):
+        """Write the report heading, before any content is ready"""
+        self._enter('steps')
+
+    def feed(self, section, text):
+        """Append text to the 'steps' or the 'summary' section"""
+        self._enter(section)
+        if not self.sections[section]:
+            text = text.lstrip()
+        body = self._pending + text
+        stripped = body.rstrip()
+        self._pending = body[len(stripped):]
+        if stripped:
+            if self.first_content_at is None:
+                self.first_content_at = time.monotonic()
+            self.sections[section] += stripped
+            self._write(stripped)
+
+    def image_pending(self):
+        """End the summary; a seekable out shows a placeholder for the image"""
+        self._enter('image')
+        if self._placeholder_at is None and self.out.seekable():
+            self._placeholder_at = self.out.tell()
+            self.out.write(IMAGE_PLACEHOLDER)
+            self.out.flush()
+
+    def _clear_placeholder(self):
+        if self._placeholder_at is not None:
+            self.out.seek(self._placeholder_at)
+            self.out.truncate()
+            self._placeholder_at = None
+
+    def finish(self, image_link, full_image_link=None):
+        """Add the image section, completing the report"""
+        self._enter('image')
+        self._clear_placeholder()
+        self.image_link, self.full_image_link = image_link, full_image_link or image_link
+        self._write(self._image_section.format(image_link=self.image_link,
+                                               full_image_link=self.full_image_link))
+        self.complete = True
+
+    def abort(self, reason):
+        """End an unfinished report with a note saying why it stopped"""
+        if self.complete:
+            return
+        self._clear_placeholder()
+        self._write(f"\n\n---\n*Report incomplete: {reason}*\n")
+
+
+@contextmanager
+def open_report_stream(report_file=None):
+    """Write a ReportStream to report_file, yielding the stream
+
+    An error in the block ends the file with a note and is re-raised.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if report_file is None:
+        report_file = f'flow-analysis-report-{timestamp}.md'
+
+    with span('report-stream') as stream_span, \
+            open(report_file, 'w', encoding='utf-8') as f:
+        report = ReportStream(f, timestamp)
+        print(f"Streaming markdown report to: {report_file}")
+        try:
+            report.start()
+            yield report
+        except BaseException as e:
+            report.abort(f"{type(e).__name__}: {e}".splitlines()[0])
+            raise
+        finally:
+            stream_span.set(first_content_ms=report.first_content_ms,
+                            bytes=len(report.text.encode('utf-8')),
+                            complete=report.complete)
+
+    if report.complete:
+        print(f"Markdown report created: {report_file}")
@@ -0,0 +1,60 @@
+"""
+Retry helpers for async OpenAI calls.
+
+Each call acquires the shared semaphore, is bounded by a timeout, and is
+retried with exponential backoff and jitter on rate-limit and timeout errors.
+The backoff sleep happens outside the semaphore so a throttled call does not
+hold a concurrency slot while it waits.
+"""
+
+import asyncio
+import contextlib
+import functools
+import random
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+
+@functools.cache
+def retryable_errors():
+    """The exceptions worth retrying; openai is only imported once needed"""
+    from openai import APITimeoutError, RateLimitError
+
+    return (RateLimitError, APITimeoutError, asyncio.TimeoutError)
+
+
+def __getattr__(name):
+    # RETRYABLE_ERRORS stays importable without importing openai up front
+    if name == 'RETRYABLE_ERRORS':
+        return retryable_errors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """Exponential backoff with jitter for the given (0-based) attempt"""
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def call_with_retry(make_call, semaphore=None, timeout=DEFAULT_TIMEOUT,
+                          max_retries=DEFAULT_MAX_RETRIES,
+                          base_delay=DEFAULT_BASE_DELAY,
+                          max_delay=DEFAULT_MAX_DELAY):
+    """Await make_call() under semaphore, retrying transient failures
+
+    make_call must return a fresh awaitable each time it is called.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            async with semaphore or contextlib.nullcontext():
+                return await asyncio.wait_for(make_call(), timeout)
+        except retryable_errors() as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"{type(e).__name__}, retrying in {delay:.1f}s "
+                  f"(attempt {attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
@@ -0,0 +1,15 @@
+"""
+HTTP service module exposing the pipeline (requires the `api` extra).
+"""
+
+from .._lazy import lazy_exports
+
+_EXPORTS = {
+    'SingleFlight': '.singleflight',
+    'analyze_flow_bytes': '.app',
+    'create_app': '.app',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = ['SingleFlight', 'analyze_flow_bytes', 'create_app']
@@ -0,0 +1,310 @@
+"""
+FastAPI service exposing the analysis pipeline.
+
+    PUT /flows            upload a flow.json, returns the markdown report
+    PUT /flows/report     upload a flow.json, streams the markdown report as
+                          it is generated (text/markdown)
+    GET /images/{file}    the marketing image referenced by a report, as the
+                          PNG ({key}.png) or its derivatives ({key}.thumb.webp,
+                          {key}.webp, or .jpg with ARCADE_IMAGE_FORMAT=jpeg)
+    GET /health           liveness plus in-flight request counts
+
+Identical uploads that arrive while one is being analyzed are coalesced into
+a single computation keyed by the upload's content hash. Flow validation and
+extraction run in a process pool, preprocessing and cache I/O in threads, and
+the OpenAI calls on the async clients bounded by a shared semaphore, so the
+event loop is never blocked by pipeline work. Streamed reports are not
+coalesced, since each stream is consumed as it is produced, but identical
+uploads still share the cached results. With ARCADE_EVENT_STORE set, the
+events of every upload are added to the event store.
+
+Run with:
+
+    uvicorn arcade_flow_analyzer.service.app:app
+
+Set OPENAI_BASE_URL to point the pipeline at a stub backend for local testing
+(see stub_openai).
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
+
+from ..analysis import asummarize_actions
+from ..caching import get_cache
+from ..event_store import store_flow_events
+from ..extractors import previous_image_summary, process_flow_bytes, save_snapshot
+from ..models import InvalidFlowError
+from ..providers import get_provider
+from ..report import ReportStream, render_markdown_report
+from ..retry import DEFAULT_TIMEOUT
+from ..visualization import agenerate_flow_image, select_image_summary
+from ..visualization.derivatives import find_derivatives
+from .singleflight import SingleFlight
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+IMAGE_FILE_PATTERN = re.compile(r'^([0-9a-f]{64})((?:\.thumb)?\.(?:png|webp|jpg))$')
+
+MEDIA_TYPES = {'.png': 'image/png', '.webp': 'image/webp', '.jpg': 'image/jpeg'}
+
+
+def _env_number(name, default, cast=int):
+    value = os.getenv(name)
+    return cast(value) if value else default
+
+
+class _QueueWriter(io.TextIOBase):
+    """Text stream putting every write on an asyncio queue (not seekable)"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def write(self, text):
+        self.queue.put_nowait(text)
+        return len(text)
+
+
+async def analyze_flow_bytes(data, extract_pool, semaphore, timeout=DEFAULT_TIMEOUT,
+                             force_regenerate=False, map_reduce=False,
+                             incremental=False, image_preset=None):
+    """Run the full pipeline for one uploaded flow.json
+
+    Returns the flow metadata, steps, summary, the cache key of the image and
+    the file names of the image and its derivatives (plus the diff against
+    the previous version with incremental=True). Raises InvalidFlowError for
+    flows that fail validation.
+    """
+    loop = asyncio.get_running_loop()
+    flow = await loop.run_in_executor(extract_pool, process_flow_bytes, data,
+                                      incremental)
+    await asyncio.to_thread(store_flow_events, flow)
+    return await analyze_extracted_flow(flow, semaphore, timeout, force_regenerate,
+                                        map_reduce, image_preset)
+
+
+async def analyze_extracted_flow(flow, semaphore, timeout=DEFAULT_TIMEOUT,
+                                 force_regenerate=False, map_reduce=False,
+                                 image_preset=None, on_chunk=None):
+    """The summary and image stages of analyze_flow_bytes for an extracted flow
+
+    on_chunk(section, text) receives the steps and summary as they are
+    generated (see asummarize_actions).
+    """
+    analysis = await asummarize_actions(force_regenerate=force_regenerate,
+                                        flow=flow, semaphore=semaphore,
+                                        timeout=timeout, map_reduce=map_reduce,
+                                        on_chunk=on_chunk)
+    if not analysis:
+        raise RuntimeError("summarization returned no result")
+
+    image_summary = analysis['summary']
+    if not force_regenerate:
+        image_summary = await asyncio.to_thread(select_image_summary, image_summary,
+                                                previous_image_summary(flow), None,
+                                                None, preset=image_preset)
+    image_file = await agenerate_flow_image(image_summary, force_regenerate,
+                                            semaphore=semaphore, timeout=timeout,
+                                            preset=image_preset)
+    if not image_file:
+        raise RuntimeError("image generation returned no result")
+    await asyncio.to_thread(save_snapshot, flow, None, image_summary)
+
+    image_key = Path(image_file).stem
+    derivatives = await asyncio.to_thread(find_derivatives, image_key, get_cache())
+    image_files = {'image': Path(image_file).name}
+    image_files.update({name: Path(path).name for name, path in derivatives.items()})
+
+    return {
+        'name': flow['name'],
+        'flow_hash': flow['flow_hash'],
+        'events': len(flow['events']),
+        'diff': flow.get('diff'),
+        'steps': analysis['steps'],
+        'summary': analysis['summary'],
+        'image_key': image_key,
+        'image_files': image_files,
+    }
+
+
+def create_app(extract_workers=None, concurrency=None, timeout=None,
+               max_upload_bytes=None):
+    """Build the FastAPI app
+
+    Unset options are read from ARCADE_API_EXTRACT_WORKERS,
+    ARCADE_API_CONCURRENCY (OpenAI requests in flight), ARCADE_API_TIMEOUT
+    and ARCADE_API_MAX_UPLOAD_BYTES.
+    """
+    load_dotenv()
+    if extract_workers is None:
+        extract_workers = _env_number('ARCADE_API_EXTRACT_WORKERS', None)
+    if concurrency is None:
+        concurrency = _env_number('ARCADE_API_CONCURRENCY', DEFAULT_CONCURRENCY)
+    if timeout is None:
+        timeout = _env_number('ARCADE_API_TIMEOUT', DEFAULT_TIMEOUT, float)
+    if max_upload_bytes is None:
+        max_upload_bytes = _env_number('ARCADE_API_MAX_UPLOAD_BYTES',
+                                       DEFAULT_MAX_UPLOAD_BYTES)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.extract_pool = ProcessPoolExecutor(max_workers=extract_workers)
+        app.state.semaphore = asyncio.Semaphore(concurrency)
+        app.state.single_flight = SingleFlight()
+        try:
+            yield
+        finally:
+            app.state.extract_pool.shutdown(cancel_futures=True)
+            get_cache().close()
+
+    app = FastAPI(title="Arcade Flow Analyzer", lifespan=lifespan)
+
+    async def read_upload(file, image_preset):
+        """The uploaded bytes, after checking their size and the image preset"""
+        data = await file.read(max_upload_bytes + 1)
+        if len(data) > max_upload_bytes:
+            raise HTTPException(413, f"Flow exceeds {max_upload_bytes} bytes")
+
+        image_presets = get_provider().image_presets
+        if image_preset is not None and image_preset not in image_presets:
+            raise HTTPException(422, f"Unknown image preset: {image_preset} "
+                                     f"(expected one of {sorted(image_presets)})")
+        return data
+
+    def image_urls_for(request, image_files):
+        return {name: str(request.url_for('get_image', filename=filename))
+                for name, filename in image_files.items()}
+
+    @app.put("/flows")
+    async def analyze_flow(request: Request, file: UploadFile = File(...),
+                           force_regenerate: bool = False, map_reduce: bool = False,
+                           incremental: bool = False, image_preset: Optional[str] = None,
+                           include_image: bool = False):
+        """Analyze an uploaded flow.json and return its markdown report"""
+        data = await read_upload(file, image_preset)
+        state = request.app.state
+        key = (hashlib.sha256(data).hexdigest(), force_regenerate, map_reduce,
+               incremental, image_preset)
+        try:
+            result = await state.single_flight.do(key, lambda: analyze_flow_bytes(
+                data, state.extract_pool, state.semaphore, timeout,
+                force_regenerate, map_reduce, incremental, image_preset
+            ))
+        except InvalidFlowError as e:
+            raise HTTPException(422, str(e))
+        except Exception as e:
+            raise HTTPException(502, f"Analysis failed: {e}")
+
+        image_urls = image_urls_for(request, result['image_files'])
+        full_image_url = image_urls.get('compressed', image_urls['image'])
+        response = {
+            'name': result['name'],
+            'flow_hash': result['flow_hash'],
+            'events': result['events'],
+            'steps': result['steps'],
+            'summary': result['summary'],
+            'image_url': image_urls['image'],
+            'report': render_markdown_report(result['steps'], result['summary'],
+                                             image_urls.get('thumbnail', full_image_url),
+                                             full_image_link=full_image_url),
+        }
+        for name in ('thumbnail', 'compressed'):
+            if name in image_urls:
+                response[f'{name}_url'] = image_urls[name]
+        if result['diff'] is not None:
+            response['diff'] = result['diff']
+        if include_image:
+            image_bytes = await asyncio.to_thread(get_cache().get,
+                                                  result['image_key'], '.png')
+            if image_bytes is not None:
+                response['image_base64'] = base64.b64encode(image_bytes).decode()
+        return response
+
+    @app.put("/flows/report")
+    async def stream_flow_report(request: Request, file: UploadFile = File(...),
+                                 force_regenerate: bool = False, map_reduce: bool = False,
+                                 incremental: bool = False,
+                                 image_preset: Optional[str] = None):
+        """Analyze an uploaded flow.json, streaming its markdown report
+
+        The heading is sent at once, the steps and summary as they are
+        generated and the image section once the image is ready. Invalid
+        flows are rejected before the stream starts; a later failure ends the
+        report with a note. A client that disconnects cancels the analysis.
+        """
+        data = await read_upload(file, image_preset)
+        state = request.app.state
+        loop = asyncio.get_running_loop()
+        try:
+            flow = await loop.run_in_executor(state.extract_pool, process_flow_bytes, data,
+                                              incremental)
+        except InvalidFlowError as e:
+            raise HTTPException(422, str(e))
+        await asyncio.to_thread(store_flow_events, flow)
+
+        chunks = asyncio.Queue()
+        report = ReportStream(_QueueWriter(chunks))
+
+        async def analyze():
+            try:
+                report.start()
+                result = await analyze_extracted_flow(flow, state.semaphore, timeout,
+                                                      force_regenerate, map_reduce,
+                                                      image_preset, on_chunk=report.feed)
+                image_urls = image_urls_for(request, result['image_files'])
+                full_image_url = image_urls.get('compressed', image_urls['image'])
+                report.finish(image_urls.get('thumbnail', full_image_url), full_image_url)
+            except Exception as e:
+                report.abort(f"Analysis failed: {e}")
+            finally:
+                chunks.put_nowait(None)
+
+        async def body():
+            task = asyncio.create_task(analyze())
+            try:
+                while (chunk := await chunks.get()) is not None:
+                    yield chunk
+            finally:
+                task.cancel()
+
+        return StreamingResponse(body(), media_type='text/markdown; charset=utf-8')
+
+    @app.get("/images/{filename}", name='get_image')
+    async def get_image(filename: str):
+        """Serve a cached marketing image or one of its derivatives"""
+        match = IMAGE_FILE_PATTERN.match(filename)
+        if not match:
+            raise HTTPException(404, "Image not found")
+        image_key, suffix = match.groups()
+        image_bytes = await asyncio.to_thread(get_cache().get, image_key, suffix)
+        if image_bytes is None:
+            raise HTTPException(404, "Image not found")
+        extension = '.' + suffix.rsplit('.', 1)[1]
+        return Response(image_bytes, media_type=MEDIA_TYPES[extension])
+
+    @app.get("/health")
+    async def health(request: Request):
+        single_flight = request.app.state.single_flight
+        return {
+            'status': 'ok',
+            'in_flight': single_flight.in_flight(),
+            'requests': single_flight.calls,
+            'coalesced': single_flight.coalesced,
+        }
+
+    return app
+
+
+app = create_app()
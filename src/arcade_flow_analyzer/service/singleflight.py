@@ -0,0 +1,46 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls with the same key share one in-flight task: the first caller
+starts the work and every caller that arrives before it finishes awaits the
+same result (or exception). Once the task completes the key is released, so
+later calls start fresh and rely on the artifact cache instead.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, make_call):
+        """Await make_call() once per key, however many callers are waiting
+
+        make_call must return a fresh awaitable. A caller being cancelled
+        (e.g. a client disconnecting) does not cancel the shared task.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _release(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self):
+        """Number of distinct computations currently running"""
+        return len(self._inflight)
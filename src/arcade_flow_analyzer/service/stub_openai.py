@@ -0,0 +1,106 @@
+"""
+Stub OpenAI backend for exercising the service locally.
+
+Implements just enough of the chat completions and image generation endpoints
+for the pipeline. Responses are the stub provider's (see providers.canned):
+chat responses are a canned step list derived from the prompt hash (sent word
+by word as server-sent events when the request asks to stream), and images
+are placeholder PNGs of the requested size. ARCADE_STUB_LATENCY (seconds)
+delays every response, which makes request coalescing easy to observe.
+
+    uvicorn arcade_flow_analyzer.service.stub_openai:app --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub \\
+        uvicorn arcade_flow_analyzer.service.app:app
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from ..providers.canned import stub_chat_response, stub_image
+
+app = FastAPI(title="Stub OpenAI")
+app.state.requests = 0
+
+
+async def _simulate_latency():
+    app.state.requests += 1
+    latency = float(os.getenv('ARCADE_STUB_LATENCY', '0'))
+    if latency:
+        await asyncio.sleep(latency)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await _simulate_latency()
+
+    prompt = "\n".join(str(message.get('content', ''))
+                       for message in body.get('messages', []))
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+    content, prompt_tokens, completion_tokens = stub_chat_response(prompt)
+    usage = {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+    }
+    if body.get('stream'):
+        include_usage = (body.get('stream_options') or {}).get('include_usage', False)
+        return StreamingResponse(_stream_chunks(f"chatcmpl-stub-{digest}", body.get('model'),
+                                                content, usage if include_usage else None),
+                                 media_type='text/event-stream')
+    return {
+        'id': f"chatcmpl-stub-{digest}",
+        'object': 'chat.completion',
+        'created': 0,
+        'model': body.get('model'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': usage,
+    }
+
+
+async def _stream_chunks(completion_id, model, content, usage=None):
+    """Server-sent chat.completion.chunk events, as the API streams them"""
+    def event(choices, **extra):
+        chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': 0,
+                 'model': model, 'choices': choices, **extra}
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    words = content.split(' ')
+    for i, word in enumerate(words):
+        delta = {'content': word if i == len(words) - 1 else word + ' '}
+        if i == 0:
+            delta['role'] = 'assistant'
+        yield event([{'index': 0, 'delta': delta, 'finish_reason': None}])
+        await asyncio.sleep(0)
+    yield event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+    if usage is not None:
+        yield event([], usage=usage)
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/images/generations")
+async def images_generations(request: Request):
+    body = await request.json()
+    await _simulate_latency()
+    size = body.get('size') or ''
+    image = stub_image(body.get('prompt', ''), size if 'x' in size else '1024x1024')
+    return {
+        'created': 0,
+        'data': [{'b64_json': base64.b64encode(image).decode()}],
+    }
+
+
+@app.get("/stats")
+async def stats():
+    """Number of requests served, to check how many calls were made"""
+    return {'requests': app.state.requests}
@@ -0,0 +1,282 @@
+"""
+Per-stage timing and token/cost instrumentation.
+
+Pipeline stages (validation, extraction, preprocessing, the two LLM chains,
+image generation, report writing) run inside spans that record their wall
+time and stage attributes: payload sizes, prompt/completion tokens, estimated
+cost and cache hit/miss. Finished spans are kept in memory and, when a trace
+file is configured (ARCADE_TRACE_FILE or --trace), appended to it as JSON
+lines in an OpenTelemetry-like shape:
+
+    {"name": "steps-chain", "trace_id": "...", "span_id": "...",
+     "parent_id": "...", "start": 1760000000.0, "duration_ms": 812.4,
+     "attributes": {"cache": "miss", "prompt_tokens": 360, ...}}
+
+Each tracer also aggregates its spans per stage as they finish
+(Tracer.summary()), so stage totals count every span even after the oldest
+raw spans have been dropped from memory (only the last max_spans are kept;
+Tracer.dropped counts the rest). Counts, totals and maxima are exact; p50
+and p95 come from a fixed-size uniform sample of each stage's durations, so
+they are exact up to DEFAULT_SAMPLE_SIZE spans per stage and estimates
+beyond, and memory stays bounded however long a run is. summarize_spans
+aggregates a list of spans, e.g. one read back with load_spans.
+"""
+
+import collections
+import contextlib
+import contextvars
+import json
+import math
+import os
+import random
+import secrets
+import threading
+import time
+
+DEFAULT_MAX_SPANS = 10000
+# Durations sampled per stage for the percentiles
+DEFAULT_SAMPLE_SIZE = 1024
+
+_current_span = contextvars.ContextVar('arcade_current_span', default=None)
+_active_tracer = contextvars.ContextVar('arcade_active_tracer', default=None)
+
+
+class Span:
+    """One timed pipeline stage"""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = None
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        """Add or overwrite span attributes"""
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+        }
+
+
+class Tracer:
+    """Collects finished spans in memory and optionally as JSON lines"""
+
+    def __init__(self, path=None, max_spans=DEFAULT_MAX_SPANS):
+        self.path = path
+        self.spans = collections.deque(maxlen=max_spans)
+        self.stages = StageStats()
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as a span nested under the current one"""
+        parent = _current_span.get()
+        span = Span(name, parent.trace_id if parent else secrets.token_hex(16),
+                    parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        span.start = time.time()
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}".splitlines()[0])
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _current_span.reset(token)
+            self.export(span.to_dict())
+
+    def export(self, span_dict):
+        """Record a finished span (also used for spans from worker processes)"""
+        with self._lock:
+            if len(self.spans) == self.spans.maxlen:
+                self.dropped += 1
+            self.spans.append(span_dict)
+            self.stages.add(span_dict)
+            if self.path:
+                # One append per line keeps lines intact across processes
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(span_dict, default=str) + "\n")
+
+    def summary(self):
+        """Per-stage aggregate of every span recorded, as summarize_spans"""
+        with self._lock:
+            return self.stages.summary()
+
+
+_default_tracer = None
+
+
+def get_tracer():
+    """Return the tracer for the current context, else the shared tracer
+
+    The shared tracer appends to ARCADE_TRACE_FILE when it is set.
+    """
+    tracer = _active_tracer.get()
+    if tracer is not None:
+        return tracer
+    global _default_tracer
+    if _default_tracer is None:
+        _default_tracer = Tracer(os.getenv('ARCADE_TRACE_FILE'))
+    return _default_tracer
+
+
+def set_tracer(tracer):
+    """Replace the shared tracer"""
+    global _default_tracer
+    _default_tracer = tracer
+
+
+@contextlib.contextmanager
+def use_tracer(tracer):
+    """Send spans in the enclosed block (and tasks it starts) to tracer"""
+    token = _active_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active_tracer.reset(token)
+
+
+def span(name, **attributes):
+    """Open a span on the current tracer"""
+    return get_tracer().span(name, **attributes)
+
+
+@contextlib.contextmanager
+def track_llm_usage(current_span):
+    """Record token usage and estimated cost of LLM calls made in the block
+
+    Uses LangChain's OpenAI callback, which sees every chat model call made
+    from this context, including calls in tasks started inside it.
+    """
+    from langchain_community.callbacks.manager import get_openai_callback
+
+    with get_openai_callback() as usage:
+        try:
+            yield usage
+        finally:
+            current_span.set(llm_calls=usage.successful_requests,
+                             prompt_tokens=usage.prompt_tokens,
+                             completion_tokens=usage.completion_tokens,
+                             cost_usd=round(usage.total_cost, 6))
+
+
+def _percentile(sorted_values, fraction):
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+SUMMED_ATTRIBUTES = ['bytes', 'llm_calls', 'prompt_tokens', 'completion_tokens', 'cost_usd']
+
+
+class StageStats:
+    """Running per-stage aggregate of spans
+
+    Keeps exact counters, sums and maxima per stage instead of the spans
+    themselves. Percentiles are taken from a reservoir sample of at most
+    sample_size durations per stage (every duration until it fills).
+    """
+
+    def __init__(self, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+        self.sample_size = sample_size
+        self._stages = {}
+        self._random = random.Random(seed)
+
+    def add(self, span_dict):
+        """Fold one finished span into its stage"""
+        stage = self._stages.get(span_dict['name'])
+        if stage is None:
+            stage = self._stages[span_dict['name']] = {
+                'count': 0, 'total_ms': 0.0, 'max_ms': None, 'sample': [],
+                'errors': 0, 'cache_hits': 0, 'cache_misses': 0, 'sums': {}
+            }
+        attributes = span_dict['attributes']
+        duration = span_dict['duration_ms']
+        stage['count'] += 1
+        stage['total_ms'] += duration
+        if stage['max_ms'] is None or duration > stage['max_ms']:
+            stage['max_ms'] = duration
+        if len(stage['sample']) < self.sample_size:
+            stage['sample'].append(duration)
+        else:
+            # Reservoir sampling: each duration is kept with equal probability
+            index = self._random.randrange(stage['count'])
+            if index < self.sample_size:
+                stage['sample'][index] = duration
+        stage['errors'] += 'error' in attributes
+        stage['cache_hits'] += attributes.get('cache') == 'hit'
+        stage['cache_misses'] += attributes.get('cache') == 'miss'
+        for attribute in SUMMED_ATTRIBUTES:
+            if attribute in attributes:
+                stage['sums'][attribute] = stage['sums'].get(attribute, 0) + attributes[attribute]
+
+    def summary(self):
+        """Return the summarize_spans result for the spans added so far"""
+        summary = {}
+        for name, stage in self._stages.items():
+            sample = sorted(stage['sample'])
+            summary[name] = {
+                'count': stage['count'],
+                'total_ms': round(stage['total_ms'], 3),
+                'mean_ms': round(stage['total_ms'] / stage['count'], 3),
+                'p50_ms': _percentile(sample, 0.5),
+                'p95_ms': _percentile(sample, 0.95),
+                'max_ms': stage['max_ms'],
+                'errors': stage['errors'],
+                'cache_hits': stage['cache_hits'],
+                'cache_misses': stage['cache_misses'],
+            }
+            for attribute in SUMMED_ATTRIBUTES:
+                if attribute in stage['sums']:
+                    summary[name][attribute] = round(stage['sums'][attribute], 6)
+        return summary
+
+
+def summarize_spans(spans):
+    """Aggregate spans per stage name
+
+    Returns {stage: {count, total_ms, mean_ms, p50_ms, p95_ms, max_ms, errors,
+    cache_hits, cache_misses, plus the sums of SUMMED_ATTRIBUTES}}, in the
+    order stages first appear. p50/p95 are sampled beyond
+    DEFAULT_SAMPLE_SIZE spans per stage (see StageStats).
+    """
+    stages = StageStats()
+    for span_dict in spans:
+        stages.add(span_dict)
+    return stages.summary()
+
+
+def format_stage_table(summary):
+    """Render a summarize_spans result as markdown table lines"""
+    lines = [
+        "| Stage | Count | Total (s) | Mean (ms) | p95 (ms) | Cache hit/miss | Tokens in/out | Cost (USD) |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for name, stage in summary.items():
+        cache = (f"{stage['cache_hits']}/{stage['cache_misses']}"
+                 if stage['cache_hits'] or stage['cache_misses'] else '')
+        tokens = (f"{stage['prompt_tokens']}/{stage['completion_tokens']}"
+                  if 'prompt_tokens' in stage else '')
+        cost = f"{stage['cost_usd']:.4f}" if 'cost_usd' in stage else ''
+        lines.append(f"| {name} | {stage['count']} | {stage['total_ms'] / 1000:.2f} | "
+                     f"{stage['mean_ms']:.1f} | {stage['p95_ms']:.1f} | {cache} | "
+                     f"{tokens} | {cost} |")
+    return lines
+
+
+def load_spans(path):
+    """Read spans back from a JSON lines trace file"""
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
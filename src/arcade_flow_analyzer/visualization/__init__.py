@@ -2,6 +2,16 @@
 Visualization module for generating images and visual representations.
 """
 
-from .image_gen import generate_flow_image
+from .._lazy import lazy_exports
 
-__all__ = ['generate_flow_image']
+_EXPORTS = {
+    'generate_flow_image': '.image_gen',
+    'agenerate_flow_image': '.image_gen',
+    'select_image_summary': '.image_gen',
+    'summary_similarity': '.image_gen',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = ['generate_flow_image', 'agenerate_flow_image', 'select_image_summary',
+           'summary_similarity']
@@ -0,0 +1,101 @@
+"""
+Compressed derivatives of generated images.
+
+The image API returns a full-size PNG. When Pillow is installed (the
+`images` extra), a thumbnail and a full-size compressed copy are rendered
+locally and cached next to the PNG under the same key, so reports can embed
+a few kilobytes instead of the original image. The format is WebP by
+default, or JPEG with ARCADE_IMAGE_FORMAT=jpeg.
+
+Pillow is only imported when a derivative is rendered.
+"""
+
+import functools
+import importlib.util
+import io
+import os
+
+# Pillow format name and cache suffix per output format
+FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'jpeg': ('JPEG', '.jpg'),
+}
+DEFAULT_FORMAT = 'webp'
+
+THUMBNAIL_SIZE = 320
+DEFAULT_QUALITY = 80
+
+
+@functools.cache
+def pillow_available():
+    return importlib.util.find_spec('PIL') is not None
+
+
+def _require_pillow():
+    if not pillow_available():
+        raise ImportError("Image derivatives require Pillow: pip install pillow")
+
+
+def image_format(fmt=None):
+    """Resolve the derivative format (default: $ARCADE_IMAGE_FORMAT or webp)"""
+    fmt = (fmt or os.getenv('ARCADE_IMAGE_FORMAT') or DEFAULT_FORMAT).lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown image format: {fmt} (expected one of {sorted(FORMATS)})")
+    return fmt
+
+
+def derivative_suffixes(fmt=None):
+    """Cache suffix of each derivative: {'thumbnail': ..., 'compressed': ...}"""
+    _, suffix = FORMATS[image_format(fmt)]
+    return {'thumbnail': f".thumb{suffix}", 'compressed': suffix}
+
+
+def render_derivative(png_bytes, fmt=None, max_size=None, quality=DEFAULT_QUALITY):
+    """Re-encode an image, optionally shrunk to fit max_size x max_size"""
+    _require_pillow()
+    from PIL import Image
+
+    pillow_format, _ = FORMATS[image_format(fmt)]
+
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        image.load()
+        if pillow_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        if max_size:
+            image.thumbnail((max_size, max_size))
+        output = io.BytesIO()
+        image.save(output, format=pillow_format, quality=quality)
+    return output.getvalue()
+
+
+def create_derivatives(image_key, cache, png_bytes=None, fmt=None,
+                       thumbnail_size=THUMBNAIL_SIZE, quality=DEFAULT_QUALITY):
+    """Render any missing derivatives of a cached PNG
+
+    Returns {name: (path, bytes)} for the derivatives rendered now, which is
+    empty when they were already cached or Pillow is not installed.
+    """
+    if not pillow_available():
+        return {}
+
+    sizes = {'thumbnail': thumbnail_size, 'compressed': None}
+    created = {}
+    for name, suffix in derivative_suffixes(fmt).items():
+        if cache.contains(image_key, suffix):
+            continue
+        if png_bytes is None:
+            png_bytes = cache.get(image_key, '.png')
+            if png_bytes is None:
+                return created
+        data = render_derivative(png_bytes, fmt, sizes[name], quality)
+        created[name] = (cache.set(image_key, data, suffix), len(data))
+    return created
+
+
+def find_derivatives(image_key, cache, fmt=None):
+    """Return {name: path} for the cached derivatives of an image"""
+    return {name: str(cache.path_for(image_key, suffix))
+            for name, suffix in derivative_suffixes(fmt).items()
+            if cache.contains(image_key, suffix)}
@@ -3,63 +3,187 @@ Generate images based on user journey summaries
 using OpenAI's 4o image generation API.
 """
 
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
-import base64
-
-load_dotenv()
-
-
-def generate_flow_image(force_regenerate=False):
-    """Generate a creative image based on the user journey summary"""
-
-    if not os.getenv('OPENAI_API_KEY'):
-        print("Please create a .env file with: OPENAI_API_KEY=your_api_key_here")
+import asyncio
+import difflib
+
+from arcade_flow_analyzer.caching import cache_key, get_cache, text_hash
+from arcade_flow_analyzer.providers import get_provider
+from arcade_flow_analyzer.retry import (
+    DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT, call_with_retry
+)
+from arcade_flow_analyzer.telemetry import span
+from arcade_flow_analyzer.visualization.derivatives import create_derivatives, pillow_available
+
+IMAGE_PROMPT = (
+    "You are an expert at marketing and design. Generate a creative image "
+    "suitable for sharing on social platforms that represents the user "
+    "flow/journey and would drive engagement. It should be a single image, "
+    "that captures the essence of how easy it is do what is described in "
+    "the user journey. Here is a summary of the user journey: {user_journey}"
+)
+
+# An edited flow keeps its image while its summary stays at least this similar
+DEFAULT_REUSE_SIMILARITY = 0.85
+
+
+def _image_key(user_journey, options):
+    # The model, size and quality are part of the key, so switching models or
+    # presets never serves stale results
+    model = ":".join(str(options[key]) for key in ('model', 'size', 'quality')
+                     if key in options)
+    return cache_key(text_hash(user_journey), 'marketing-image', IMAGE_PROMPT, model)
+
+
+def _create_derivatives(image_key, cache, image_bytes=None):
+    """Render the thumbnail and compressed copy when Pillow is installed"""
+    if not pillow_available():
+        return
+    with span('derivatives') as derivatives_span:
+        created = create_derivatives(image_key, cache, image_bytes)
+        derivatives_span.set(created=len(created),
+                             bytes=sum(size for _, size in created.values()))
+
+
+def summary_similarity(first, second):
+    """Word-level similarity of two summaries, from 0.0 to 1.0"""
+    return difflib.SequenceMatcher(None, first.split(), second.split(),
+                                   autojunk=False).ratio()
+
+
+def select_image_summary(user_journey, previous_summary=None, cache=None,
+                         provider=None, min_similarity=DEFAULT_REUSE_SIMILARITY,
+                         preset=None):
+    """Pick the summary to generate (or look up) the image for
+
+    previous_summary is the summary the image of an earlier version of the
+    flow was generated from. When the new summary has not materially changed
+    (similarity of at least min_similarity) and that image is still cached,
+    previous_summary is returned, so the image is served from the cache
+    instead of being regenerated.
+    """
+    if not user_journey or not previous_summary:
+        return user_journey
+    if previous_summary.strip() == user_journey.strip():
+        return previous_summary
+
+    similarity = summary_similarity(user_journey, previous_summary)
+    if similarity < min_similarity:
+        return user_journey
+
+    cache = cache or get_cache()
+    provider = provider or get_provider()
+    options = provider.image_options(preset)
+    if not cache.contains(_image_key(previous_summary.strip(), options), '.png'):
+        return user_journey
+    print(f"Summary {similarity:.0%} similar to the previous version, reusing its image")
+    return previous_summary
+
+
+def generate_flow_image(user_journey=None, force_regenerate=False, cache=None,
+                        provider=None, preset=None):
+    """Generate a creative image based on the user journey summary
+
+    The image comes from `provider` (default: get_provider()) at the size and
+    quality of `preset` ('preview', 'standard' or 'hd'; default:
+    $ARCADE_IMAGE_PRESET or 'standard') and is cached under a key derived from
+    the summary text, the prompt, the model and the preset options. With
+    Pillow installed, a thumbnail and a compressed copy are cached alongside.
+    Returns the path of the cached PNG.
+    """
+    provider = provider or get_provider()
+    missing_configuration = provider.missing_configuration()
+    if missing_configuration:
+        print(missing_configuration)
         return
 
-    summary_file = 'cache/ai-summary-chain.txt'
-    marketing_image_file = 'cache/image/marketing-image.png'
-
-    if not os.path.exists(summary_file):
+    if user_journey is None:
         print("Please run summarize_actions() first to generate the summary")
         return
 
-    os.makedirs('cache/image', exist_ok=True)
+    user_journey = user_journey.strip()
+    if not user_journey:
+        print("Summary is empty")
+        return
 
-    # Use cached marketing image if available
-    if not force_regenerate and os.path.exists(marketing_image_file):
-        print(f"Using cached marketing image: {marketing_image_file}")
+    cache = cache or get_cache()
+    options = provider.image_options(preset)
+    image_key = _image_key(user_journey, options)
+
+    with span('image', model=options['model'], size=options.get('size')) as image_span:
+        # Use cached marketing image if available
+        if not force_regenerate and cache.contains(image_key, '.png'):
+            image_span.set(cache='hit')
+            marketing_image_file = str(cache.path_for(image_key, '.png'))
+            print(f"Using cached marketing image: {marketing_image_file}")
+            image_bytes = None
+        else:
+            prompt = IMAGE_PROMPT.format(user_journey=user_journey)
+            image_bytes = provider.generate_image(prompt, preset)
+            image_span.set(cache='miss', bytes=len(image_bytes),
+                           cost_usd=options['cost_usd'])
+
+            # Save the image to cache
+            marketing_image_file = cache.set(image_key, image_bytes, '.png')
+
+    _create_derivatives(image_key, cache, image_bytes)
+    return marketing_image_file
+
+
+async def agenerate_flow_image(user_journey=None, force_regenerate=False,
+                               cache=None, semaphore=None,
+                               timeout=DEFAULT_TIMEOUT,
+                               max_retries=DEFAULT_MAX_RETRIES, provider=None,
+                               preset=None):
+    """Async variant of generate_flow_image
+
+    The request acquires `semaphore`, is bounded by `timeout` seconds and is
+    retried with backoff on rate-limit errors.
+    """
+    provider = provider or get_provider()
+    missing_configuration = provider.missing_configuration()
+    if missing_configuration:
+        print(missing_configuration)
         return
 
-    with open(summary_file, 'r') as f:
-        user_journey = f.read().strip()
+    if user_journey is None:
+        print("Please run summarize_actions() first to generate the summary")
+        return
 
+    user_journey = user_journey.strip()
     if not user_journey:
-        print("Summary file is empty")
+        print("Summary is empty")
         return
 
-    client = OpenAI()
-    prompt = (
-        "You are an expert at marketing and design. Generate a creative image "
-        "suitable for sharing on social platforms that represents the user "
-        "flow/journey and would drive engagement. It should be a single image, "
-        "that captures the essence of how easy it is do what is described in "
-        f"the user journey. Here is a summary of the user journey: {user_journey}"
-    )
-
-    result = client.images.generate(
-        model="dall-e-3",
-        prompt=prompt
-    )
-
-    image_base64 = result.data[0].b64_json
-    image_bytes = base64.b64decode(image_base64)
-
-    # Save the image to cache
-    with open(marketing_image_file, "wb") as f:
-        f.write(image_bytes)
+    cache = cache or get_cache()
+    options = provider.image_options(preset)
+    image_key = _image_key(user_journey, options)
+
+    with span('image', model=options['model'], size=options.get('size')) as image_span:
+        if not force_regenerate and cache.contains(image_key, '.png'):
+            image_span.set(cache='hit')
+            marketing_image_file = str(cache.path_for(image_key, '.png'))
+            print(f"Using cached marketing image: {marketing_image_file}")
+            image_bytes = None
+        else:
+            # Retries are handled by call_with_retry so backoff respects the semaphore
+            prompt = IMAGE_PROMPT.format(user_journey=user_journey)
+            image_bytes = await call_with_retry(
+                lambda: provider.agenerate_image(prompt, preset),
+                semaphore, timeout, max_retries
+            )
+            image_span.set(cache='miss', bytes=len(image_bytes),
+                           cost_usd=options['cost_usd'])
+            marketing_image_file = await asyncio.to_thread(cache.set, image_key,
+                                                           image_bytes, '.png')
+
+    # Pillow encoding is CPU bound, keep it off the event loop
+    await asyncio.to_thread(_create_derivatives, image_key, cache, image_bytes)
+    return marketing_image_file
 
 
 if __name__ == "__main__":
-    generate_flow_image()
+    from arcade_flow_analyzer.analysis import summarize_actions
+
+    analysis = summarize_actions()
+    if analysis:
+        generate_flow_image(analysis['summary'])
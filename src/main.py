@@ -5,89 +5,123 @@ Main script for Arcade Flow Analyzer
 This script demonstrates how to use the arcade_flow_analyzer package.
 """
 
-from arcade_flow_analyzer.extractors import process_flow, save_to_csv
-from arcade_flow_analyzer.analysis import summarize_actions
-from arcade_flow_analyzer.visualization import generate_flow_image
+from arcade_flow_analyzer.extractors import (
+    previous_image_summary, process_flow, process_flow_streaming, save_snapshot, save_to_csv
+)
+from arcade_flow_analyzer.caching import text_hash
+from arcade_flow_analyzer.analysis import summarize_actions, asummarize_actions
+from arcade_flow_analyzer.analysis.dedup import get_dedup_threshold
+from arcade_flow_analyzer.analysis.variants import VARIANTS, parse_variants, summarize_variants
+from arcade_flow_analyzer.event_store import (
+    DEFAULT_STORE_PATH, pyarrow_available, store_flow_events
+)
+from arcade_flow_analyzer.jobs import DEFAULT_QUEUE_PATH, JobQueue, run_worker
+from arcade_flow_analyzer.visualization import (
+    agenerate_flow_image, generate_flow_image, select_image_summary
+)
+from arcade_flow_analyzer.ratelimit import get_rate_share, request_priority
+from arcade_flow_analyzer.providers import (
+    IMAGE_PRESETS, PROVIDERS, create_provider, set_provider
+)
+from arcade_flow_analyzer.report import (
+    create_markdown_report, open_report_stream, report_image_links
+)
+from arcade_flow_analyzer.retry import DEFAULT_TIMEOUT
+from arcade_flow_analyzer.telemetry import (
+    Tracer, format_stage_table, get_tracer, set_tracer, span, use_tracer
+)
+import argparse
+import asyncio
+import contextvars
+import glob
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
+from pathlib import Path
 
+from dotenv import load_dotenv
 
-def create_markdown_report():
-    """Create a markdown report with the analysis results"""
-    steps_file = 'cache/ai-steps-chain.txt'
-    summary_file = 'cache/ai-summary-chain.txt'
-    image_file = 'cache/image/marketing-image.png'
 
-    missing_files = []
-    if not os.path.exists(steps_file):
-        missing_files.append(steps_file)
-    if not os.path.exists(summary_file):
-        missing_files.append(summary_file)
-    if not os.path.exists(image_file):
-        missing_files.append(image_file)
+def stream_flow_report(result, map_reduce=False, processed_csv=None):
+    """Summarize and image an extracted flow, streaming its report to a file
 
-    if missing_files:
-        print(f"Cannot create report - missing files: {missing_files}")
-        return None
-
-    with open(steps_file, 'r') as f:
-        steps_content = f.read().strip()
-
-    with open(summary_file, 'r') as f:
-        summary_content = f.read().strip()
-
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    markdown_content = f"""# Arcade Flow Analysis Report
-
-*Generated on: {timestamp}*
-
-## User Journey Steps
-
-{steps_content}
-
-## Summary
-
-{summary_content}
-
-## Flow Marketing Visualization (Generated with OpenAI's Image API and gpt-image-1 model)
+    The steps and summary are written to the report as the chat model
+    produces them, and the image section is filled in once the image is
+    ready. Returns the report file.
+    """
+    with open_report_stream() as report:
+        analysis = summarize_actions(flow=result, processed_csv=processed_csv,
+                                     map_reduce=map_reduce, on_chunk=report.feed)
+        if not analysis:
+            raise RuntimeError("summarization returned no result")
+        report.image_pending()
 
-![Generated Flow Image](cache/image/marketing-image.png)
+        image_summary = select_image_summary(analysis['summary'],
+                                             previous_image_summary(result))
+        image_file = generate_flow_image(image_summary)
+        if not image_file:
+            raise RuntimeError("image generation returned no result")
+        save_snapshot(result, image_summary=image_summary)
+        report.finish(*report_image_links(image_file, report.report_file))
+    return report.report_file
 
----
-*This report was generated by the Arcade Flow Analyzer*
 
-"""
-
-    report_file = f'flow-analysis-report-{timestamp}.md'
-    with open(report_file, 'w') as f:
-        f.write(markdown_content)
-
-    print(f"Markdown report created: {report_file}")
-    return report_file
+def main(export_csv=False, map_reduce=False, incremental=False, variants=None,
+         prefer_variant=None, stream_report=False):
+    """Main function
 
-
-def main():
-    """Main function"""
+    The extracted actions are handed to the summary stage in memory;
+    export_csv=True additionally writes them to cache/actions.csv and
+    cache/processed_actions.csv. incremental=True diffs the flow against its
+    previously analyzed version (see extractors.incremental). variants runs
+    those summary variants side by side and reports prefer_variant, or the
+    fastest (see analysis.variants). stream_report=True writes the report
+    while the analysis runs (see stream_flow_report).
+    """
     print("Arcade Flow Analyzer")
     print("=" * 50)
     print()
 
     print("Extracting actions from flow.json")
     try:
-        result = process_flow("flow.json")
-        csv_path = save_to_csv(result, "actions.csv")
+        result = process_flow("flow.json", incremental)
         print(f"Flow: {result['name']}")
         print(f"Events: {len(result['events'])}")
-        print(f"Saved to: {csv_path}")
+        if store_flow_events(result) is not None:
+            print("Events added to the event store")
+        if export_csv:
+            csv_path = save_to_csv(result, "actions.csv")
+            print(f"Saved to: {csv_path}")
     except Exception as e:
         print(f"Error in extraction: {e}")
         return
 
+    if stream_report:
+        print(" Summarizing user journey and generating the flow visualization")
+        try:
+            stream_flow_report(result, map_reduce,
+                               'cache/processed_actions.csv' if export_csv else None)
+        except Exception as e:
+            print(f"Error in streamed analysis: {e}")
+            return
+        print()
+        print("\n".join(format_stage_table(get_tracer().summary())))
+        print("Done")
+        return
 
     print(" Summarizing user journey")
     try:
-        summarize_actions()
+        processed_csv = 'cache/processed_actions.csv' if export_csv else None
+        if variants:
+            analysis = summarize_variants(variants, prefer_variant, flow=result,
+                                          processed_csv=processed_csv)
+        else:
+            analysis = summarize_actions(flow=result, processed_csv=processed_csv,
+                                         map_reduce=map_reduce)
+        if not analysis:
+            print("Failed to summarize user journey")
+            return
         print("Summary generated successfully")
     except Exception as e:
         print(f"Error in summarization: {e}")
@@ -95,7 +129,10 @@ def main():
     
     print("Generating flow visualization")
     try:
-        generate_flow_image()
+        image_summary = select_image_summary(analysis['summary'],
+                                             previous_image_summary(result))
+        image_file = generate_flow_image(image_summary)
+        save_snapshot(result, image_summary=image_summary)
         print("Image generated successfully")
     except Exception as e:
         print(f"Error in image generation: {e}")
@@ -104,14 +141,574 @@ def main():
     # Step 4: Create markdown report
     print("Creating markdown report...")
     try:
-        report_file = create_markdown_report()
+        report_file = create_markdown_report(analysis['steps'],
+                                             analysis['summary'],
+                                             image_file,
+                                             variants=analysis.get('variants'),
+                                             chosen_variant=analysis.get('variant'))
         if not report_file:
             print("Failed to create report")
     except Exception as e:
         print(f"Error creating report: {e}")
         return
-    
+
+    print()
+    print("\n".join(format_stage_table(get_tracer().summary())))
     print("Done")
 
+
+def find_flow_files(source):
+    """Resolve a directory or glob pattern to a sorted list of flow files"""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, '*.json')
+    else:
+        pattern = source
+    return sorted(glob.glob(pattern, recursive=True))
+
+
+def _extract_flow(flow_file, stream=False, incremental=False):
+    """Extract a single flow (runs in a worker process)
+
+    The extracted events are returned to the parent in memory; incremental=True
+    reuses the unchanged rows of the flow's previous version, and the events
+    are added to the event store when it is enabled. With
+    stream=True the flow is parsed incrementally, so worker memory stays flat
+    regardless of flow size, and the events are spilled to a CSV instead. That
+    CSV is written under a name derived from the file path and renamed once the
+    content hash is known. The worker's spans are returned for the parent's
+    tracer.
+    """
+    with use_tracer(Tracer()) as tracer:
+        if stream:
+            with span('extract', stream=True) as extract_span:
+                result = process_flow_streaming(flow_file)
+                staging_path = save_to_csv(
+                    result,
+                    f"actions-staging-{text_hash(os.path.abspath(flow_file))[:16]}.csv"
+                )
+                csv_path = f"cache/actions-{result['flow_hash'][:16]}.csv"
+                os.replace(staging_path, csv_path)
+                extract_span.set(bytes=os.path.getsize(flow_file),
+                                 events=result['event_count'])
+            extracted = {
+                'flow_file': flow_file,
+                'name': result['name'],
+                'flow_hash': result['flow_hash'],
+                'flow_id': result['flow_id'],
+                'events': result['event_count'],
+                'csv_path': csv_path,
+                'flow': None,
+            }
+        else:
+            result = process_flow(flow_file, incremental)
+            store_flow_events(result)
+            extracted = {
+                'flow_file': flow_file,
+                'name': result['name'],
+                'flow_hash': result['flow_hash'],
+                'flow_id': result['flow_id'],
+                'events': len(result['events']),
+                'csv_path': None,
+                'flow': result,
+            }
+
+    extracted['spans'] = list(tracer.spans)
+    return extracted
+
+
+def _summary_fields(extracted):
+    """The extraction fields kept for the batch index (without events or spans)"""
+    return {key: value for key, value in extracted.items()
+            if key not in ('flow', 'spans')}
+
+
+def _record_spans(extracted):
+    """Hand spans recorded in an extraction worker to the current tracer"""
+    tracer = get_tracer()
+    for span_dict in extracted['spans']:
+        tracer.export(span_dict)
+
+
+def _summarize_variants(extracted, variants, prefer_variant):
+    return summarize_variants(variants, prefer_variant, input_csv=extracted['csv_path'],
+                              flow=extracted['flow'], flow_hash=extracted['flow_hash'],
+                              flow_id=extracted['flow_id'])
+
+
+def _analyze_flow(extracted, map_reduce=False, variants=None, prefer_variant=None):
+    """Run the summary and image stages for one extracted flow
+
+    The image of the flow's previous version is reused when the summary has
+    not materially changed (incremental extraction only). With variants, the
+    summary variants run side by side and the image is made from the
+    reported one.
+    """
+    with span('analyze', flow_hash=extracted['flow_hash'][:12]):
+        if variants:
+            analysis = _summarize_variants(extracted, variants, prefer_variant)
+        else:
+            analysis = summarize_actions(input_csv=extracted['csv_path'],
+                                         flow=extracted['flow'],
+                                         flow_hash=extracted['flow_hash'],
+                                         flow_id=extracted['flow_id'],
+                                         map_reduce=map_reduce)
+        if not analysis:
+            raise RuntimeError("summarization returned no result")
+
+        flow = extracted['flow']
+        image_summary = select_image_summary(analysis['summary'],
+                                             previous_image_summary(flow))
+        image_file = generate_flow_image(image_summary)
+        if not image_file:
+            raise RuntimeError("image generation returned no result")
+        save_snapshot(flow, image_summary=image_summary)
+
+    return analysis, image_file
+
+
+async def _analyze_flow_async(extracted, semaphore, timeout, map_reduce=False,
+                              variants=None, prefer_variant=None):
+    """Async variant of _analyze_flow; API calls share the semaphore
+
+    Summary variants run in a thread (the agent has no async API), outside
+    the semaphore and timeout.
+    """
+    with span('analyze', flow_hash=extracted['flow_hash'][:12]):
+        if variants:
+            analysis = await asyncio.to_thread(_summarize_variants, extracted, variants,
+                                               prefer_variant)
+        else:
+            analysis = await asummarize_actions(input_csv=extracted['csv_path'],
+                                                flow=extracted['flow'],
+                                                flow_hash=extracted['flow_hash'],
+                                                flow_id=extracted['flow_id'],
+                                                semaphore=semaphore, timeout=timeout,
+                                                map_reduce=map_reduce)
+        if not analysis:
+            raise RuntimeError("summarization returned no result")
+
+        flow = extracted['flow']
+        image_summary = await asyncio.to_thread(select_image_summary, analysis['summary'],
+                                                previous_image_summary(flow))
+        image_file = await agenerate_flow_image(image_summary,
+                                                semaphore=semaphore, timeout=timeout)
+        if not image_file:
+            raise RuntimeError("image generation returned no result")
+        await asyncio.to_thread(save_snapshot, flow, None, image_summary)
+
+    return analysis, image_file
+
+
+def _prompt_tokens(analysis):
+    """Steps prompt token count, or 'cached' when no prompt was sent"""
+    if analysis.get('variant'):
+        return f"{analysis['variant']} variant"
+    prompt_stats = analysis.get('prompt_stats')
+    map_reduce_stats = analysis.get('map_reduce_stats')
+    if prompt_stats:
+        return prompt_stats['tokens']
+    if map_reduce_stats:
+        return f"map-reduce ({map_reduce_stats['segments']} segments)"
+    return 'cached'
+
+
+def _batch_report_file(entry, output_dir):
+    return os.path.join(
+        output_dir,
+        f"{Path(entry['flow_file']).stem}-{entry['flow_hash'][:12]}.md"
+    )
+
+
+def write_batch_index(entries, output_dir, stage_summary=None):
+    """Write a markdown index linking every report produced by a batch run
+
+    stage_summary (from Tracer.summary) adds a per-stage timing table.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    succeeded = sum(1 for entry in entries if entry['report_file'])
+
+    lines = [
+        "# Arcade Flow Batch Report",
+        "",
+        f"*Generated on: {timestamp}*",
+        "",
+        f"Processed {len(entries)} flows: {succeeded} succeeded, "
+        f"{len(entries) - succeeded} failed.",
+        "",
+        "| Flow file | Name | Events | Prompt tokens | Status |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for entry in entries:
+        if entry['report_file']:
+            report_link = os.path.relpath(entry['report_file'], output_dir)
+            status = f"[report]({report_link})"
+        else:
+            # Keep multi-line errors (e.g. validation) on one table row
+            status = f"failed: {entry['error'].splitlines()[0]}"
+        lines.append(f"| {entry['flow_file']} | {entry.get('name', '')} | "
+                     f"{entry.get('events', '')} | {entry.get('prompt_tokens', '')} | "
+                     f"{status} |")
+
+    if stage_summary:
+        lines += ["", "## Stage timings", ""] + format_stage_table(stage_summary)
+
+    index_file = os.path.join(output_dir, 'index.md')
+    with open(index_file, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+    print(f"Batch index created: {index_file}")
+    return index_file
+
+
+def _write_batch_telemetry(tracer, output_dir):
+    """Aggregate the batch's spans into telemetry.json and return the summary"""
+    stage_summary = tracer.summary()
+    telemetry_file = os.path.join(output_dir, 'telemetry.json')
+    with open(telemetry_file, 'w') as f:
+        json.dump(stage_summary, f, indent=2)
+    print(f"Stage telemetry written: {telemetry_file}")
+    if tracer.dropped:
+        print(f"{tracer.dropped} spans were dropped from memory; "
+              "the stage totals still include them")
+    return stage_summary
+
+
+def process_batch(source, output_dir='reports', workers=None, concurrency=4,
+                  stream=False, map_reduce=False, incremental=False, variants=None,
+                  prefer_variant=None):
+    """Analyze every flow matched by source (a directory or glob pattern)
+
+    Extraction runs in a process pool of `workers` processes. The summary and
+    image stages are I/O bound on OpenAI, so they run in a thread pool of at
+    most `concurrency` flows at a time. Flows with identical content are only
+    analyzed once. A failure in one flow is recorded in the index and does not
+    stop the rest of the batch. stream=True uses the streaming extractor,
+    map_reduce=True the segmented summarization mode and incremental=True
+    re-analyzes edited flows incrementally. variants runs those summary
+    variants side by side per flow and reports prefer_variant, or the fastest.
+    Per-stage timings are aggregated into telemetry.json and the index.
+    """
+    flow_files = find_flow_files(source)
+    if not flow_files:
+        print(f"No flow files found for: {source}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Processing {len(flow_files)} flows")
+
+    entries = {flow_file: {'flow_file': flow_file, 'report_file': None,
+                           'error': None}
+               for flow_file in flow_files}
+
+    tracer = Tracer(get_tracer().path)
+    with use_tracer(tracer), request_priority('batch'), \
+            ProcessPoolExecutor(max_workers=workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as analyze_pool:
+        extract_futures = {extract_pool.submit(_extract_flow, flow_file, stream,
+                                               incremental): flow_file
+                           for flow_file in flow_files}
+
+        # Start analysis as soon as each extraction finishes
+        analyze_futures = {}
+        for future in as_completed(extract_futures):
+            flow_file = extract_futures[future]
+            try:
+                extracted = future.result()
+            except Exception as e:
+                print(f"Error in extraction of {flow_file}: {e}")
+                entries[flow_file]['error'] = f"extraction: {e}"
+                continue
+
+            entries[flow_file].update(_summary_fields(extracted))
+            _record_spans(extracted)
+            flow_hash = extracted['flow_hash']
+            if flow_hash not in analyze_futures:
+                # Copy the context so spans in the thread reach the batch tracer
+                analyze_futures[flow_hash] = analyze_pool.submit(
+                    contextvars.copy_context().run, _analyze_flow, extracted,
+                    map_reduce, variants, prefer_variant
+                )
+
+        for entry in entries.values():
+            if entry['error']:
+                continue
+            try:
+                analysis, image_file = analyze_futures[entry['flow_hash']].result()
+            except Exception as e:
+                print(f"Error in analysis of {entry['flow_file']}: {e}")
+                entry['error'] = f"analysis: {e}"
+                continue
+
+            entry['prompt_tokens'] = _prompt_tokens(analysis)
+            entry['report_file'] = create_markdown_report(
+                analysis['steps'], analysis['summary'], image_file,
+                _batch_report_file(entry, output_dir),
+                variants=analysis.get('variants'), chosen_variant=analysis.get('variant')
+            )
+            if not entry['report_file']:
+                entry['error'] = "report: missing results"
+
+    stage_summary = _write_batch_telemetry(tracer, output_dir)
+    return write_batch_index(list(entries.values()), output_dir, stage_summary)
+
+
+async def process_batch_async(source, output_dir='reports', workers=None,
+                              concurrency=4, timeout=DEFAULT_TIMEOUT, stream=False,
+                              map_reduce=False, incremental=False, variants=None,
+                              prefer_variant=None):
+    """Asyncio variant of process_batch
+
+    Every flow's summary and image calls run concurrently on the event loop.
+    `concurrency` bounds the number of OpenAI requests in flight across the
+    whole batch, each request is limited to `timeout` seconds, and rate-limit
+    errors are retried with backoff. Extraction still runs in a process pool.
+    """
+    flow_files = find_flow_files(source)
+    if not flow_files:
+        print(f"No flow files found for: {source}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Processing {len(flow_files)} flows")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    analyses = {}
+    entries = {flow_file: {'flow_file': flow_file, 'report_file': None,
+                           'error': None}
+               for flow_file in flow_files}
+
+    async def run_flow(extract_pool, entry):
+        try:
+            extracted = await loop.run_in_executor(extract_pool, _extract_flow,
+                                                   entry['flow_file'], stream,
+                                                   incremental)
+        except Exception as e:
+            print(f"Error in extraction of {entry['flow_file']}: {e}")
+            entry['error'] = f"extraction: {e}"
+            return
+
+        entry.update(_summary_fields(extracted))
+        _record_spans(extracted)
+        flow_hash = extracted['flow_hash']
+        if flow_hash not in analyses:
+            analyses[flow_hash] = asyncio.ensure_future(
+                _analyze_flow_async(extracted, semaphore, timeout, map_reduce, variants,
+                                    prefer_variant)
+            )
+
+        try:
+            analysis, image_file = await analyses[flow_hash]
+        except Exception as e:
+            print(f"Error in analysis of {entry['flow_file']}: {e}")
+            entry['error'] = f"analysis: {e}"
+            return
+
+        entry['prompt_tokens'] = _prompt_tokens(analysis)
+        entry['report_file'] = await asyncio.to_thread(
+            create_markdown_report, analysis['steps'], analysis['summary'],
+            image_file, _batch_report_file(entry, output_dir),
+            variants=analysis.get('variants'), chosen_variant=analysis.get('variant')
+        )
+        if not entry['report_file']:
+            entry['error'] = "report: missing results"
+
+    tracer = Tracer(get_tracer().path)
+    with use_tracer(tracer), request_priority('batch'), \
+            ProcessPoolExecutor(max_workers=workers) as extract_pool:
+        await asyncio.gather(*(run_flow(extract_pool, entry)
+                               for entry in entries.values()))
+
+    stage_summary = _write_batch_telemetry(tracer, output_dir)
+    return write_batch_index(list(entries.values()), output_dir, stage_summary)
+
+
+def _run_queue_worker(queue_path, provider=None, rate_share=None):
+    """Run a job queue worker (in a worker process); return its spans"""
+    # Unbounded: the parent's stage totals need every span of every job
+    with use_tracer(Tracer(max_spans=None)) as tracer:
+        run_worker(queue_path, provider=provider, rate_share=rate_share)
+    return list(tracer.spans)
+
+
+def process_batch_queue(source=None, output_dir='reports', workers=None,
+                        queue_path=DEFAULT_QUEUE_PATH, map_reduce=False, provider=None):
+    """Analyze flows through the durable job queue at queue_path
+
+    Every flow matched by source is enqueued (flows already queued with the
+    same content and options keep their job), then `workers` processes work
+    the queue until no job is left to run. Each job checkpoints after every
+    pipeline stage, so rerunning the same command after a crash or an
+    interrupted run resumes unfinished jobs where they stopped, and skips
+    finished ones. Without source, only the jobs already queued are worked.
+    provider names the model provider the worker processes use. The workers
+    split this process's share of the API rate limits evenly (see ratelimit).
+    """
+    queue = JobQueue(queue_path)
+    job_ids = None
+    if source:
+        flow_files = find_flow_files(source)
+        if not flow_files:
+            print(f"No flow files found for: {source}")
+            return None
+        options = {'output_dir': output_dir, 'map_reduce': map_reduce}
+        job_ids = [queue.enqueue(flow_file, options) for flow_file in flow_files]
+        print(f"Queued {len(job_ids)} flows in {queue_path}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    rate_share = get_rate_share() / workers
+    tracer = Tracer(get_tracer().path)
+    with use_tracer(tracer), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_queue_worker, queue_path, provider, rate_share)
+                   for _ in range(workers)]
+        for future in as_completed(futures):
+            for span_dict in future.result():
+                tracer.export(span_dict)
+
+    counts = queue.counts()
+    print("Jobs: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    if job_ids is None:
+        return None
+
+    entries = []
+    for job in queue.jobs(job_ids):
+        checkpoint = job['checkpoint']
+        done = job['status'] == 'done'
+        entries.append({
+            'flow_file': job['flow_file'],
+            'name': checkpoint.get('name', ''),
+            'events': checkpoint.get('events', ''),
+            'report_file': checkpoint.get('report_file') if done else None,
+            'error': None if done else job['error'] or f"job {job['status']}",
+        })
+    stage_summary = _write_batch_telemetry(tracer, output_dir)
+    return write_batch_index(entries, output_dir, stage_summary)
+
+
 if __name__ == "__main__":
-    main()
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Arcade Flow Analyzer")
+    parser.add_argument('--batch', metavar='DIR_OR_GLOB',
+                        help="Analyze every flow in a directory or glob pattern")
+    parser.add_argument('--output-dir', default='reports',
+                        help="Directory for batch reports (default: reports)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Extraction processes (default: CPU count)")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Flows summarized/imaged at once, or OpenAI requests "
+                             "in flight with --async (default: 4)")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Run the summary and image stages on asyncio")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="Per-request timeout in seconds with --async")
+    parser.add_argument('--export-csv', action='store_true',
+                        help="Also write the extracted and processed actions "
+                             "to cache/ (single flow mode)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Parse flows incrementally (requires ijson)")
+    parser.add_argument('--map-reduce', action='store_true',
+                        help="Summarize long flows segment by segment")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Append per-stage spans to FILE as JSON lines "
+                             "(default: $ARCADE_TRACE_FILE)")
+    parser.add_argument('--provider', choices=PROVIDERS,
+                        help="Model provider; 'stub' runs offline with canned "
+                             "output (default: $ARCADE_PROVIDER or openai)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Re-analyze edited flows incrementally: rebuild only "
+                             "changed rows and keep the image if the summary "
+                             "has not materially changed")
+    parser.add_argument('--image-preset', choices=sorted(IMAGE_PRESETS),
+                        help="Image size/quality; 'preview' is cheapest "
+                             "(default: $ARCADE_IMAGE_PRESET or standard)")
+    parser.add_argument('--image-format', choices=['webp', 'jpeg'],
+                        help="Format of the thumbnail and compressed image copies "
+                             "(default: $ARCADE_IMAGE_FORMAT or webp)")
+    parser.add_argument('--variants', metavar='NAMES',
+                        help="Run these summary variants side by side, e.g. "
+                             f"chain,agentic (any of {', '.join(VARIANTS)})")
+    parser.add_argument('--prefer-variant', choices=list(VARIANTS),
+                        help="Variant to report with --variants (default: the fastest)")
+    parser.add_argument('--dedup-threshold', metavar='SIMILARITY',
+                        help="Reuse the summary of an already analyzed flow whose "
+                             "actions are at least this similar (0-1), 'on' (0.9) or "
+                             "'off' (default: $ARCADE_DEDUP_THRESHOLD or off)")
+    parser.add_argument('--stream-report', action='store_true',
+                        help="Write the report while the flow is analyzed: steps and "
+                             "summary as they are generated, the image when ready "
+                             "(single flow mode)")
+    parser.add_argument('--event-store', metavar='DIR', nargs='?', const=DEFAULT_STORE_PATH,
+                        help="Append the extracted events to a Parquet store "
+                             "partitioned by team and date (requires pyarrow; "
+                             f"default DIR: $ARCADE_EVENT_STORE or {DEFAULT_STORE_PATH})")
+    parser.add_argument('--queue', metavar='FILE', nargs='?', const=DEFAULT_QUEUE_PATH,
+                        help="Run the batch through a durable job queue that resumes "
+                             "interrupted runs; without --batch, work the jobs "
+                             f"already queued (default FILE: {DEFAULT_QUEUE_PATH})")
+    args = parser.parse_args()
+
+    # Read by the image stage on every call
+    if args.image_preset:
+        os.environ['ARCADE_IMAGE_PRESET'] = args.image_preset
+    if args.image_format:
+        os.environ['ARCADE_IMAGE_FORMAT'] = args.image_format
+    # Read by the summary stage on every call
+    if args.dedup_threshold:
+        os.environ['ARCADE_DEDUP_THRESHOLD'] = args.dedup_threshold
+    try:
+        get_dedup_threshold()
+    except ValueError as e:
+        parser.error(str(e))
+    # Read by the extraction stage, in every worker
+    if args.event_store:
+        if args.stream:
+            parser.error("--event-store cannot be combined with --stream")
+        if not pyarrow_available():
+            parser.error("--event-store requires pyarrow: pip install pyarrow")
+        os.environ['ARCADE_EVENT_STORE'] = args.event_store
+    if args.incremental and args.stream:
+        parser.error("--incremental cannot be combined with --stream")
+    variants = None
+    if args.variants:
+        try:
+            variants = parse_variants(args.variants)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.map_reduce:
+            parser.error("--map-reduce is a variant with --variants: list map_reduce there")
+    elif args.prefer_variant:
+        parser.error("--prefer-variant requires --variants")
+    if args.stream_report:
+        unsupported = [flag for flag, value in [('--batch', args.batch),
+                                                ('--queue', args.queue),
+                                                ('--variants', args.variants)] if value]
+        if unsupported:
+            parser.error(f"--stream-report cannot be combined with {', '.join(unsupported)}")
+    if args.queue:
+        unsupported = [flag for flag, value in [('--async', args.use_async),
+                                                ('--stream', args.stream),
+                                                ('--incremental', args.incremental),
+                                                ('--variants', args.variants)] if value]
+        if unsupported:
+            parser.error(f"--queue cannot be combined with {', '.join(unsupported)}")
+    if args.trace:
+        set_tracer(Tracer(args.trace))
+    if args.provider:
+        set_provider(create_provider(args.provider))
+
+    if args.queue:
+        process_batch_queue(args.batch, args.output_dir, args.workers, args.queue,
+                            args.map_reduce, args.provider)
+    elif args.batch and args.use_async:
+        asyncio.run(process_batch_async(args.batch, args.output_dir, args.workers,
+                                        args.concurrency, args.timeout, args.stream,
+                                        args.map_reduce, args.incremental, variants,
+                                        args.prefer_variant))
+    elif args.batch:
+        process_batch(args.batch, args.output_dir, args.workers, args.concurrency,
+                      args.stream, args.map_reduce, args.incremental, variants,
+                      args.prefer_variant)
+    else:
+        main(args.export_csv, args.map_reduce, args.incremental, variants,
+             args.prefer_variant, args.stream_report)
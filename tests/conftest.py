@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from arcade_flow_analyzer.caching import artifacts, create_cache
+from arcade_flow_analyzer.providers import registry
+
+SAMPLE_FLOW = Path(__file__).resolve().parent.parent / 'flow.json'
+
+
+@pytest.fixture
+def flow_bytes():
+    return SAMPLE_FLOW.read_bytes()
+
+
+@pytest.fixture
+def edited_flow_bytes():
+    """The sample flow with one hotspot label changed"""
+    flow = json.loads(SAMPLE_FLOW.read_text())
+    next(step for step in flow['steps'] if step.get('hotspots'))['hotspots'][0]['label'] = \
+        "Start typing to search the store."
+    return json.dumps(flow).encode('utf-8')
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh disk cache installed as the shared cache"""
+    cache = create_cache(root=str(tmp_path / 'store'))
+    monkeypatch.setattr(artifacts, '_default_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def stub_provider(monkeypatch):
+    """Install a factory returning a StubProvider as the shared provider"""
+    from arcade_flow_analyzer.providers.stub import StubProvider
+
+    def install(**options):
+        provider = StubProvider(**options)
+        monkeypatch.setattr(registry, '_default_provider', provider)
+        return provider
+
+    for name in ('ARCADE_DEDUP_THRESHOLD', 'ARCADE_EVENT_STORE', 'ARCADE_IMAGE_PRESET'):
+        monkeypatch.delenv(name, raising=False)
+    return install
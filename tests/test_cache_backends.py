@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+
+import pytest
+
+from arcade_flow_analyzer.caching import (
+    ArtifactCache, CacheBackend, DiskCache, SQLiteCache, cache_key
+)
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+
+@pytest.fixture
+def key():
+    return cache_key('flow-hash', 'summary', 'prompt', 'model')
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    cache = SQLiteCache(tmp_path / 'store.sqlite3', ttl=60)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def redis_cache():
+    fakeredis = pytest.importorskip('fakeredis')
+    from arcade_flow_analyzer.caching.redis_cache import RedisCache
+
+    cache = RedisCache(ttl=60, client=fakeredis.FakeRedis())
+    yield cache
+    cache.close()
+
+
+def _advance_clock(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(time, 'time', lambda: now)
+
+
+def test_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+@pytest.mark.parametrize('backend', ['sqlite_cache', 'redis_cache'])
+def test_round_trip(request, backend, key):
+    cache = request.getfixturevalue(backend)
+
+    assert cache.get_text(key) is None
+    assert not cache.contains(key, '.txt')
+    cache.set_text(key, "1. Open the store")
+    assert cache.get_text(key) == "1. Open the store"
+    assert cache.contains(key, '.txt')
+    # The suffix is part of the entry's identity
+    assert cache.get(key, '.png') is None
+
+    cache.delete(key, '.txt')
+    assert cache.get_text(key) is None
+
+
+def test_sqlite_entries_expire(sqlite_cache, key, monkeypatch):
+    sqlite_cache.set_text(key, "steps")
+    sqlite_cache.set(key, b"short-lived", '.bin', ttl=1)
+
+    _advance_clock(monkeypatch, 5)
+    assert sqlite_cache.get(key, '.bin') is None
+    assert not sqlite_cache.contains(key, '.bin')
+    assert sqlite_cache.get_text(key) == "steps"
+
+    _advance_clock(monkeypatch, 120)
+    assert not sqlite_cache.contains(key, '.txt')
+    assert sqlite_cache.purge_expired() == 1
+    assert sqlite_cache.get_text(key) is None
+
+
+def test_sqlite_without_ttl_keeps_entries(tmp_path, key, monkeypatch):
+    cache = SQLiteCache(tmp_path / 'store.sqlite3', ttl=None)
+    cache.set_text(key, "steps")
+    _advance_clock(monkeypatch, 10 ** 9)
+    assert cache.get_text(key) == "steps"
+    cache.close()
+
+
+def test_sqlite_closes_thread_connections(sqlite_cache, key):
+    sqlite_cache.set_text(key, "steps")
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(sqlite_cache.get_text(key)))
+    worker.start()
+    worker.join()
+    assert seen == ["steps"]
+    assert len(sqlite_cache._connections) == 2
+
+    # Opening a connection in a new thread closes the exited worker's
+    worker = threading.Thread(target=lambda: sqlite_cache.get_text(key))
+    worker.start()
+    worker.join()
+    assert worker in sqlite_cache._connections
+    assert len(sqlite_cache._connections) == 2
+
+    sqlite_cache.close()
+    assert sqlite_cache._connections == {}
+    # A closed cache reconnects on its next use
+    assert sqlite_cache.get_text(key) == "steps"
+
+
+def test_redis_entries_expire(redis_cache, key):
+    redis_cache.set(key, b"short-lived", '.txt', ttl=0.05)
+    assert redis_cache.contains(key, '.txt')
+    time.sleep(0.1)
+    assert redis_cache.get(key, '.txt') is None
+    assert not redis_cache.contains(key, '.txt')
+
+
+def test_redis_keys_are_prefixed(redis_cache, key):
+    redis_cache.set_text(key, "summary")
+    assert redis_cache.client.get(f"arcade:{key}.txt") == b"summary"
+    assert 0 < redis_cache.client.pttl(f"arcade:{key}.txt") <= 60_000
+
+
+@pytest.mark.parametrize('backend', ['sqlite_cache', 'redis_cache'])
+def test_images_are_stored_apart_from_text(request, backend, tmp_path, key):
+    store = request.getfixturevalue(backend)
+    cache = ArtifactCache(store, DiskCache(root=tmp_path / 'blobs'))
+
+    cache.set_text(key, "summary")
+    cache.set(key, PNG_BYTES, '.png')
+
+    assert store.get_text(key) == "summary"
+    assert store.get(key, '.png') is None
+    assert cache.path_for(key, '.png').read_bytes() == PNG_BYTES
+    assert not cache.path_for(key, '.txt').exists()
+    assert cache.get(key, '.png') == PNG_BYTES
+    assert cache.get_text(key) == "summary"
+
+
+def _key(flow_hash):
+    return cache_key(flow_hash, 'summary', 'prompt', 'model')
+
+
+def _count_sweeps(monkeypatch, cache):
+    sweeps = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, 'evict', lambda: sweeps.append(1) or evict())
+    return sweeps
+
+
+def test_disk_eviction_sweeps_on_bytes_written(tmp_path, monkeypatch):
+    cache = DiskCache(root=tmp_path, max_bytes=1000, evict_interval_seconds=3600)
+    sweeps = _count_sweeps(monkeypatch, cache)
+
+    for i in range(9):
+        cache.set(_key(str(i)), b'x' * 30, '.txt')
+
+    # The first write, then every 100 bytes (a tenth of max_bytes)
+    assert len(sweeps) == 3
+
+
+def test_disk_eviction_sweeps_after_interval(tmp_path, monkeypatch):
+    cache = DiskCache(root=tmp_path, evict_interval_seconds=60)
+    sweeps = _count_sweeps(monkeypatch, cache)
+    cache.set(_key('a'), b'a')
+    cache.set(_key('b'), b'b')
+    assert len(sweeps) == 1
+
+    now = time.monotonic() + 61
+    monkeypatch.setattr(time, 'monotonic', lambda: now)
+    cache.set(_key('c'), b'c')
+    assert len(sweeps) == 2
+
+
+def test_disk_eviction_removes_least_recently_used(tmp_path):
+    cache = DiskCache(root=tmp_path, max_bytes=250)
+    keys = [_key(name) for name in 'abc']
+    cache.set(keys[0], b'a' * 100)
+    cache.set(keys[1], b'b' * 100)
+    now = time.time()
+    os.utime(cache.path_for(keys[0]), (now - 20, now - 20))
+    os.utime(cache.path_for(keys[1]), (now - 10, now - 10))
+
+    assert cache.get(keys[0]) == b'a' * 100
+    cache.set(keys[2], b'c' * 100)
+
+    assert cache.contains(keys[0])
+    assert not cache.contains(keys[1])
+    assert cache.contains(keys[2])
+
+
+def test_disk_max_age_counts_from_last_access(tmp_path, monkeypatch, key):
+    cache = DiskCache(root=tmp_path, max_age_seconds=100)
+    path = cache.set_text(key, "summary")
+    created = time.time() - 90
+    os.utime(path, (created, created))
+
+    assert cache.get_text(key) == "summary"
+    # 140 seconds after the write, but only 50 after the last read
+    _advance_clock(monkeypatch, 50)
+    assert cache.get_text(key) == "summary"
+    _advance_clock(monkeypatch, 150)
+    assert cache.get_text(key) is None
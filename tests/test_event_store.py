@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from arcade_flow_analyzer.event_store import EventStore, current_pages, typing_latencies
+from arcade_flow_analyzer.extractors import process_flow_bytes
+
+
+def test_typing_latencies():
+    types = ['click', 'typing', 'click', 'scrolling', 'click', 'click', 'typing']
+    event_ms = np.array([1000, 1600, 2000, 2500, 3000, 4000, 4250])
+
+    latencies = typing_latencies(types, event_ms)
+
+    # The third click is followed by another click before any typing
+    assert latencies.tolist() == [600, -1, -1, -1, -1, 250, -1]
+
+
+def test_typing_latencies_ignore_out_of_order_timestamps():
+    latencies = typing_latencies(['click', 'typing'], np.array([5000, 4000]))
+    assert latencies.tolist() == [-1, -1]
+
+
+def test_typing_latencies_of_no_events():
+    assert typing_latencies([], np.array([], dtype=np.int64)).tolist() == []
+
+
+def test_current_pages():
+    # Context 0 has no page, 1 and 2 are pages, 3 is a context without a page
+    page_urls = ['', 'https://shop.example/', 'https://shop.example/cart', '']
+    context_ids = np.array([0, 1, 3, 0, 2, 3, 1])
+
+    pages = current_pages(context_ids, page_urls)
+
+    assert pages.tolist() == [0, 1, 1, 1, 2, 2, 1]
+
+
+def test_current_pages_of_no_events():
+    assert current_pages(np.array([], dtype=np.uint32), ['']).tolist() == []
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(tmp_path / 'events')
+
+
+def test_empty_store(store):
+    assert store.summary() == {'events': 0, 'flows': 0, 'teams': 0}
+    assert store.aggregate({'events': ('event_index', 'count')}, by=['type']) == []
+
+
+def test_edited_flow_replaces_its_events(store, flow_bytes, edited_flow_bytes):
+    original = process_flow_bytes(flow_bytes)
+    edited = process_flow_bytes(edited_flow_bytes)
+    assert original['flow_hash'] != edited['flow_hash']
+
+    store.append(original)
+    store.append(original)
+    store.append(edited)
+
+    assert store.summary() == {'events': 11, 'flows': 1, 'teams': 1}
+    hashes = store.aggregate({'events': ('event_index', 'count')}, by=['flow_hash'])
+    assert hashes == [{'flow_hash': edited['flow_hash'], 'events': 11}]
+
+
+def test_flow_moved_to_another_day_leaves_no_stale_files(store, flow_bytes):
+    flow = json.loads(flow_bytes)
+    store.append(process_flow_bytes(flow_bytes))
+    for event in flow['capturedEvents']:
+        for field in ('timeMs', 'startTimeMs', 'endTimeMs'):
+            if event.get(field):
+                event[field] += 3 * 86_400_000
+    store.append(process_flow_bytes(json.dumps(flow).encode('utf-8')))
+
+    assert len(list(store.dataset().files)) == 1
+    assert store.summary()['events'] == 11
+
+
+def test_aggregate(store, flow_bytes):
+    flow = process_flow_bytes(flow_bytes)
+    store.append(flow)
+
+    by_type = store.aggregate({'events': ('event_index', 'count')}, by=['type'],
+                              order_by='events')
+    assert {row['type']: row['events'] for row in by_type} == {
+        'click': 7, 'scrolling': 2, 'typing': 1, 'dragging': 1}
+    assert [row['events'] for row in by_type] == [7, 2, 1, 1]
+    assert store.aggregate({'events': ('event_index', 'count')}, by=['type'],
+                           order_by='events', limit=1) == [{'type': 'click', 'events': 7}]
+
+    # Partition filters: teams and an inclusive date range
+    assert store.summary(teams=[flow['team_id']])['events'] == 11
+    assert store.summary(teams=['another-team'])['events'] == 0
+    assert store.summary(start='2025-09-01', end='2025-09-01')['events'] == 11
+    assert store.summary(start='2025-09-02')['events'] == 0
+
+    assert store.click_to_typing_latency() == [{'clicks': 1, 'median_ms': 612.0,
+                                                'mean_ms': 612.0}]
+
+    scrolled = store.scroll_time_by_page()
+    assert [(row['current_page_url'], row['scrolls'], row['total_seconds'])
+            for row in scrolled] == [
+        ('https://www.target.com/', 1, pytest.approx(5.851)),
+        ('https://www.target.com/s?searchTerm=scooter&category=0%7CAll%7Cmatchallpartial'
+         '%7Call+categories&searchTermRaw=Scooter', 1, pytest.approx(1.496)),
+    ]
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from arcade_flow_analyzer.analysis.csv_preprocessor import load_processed_actions, read_actions_csv
+from arcade_flow_analyzer.analysis.prompt_builder import build_actions_prompt
+from arcade_flow_analyzer.extractors import process_flow_bytes
+from arcade_flow_analyzer.jobs.queue import FAILED, JobQueue
+from arcade_flow_analyzer.jobs.runner import run_worker
+
+
+def test_processed_csv_reads_back_as_the_in_memory_frame(tmp_path, flow_bytes):
+    processed_csv = tmp_path / 'processed.csv'
+    in_memory = load_processed_actions(flow=process_flow_bytes(flow_bytes),
+                                       output_path=processed_csv)
+    from_csv = read_actions_csv(processed_csv)
+
+    assert (in_memory['click_text'] == '').any()
+    pd.testing.assert_frame_equal(from_csv, in_memory, check_dtype=False)
+    assert build_actions_prompt(from_csv) == build_actions_prompt(in_memory)
+
+
+def _run_one(tmp_path, monkeypatch, flow_file):
+    monkeypatch.chdir(tmp_path)
+    queue_path = str(tmp_path / 'jobs.sqlite3')
+    job_id = JobQueue(queue_path).enqueue(str(flow_file))
+    return job_id, queue_path
+
+
+def test_invalid_flow_is_not_retried(tmp_path, monkeypatch):
+    flow_file = tmp_path / 'bad.json'
+    flow_file.write_text('{"name": "missing everything else"}')
+    job_id, queue_path = _run_one(tmp_path, monkeypatch, flow_file)
+
+    assert run_worker(queue_path, max_retry_wait=0.1) == 1
+    job = JobQueue(queue_path).get(job_id)
+    assert job['status'] == FAILED
+    assert job['attempts'] == 1
+    assert job['error'].startswith('InvalidFlowError: Validation failed')
+
+
+def test_missing_flow_file_is_not_retried(tmp_path, monkeypatch, flow_bytes):
+    flow_file = tmp_path / 'flow.json'
+    flow_file.write_bytes(flow_bytes)
+    job_id, queue_path = _run_one(tmp_path, monkeypatch, flow_file)
+    flow_file.unlink()
+
+    assert run_worker(queue_path, max_retry_wait=0.1) == 1
+    job = JobQueue(queue_path).get(job_id)
+    assert job['status'] == FAILED
+    assert job['attempts'] == 1
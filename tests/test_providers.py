@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from arcade_flow_analyzer.providers import ModelProvider, StubProvider, create_provider
+
+
+def test_model_provider_is_abstract():
+    with pytest.raises(TypeError):
+        ModelProvider()
+
+    class ChatOnly(ModelProvider):
+        def chat_model(self, temperature=0.6, max_retries=None):
+            return None
+
+    with pytest.raises(TypeError):
+        ChatOnly()
+
+
+def test_stub_answers_are_deterministic():
+    from langchain_core.messages import HumanMessage
+
+    first, second = StubProvider().chat_model(), StubProvider().chat_model()
+    prompt = [HumanMessage('Summarize the flow')]
+    assert first.invoke(prompt).content == second.invoke(prompt).content
+    assert first.invoke(prompt).content != first.invoke([HumanMessage('Other')]).content
+
+
+def test_stub_images_follow_the_preset():
+    provider = StubProvider()
+    preview = provider.generate_image('A scooter', 'preview')
+    assert preview.startswith(b'\x89PNG')
+    # IHDR width and height
+    assert preview[16:24] == (256).to_bytes(4, 'big') * 2
+    assert asyncio.run(provider.agenerate_image('A scooter', 'preview')) == preview
+    assert provider.calls == 2
+
+
+def test_stub_injects_errors():
+    from openai import RateLimitError
+
+    provider = StubProvider(error_rate=1.0, error_kinds=['rate_limit'])
+    with pytest.raises(RateLimitError):
+        provider.generate_image('A scooter')
+    assert provider.errors == 1
+
+
+def test_create_provider_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        create_provider('other')
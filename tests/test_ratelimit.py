@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from arcade_flow_analyzer import ratelimit
+from arcade_flow_analyzer.ratelimit import RateScheduler, create_scheduler, request_priority
+
+
+def test_share_scales_the_configured_budget(monkeypatch):
+    monkeypatch.setenv('ARCADE_RPM', '600')
+    monkeypatch.setenv('ARCADE_TPM', '100000')
+    monkeypatch.setenv('ARCADE_RATE_SHARE', '0.25')
+
+    scheduler = create_scheduler()
+    scheduler.acquire('gpt-4o', 10)
+    assert scheduler.limits()['gpt-4o']['rpm'] == 150
+    assert scheduler.limits()['gpt-4o']['tpm'] == 25000
+    # An explicit share (e.g. a queue worker's) overrides the environment
+    assert create_scheduler(0.5).rpm == 300
+
+
+def test_share_scales_reported_limits():
+    scheduler = RateScheduler(rpm=500, tpm=200_000, share=0.5)
+    scheduler.observe('gpt-4o', {'x-ratelimit-limit-requests': '1000',
+                                 'x-ratelimit-limit-tokens': '400000',
+                                 'x-ratelimit-remaining-requests': '10'})
+    limits = scheduler._limits['gpt-4o']
+    assert limits.requests.capacity == 500
+    assert limits.tokens.capacity == 200_000
+    assert limits.requests.level == 5
+
+
+@pytest.mark.parametrize('share', [0, -0.5, 1.5])
+def test_share_must_be_a_fraction(share):
+    with pytest.raises(ValueError):
+        RateScheduler(share=share)
+
+
+def test_waiting_requests_are_admitted_by_priority():
+    # One request per second; the first is admitted from the full bucket
+    scheduler = RateScheduler(rpm=60, tpm=1_000_000)
+    scheduler._model_limits('m', time.monotonic()).requests.level = 1
+    scheduler.acquire('m')
+
+    order = []
+
+    def request(priority):
+        with request_priority(priority):
+            scheduler.acquire('m')
+        order.append(priority)
+
+    threads = [threading.Thread(target=request, args=(priority,))
+               for priority in ('batch', 'interactive')]
+    for thread in threads:
+        thread.start()
+        # Let each request queue up before the next arrives
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+
+    assert order == ['interactive', 'batch']
+    assert scheduler.stats['batch']['waited'] == 1
+
+
+def test_queue_workers_split_the_share(monkeypatch, tmp_path):
+    from arcade_flow_analyzer.jobs import runner
+
+    monkeypatch.setattr(ratelimit, '_default_scheduler', None)
+    runner.run_worker(str(tmp_path / 'jobs.sqlite3'), rate_share=0.125)
+    assert ratelimit.get_scheduler().share == 0.125
@@ -0,0 +1,135 @@
+import base64
+import threading
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('multipart')
+
+from fastapi.testclient import TestClient
+
+from arcade_flow_analyzer.service.app import create_app
+
+
+@pytest.fixture
+def client(cache, stub_provider):
+    stub_provider()
+    with TestClient(create_app(extract_workers=1)) as client:
+        yield client
+
+
+def _upload(client, data, **params):
+    return client.put('/flows', params=params,
+                      files={'file': ('flow.json', data, 'application/json')})
+
+
+def test_put_flow_returns_report(client, flow_bytes):
+    response = _upload(client, flow_bytes)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body['events'] == 11
+    assert body['steps'] in body['report']
+    assert body['summary'] in body['report']
+    assert body['image_url'].startswith('http://testserver/images/')
+
+
+def test_image_is_served(client, flow_bytes):
+    body = _upload(client, flow_bytes, include_image=True).json()
+
+    response = client.get(body['image_url'])
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'image/png'
+    assert response.content.startswith(b'\x89PNG')
+
+
+@pytest.mark.parametrize('filename', ['flow.json', '../store.sqlite3', 'a' * 64 + '.gif'])
+def test_image_rejects_other_files(client, filename):
+    assert client.get(f'/images/{filename}').status_code == 404
+
+
+def test_unknown_image_is_not_found(client):
+    assert client.get('/images/' + '0' * 64 + '.png').status_code == 404
+
+
+def test_identical_uploads_are_coalesced(cache, stub_provider, flow_bytes):
+    # Latency keeps the first analysis in flight while the second arrives
+    provider = stub_provider(latency=0.3)
+    with TestClient(create_app(extract_workers=1)) as client:
+        responses = [None, None]
+        start = threading.Barrier(2)
+
+        def upload(index):
+            start.wait()
+            responses[index] = _upload(client, flow_bytes)
+
+        threads = [threading.Thread(target=upload, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        health = client.get('/health').json()
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[0].json() == responses[1].json()
+    assert health['requests'] == 2
+    assert health['coalesced'] == 1
+    # One steps call, one summary call and one image for both requests
+    assert provider.calls == 3
+
+
+def test_oversized_upload_is_rejected(cache, stub_provider, flow_bytes):
+    stub_provider()
+    with TestClient(create_app(extract_workers=1, max_upload_bytes=1024)) as client:
+        response = _upload(client, flow_bytes)
+    assert response.status_code == 413
+
+
+def test_invalid_flow_is_rejected(client):
+    response = _upload(client, b'{"name": "missing everything else"}')
+    assert response.status_code == 422
+    assert 'Validation failed' in response.json()['detail']
+
+
+def test_analysis_value_error_is_a_server_error(client, flow_bytes, monkeypatch):
+    from arcade_flow_analyzer.service import app as service_app
+
+    async def fail(*args, **kwargs):
+        raise ValueError("image encoding failed")
+
+    monkeypatch.setattr(service_app, 'agenerate_flow_image', fail)
+    response = _upload(client, flow_bytes)
+    assert response.status_code == 502
+    assert 'image encoding failed' in response.json()['detail']
+
+
+def test_unknown_image_preset_is_rejected(client, flow_bytes):
+    response = _upload(client, flow_bytes, image_preset='poster')
+    assert response.status_code == 422
+    assert 'Unknown image preset' in response.json()['detail']
+
+
+def test_missing_file_is_rejected(client):
+    assert client.put('/flows').status_code == 422
+
+
+def test_stub_openai_answers_like_the_stub_provider(stub_provider):
+    from langchain_core.messages import HumanMessage
+
+    from arcade_flow_analyzer.service.stub_openai import app as stub_app
+
+    provider = stub_provider()
+    with TestClient(stub_app) as stub_client:
+        chat = stub_client.post('/v1/chat/completions', json={
+            'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'List the steps'}]
+        }).json()
+        image = stub_client.post('/v1/images/generations', json={
+            'prompt': 'A scooter', 'size': '256x256'
+        }).json()
+
+    expected = provider.chat_model().invoke([HumanMessage('List the steps')])
+    assert chat['choices'][0]['message']['content'] == expected.content
+    assert chat['usage']['prompt_tokens'] == expected.usage_metadata['input_tokens']
+    assert base64.b64decode(image['data'][0]['b64_json']) == \
+        provider.generate_image('A scooter', 'preview')
@@ -0,0 +1,23 @@
+import pytest
+
+from arcade_flow_analyzer.analysis.csv_preprocessor import load_processed_actions, read_actions_csv
+from arcade_flow_analyzer.analysis.summarize import actions_to_documents
+from arcade_flow_analyzer.extractors import process_flow_bytes
+
+
+def _contents(documents):
+    return [document.page_content for document in documents]
+
+
+def test_documents_match_csv_loader(tmp_path, flow_bytes):
+    csv_loader = pytest.importorskip('langchain_community.document_loaders.csv_loader')
+
+    processed_csv = tmp_path / 'processed.csv'
+    actions = load_processed_actions(flow=process_flow_bytes(flow_bytes),
+                                     output_path=processed_csv)
+    documents = _contents(actions_to_documents(actions))
+
+    # The typing event after the first click has no click text
+    assert 'click_text: \n' in documents[1]
+    assert documents == _contents(csv_loader.CSVLoader(str(processed_csv)).load())
+    assert documents == _contents(actions_to_documents(read_actions_csv(processed_csv)))
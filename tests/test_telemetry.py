@@ -0,0 +1,73 @@
+from arcade_flow_analyzer.telemetry import StageStats, Tracer, summarize_spans
+
+
+def _span(name, duration_ms, **attributes):
+    return {'name': name, 'trace_id': 't', 'span_id': 's', 'parent_id': None,
+            'start': 0.0, 'duration_ms': duration_ms, 'attributes': attributes}
+
+
+SPANS = [
+    _span('validate', 2.0, bytes=100),
+    _span('steps-chain', 800.0, cache='miss', prompt_tokens=300, completion_tokens=40,
+          cost_usd=0.001),
+    _span('steps-chain', 1.0, cache='hit'),
+    _span('validate', 4.0, bytes=300, error='InvalidFlowError: Validation failed'),
+    _span('steps-chain', 600.0, cache='miss', prompt_tokens=200, completion_tokens=30,
+          cost_usd=0.0005),
+]
+
+
+def test_summarize_spans():
+    summary = summarize_spans(SPANS)
+
+    assert list(summary) == ['validate', 'steps-chain']
+    assert summary['validate'] == {
+        'count': 2, 'total_ms': 6.0, 'mean_ms': 3.0, 'p50_ms': 2.0, 'p95_ms': 4.0,
+        'max_ms': 4.0, 'errors': 1, 'cache_hits': 0, 'cache_misses': 0, 'bytes': 400,
+    }
+    assert summary['steps-chain'] == {
+        'count': 3, 'total_ms': 1401.0, 'mean_ms': 467.0, 'p50_ms': 600.0,
+        'p95_ms': 800.0, 'max_ms': 800.0, 'errors': 0, 'cache_hits': 1,
+        'cache_misses': 2, 'prompt_tokens': 500, 'completion_tokens': 70,
+        'cost_usd': 0.0015,
+    }
+
+
+def test_tracer_summary_counts_dropped_spans():
+    tracer = Tracer(max_spans=2)
+    for span_dict in SPANS:
+        tracer.export(span_dict)
+
+    assert list(tracer.spans) == SPANS[-2:]
+    assert tracer.dropped == 3
+    assert tracer.summary() == summarize_spans(SPANS)
+
+
+def test_tracer_records_spans():
+    tracer = Tracer()
+    with tracer.span('report', bytes=10) as parent:
+        with tracer.span('image'):
+            pass
+
+    image, report = tracer.spans
+    assert image['parent_id'] == parent.span_id
+    assert image['trace_id'] == report['trace_id']
+    assert report['attributes'] == {'bytes': 10}
+    assert tracer.dropped == 0
+    assert tracer.summary()['report']['count'] == 1
+
+
+def test_stage_stats_sample_is_bounded():
+    stages = StageStats(sample_size=100)
+    for i in range(1, 10001):
+        stages.add(_span('extract', float(i)))
+
+    stage = stages.summary()['extract']
+    assert len(stages._stages['extract']['sample']) == 100
+    assert stage['count'] == 10000
+    assert stage['total_ms'] == 50005000.0
+    assert stage['mean_ms'] == 5000.5
+    assert stage['max_ms'] == 10000.0
+    # Sampled percentiles land near the true ones (5000 and 9500)
+    assert 3500 <= stage['p50_ms'] <= 6500
+    assert 8500 <= stage['p95_ms'] <= 10000